@@ -0,0 +1,184 @@
+# backend/adaptive.py
+"""
+Adaptive Begrenzung der Upstream-Last pro Host (AIMD, wie bei TCP):
+Solange Antworten gesund sind, steigen Rate und Parallelitaet additiv; bei 403/429/5xx,
+Challenge-Seiten, Netzwerkfehlern oder Latenzspitzen werden beide multiplikativ gesenkt.
+Die Rate wird ueber den vorhandenen Rate-Limiter des Hosts (max_per_second) durchgesetzt,
+die Parallelitaet ueber ein eigenes Gate. Mit SHARED_RATE_LIMITS liegt die Rate in der
+Koordinations-DB, Erhoehungen und Absenkungen eines Workers gelten dann fuer alle.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .cancellation import check_cancelled, sleep as cancellable_sleep
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+_CONGESTION_STATUS = (403, 429)
+
+
+class AdaptiveController:
+    def __init__(self, host: str, limiter=None,
+                 min_rate: float = CONFIG.get("ADAPTIVE_MIN_RATE", 0.5),
+                 max_rate: float = CONFIG.get("ADAPTIVE_MAX_RATE", 6),
+                 rate_step: float = CONFIG.get("ADAPTIVE_RATE_STEP", 0.25),
+                 min_concurrency: int = CONFIG.get("ADAPTIVE_MIN_CONCURRENCY", 1),
+                 max_concurrency: int = CONFIG.get("ADAPTIVE_MAX_CONCURRENCY", 8),
+                 initial_concurrency: int = CONFIG.get("ADAPTIVE_INITIAL_CONCURRENCY", 2),
+                 decrease_factor: float = CONFIG.get("ADAPTIVE_DECREASE_FACTOR", 0.5),
+                 latency_spike_factor: float = CONFIG.get("ADAPTIVE_LATENCY_SPIKE_FACTOR", 3.0),
+                 latency_floor_sec: float = CONFIG.get("ADAPTIVE_LATENCY_FLOOR_SEC", 2.0),
+                 decrease_cooldown_sec: float = 2.0):
+        self.host = host
+        # Rate-Limiter mit Attribut max_per_second (RateLimiter oder SharedRateLimiter);
+        # ohne Limiter (z. B. kwik) wird nur die Parallelitaet geregelt
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.latency_spike_factor = latency_spike_factor
+        self.latency_floor_sec = latency_floor_sec
+        self.decrease_cooldown_sec = decrease_cooldown_sec
+        self.concurrency = float(initial_concurrency)
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self.limiter.max_per_second if self.limiter else None
+
+    @contextmanager
+    def slot(self):
+        """
+        Wartet auf einen freien Parallelitaets-Slot, ein evtl. Retry-After und das Rate-Limit.
+        Bricht der Client ab, endet das Warten mit CancelledByClient und der Slot wird freigegeben.
+        """
+        with self._cond:
+            while self.in_flight >= int(self.concurrency):
+                self._cond.wait(0.5)
+                check_cancelled()
+            self.in_flight += 1
+        try:
+            delay = self._blocked_until - time.time()
+            if delay > 0:
+                cancellable_sleep(delay)
+            if self.limiter:
+                self.limiter.wait()
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def record(self, status: int, latency: float, challenge: bool = False, retry_after: Optional[float] = None):
+        """Wertet eine Antwort aus und passt die Limits an."""
+        congested = challenge or status in _CONGESTION_STATUS or status >= 500
+        reason = "Status %s" % status
+        with self._cond:
+            if not congested and self._is_latency_spike(latency):
+                congested = True
+                reason = "Latenz %.2fs bei Mittel %.2fs" % (latency, self.latency_ewma)
+            self._update_latency(latency)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.time() + retry_after)
+            if congested:
+                self._decrease(reason)
+            else:
+                self._increase()
+
+    def record_error(self, error: Exception):
+        """Netzwerkfehler/Timeouts zaehlen wie Ueberlast."""
+        with self._cond:
+            self._decrease(type(error).__name__)
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        if self.latency_ewma is None or self._samples < 10:
+            return False
+        return latency > max(self.latency_floor_sec, self.latency_spike_factor * self.latency_ewma)
+
+    def _update_latency(self, latency: float):
+        self._samples += 1
+        self.latency_ewma = latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+
+    def _increase(self):
+        # Additiv: Parallelitaet etwa +1, Rate etwa +rate_step pro "Runde" (so viele Antworten wie das Limit)
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+        if self.limiter:
+            rate = self.limiter.max_per_second
+            self.limiter.max_per_second = min(self.max_rate, rate + self.rate_step / max(rate, 1.0))
+        self.increases += 1
+        self._cond.notify_all()
+
+    def _decrease(self, reason: str):
+        now = time.time()
+        # Mehrere gleichzeitig laufende Fehlschlaege zaehlen als ein Ueberlast-Signal
+        if now - self._last_decrease < self.decrease_cooldown_sec:
+            return
+        self._last_decrease = now
+        self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+        if self.limiter:
+            self.limiter.max_per_second = max(self.min_rate, self.limiter.max_per_second * self.decrease_factor)
+        self.decreases += 1
+        logger.warning("Upstream-Limits fuer %s gesenkt (%s): Rate %s/s, Parallelitaet %d",
+                       self.host, reason, self._format_rate(), int(self.concurrency))
+
+    def _format_rate(self) -> str:
+        return "%.2f" % self.limiter.max_per_second if self.limiter else "-"
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "rate_per_sec": round(self.rate, 2) if self.limiter else None,
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "latency_ewma_ms": round(self.latency_ewma * 1000) if self.latency_ewma is not None else None,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "blocked_for_sec": max(0.0, round(self._blocked_until - time.time(), 1))
+            }
+
+
+class AdaptiveLimits:
+    """Ein AdaptiveController pro Host; der Limiter des ersten Aufrufs wird uebernommen."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._controllers: Dict[str, AdaptiveController] = {}
+
+    def for_host(self, host: str, limiter=None) -> AdaptiveController:
+        with self._lock:
+            controller = self._controllers.get(host)
+            if controller is None:
+                controller = AdaptiveController(host, limiter)
+                self._controllers[host] = controller
+            return controller
+
+    def stats(self) -> Dict:
+        with self._lock:
+            controllers = dict(self._controllers)
+        return {host: controller.stats() for host, controller in controllers.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in Sekunden (HTTP-Datumsangaben werden ignoriert)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Globale Instanz
+upstream_limits = AdaptiveLimits()
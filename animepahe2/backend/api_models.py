@@ -1,62 +1,81 @@
-# backend/api_models.py
-from pydantic import BaseModel
-from typing import List, Optional
-
-# Eingabemodelle
-class SearchQuery(BaseModel):
-    q: str = ""
-    type: str = "All"
-    genre: str = "All"
-    studio: str = "All"
-    year: str = "All"
-
-class EpisodeRequest(BaseModel):
-    session: str
-    episode_session: str
-
-class StreamUrlsRequest(BaseModel):
-    episodes: List[EpisodeRequest]
-
-# Ausgabemodelle
-class AnimeListItem(BaseModel):
-    source: str
-    session: str # identifier
-    title: str
-    thumbnail: Optional[str] = None
-    genre: Optional[str] = None
-    type: Optional[str] = None
-    studio: Optional[str] = None
-    year: Optional[str] = None
-
-class AnimeDetails(BaseModel):
-    source: str
-    identifier: str
-    title: str
-    synopsis: str
-    info: str
-    relations: str
-    recommendations: str
-    thumbnail: Optional[str] = None
-    genre: Optional[str] = None
-    type: Optional[str] = None
-    studio: Optional[str] = None
-    season: Optional[str] = None
-    year: Optional[str] = None
-
-class Episode(BaseModel):
-    session: str
-    episode: str # Episode-Nummer als String, da sie z.B. "12.5" sein kann
-    title: Optional[str] = None
-    snapshot: Optional[str] = None
-    created_at: Optional[str] = None
-    source: str
-
-class StreamUrlResponse(BaseModel):
-    title: str
-    m3u8_url: str
-
-class FilterOptions(BaseModel):
-    types: List[str]
-    genres: List[str]
-    studios: List[str]
-    years: List[str]
+# backend/api_models.py
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+# Eingabemodelle
+class SearchQuery(BaseModel):
+    q: str = ""
+    type: str = "All"
+    genre: str = "All"
+    studio: str = "All"
+    year: str = "All"
+    sort: str = "title"  # title, year oder recent
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+
+class EpisodeRequest(BaseModel):
+    session: str
+    episode_session: str
+    title: Optional[str] = None  # Anzeigename in der Player-Playlist
+
+class StreamUrlsRequest(BaseModel):
+    episodes: List[EpisodeRequest]
+
+class AnimeBatchRequest(BaseModel):
+    sessions: List[str] = Field(..., max_length=200)
+
+# Ausgabemodelle
+class AnimeListItem(BaseModel):
+    source: str
+    session: str # identifier
+    title: str
+    thumbnail: Optional[str] = None
+    genre: Optional[str] = None
+    type: Optional[str] = None
+    studio: Optional[str] = None
+    year: Optional[str] = None
+
+class AnimeDetails(BaseModel):
+    source: str
+    identifier: str
+    title: str
+    synopsis: str
+    info: str
+    relations: str
+    recommendations: str
+    thumbnail: Optional[str] = None
+    genre: Optional[str] = None
+    type: Optional[str] = None
+    studio: Optional[str] = None
+    season: Optional[str] = None
+    year: Optional[str] = None
+
+class AnimeBatchResponse(BaseModel):
+    results: List[AnimeDetails]   # In der Reihenfolge der Anfrage
+    not_found: List[str] = []     # Weder im Cache noch upstream auffindbar (oder Fehler)
+
+class Episode(BaseModel):
+    session: str
+    episode: str # Episode-Nummer als String, da sie z.B. "12.5" sein kann
+    title: Optional[str] = None
+    snapshot: Optional[str] = None
+    created_at: Optional[str] = None
+    source: str
+
+class StreamUrlResponse(BaseModel):
+    title: str
+    m3u8_url: str
+    proxy_url: Optional[str] = None  # Dieselbe Playlist ueber den lokalen HLS-Proxy
+
+class FilterOptions(BaseModel):
+    types: List[str]
+    genres: List[str]
+    studios: List[str]
+    years: List[str]
+
+class FacetCounts(BaseModel):
+    total: int                      # Treffer mit allen Filtern
+    type: Dict[str, int]            # Pro Facette: Wert -> Treffer (ohne den eigenen Filter der Facette)
+    genre: Dict[str, int]
+    studio: Dict[str, int]
+    year: Dict[str, int]
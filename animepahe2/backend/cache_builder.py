@@ -1,139 +1,288 @@
-import asyncio
-import logging
-import os
-import requests
-from threading import Event, Thread
-import random
-from .database import anime_cache_db
-from .crawler import crawler
-from .config import CONFIG
-
-logger = logging.getLogger(__name__)
-
-# Event zum Stoppen des Threads
-_stop_event = Event()
-
-class CacheBuilder:
-    def __init__(self, interval_sec: int = CONFIG.get("CACHE_BUILDER_INTERVAL_SEC", 300)):
-        self.interval_sec = interval_sec
-        self._thread = Thread(target=self._run_loop_thread, daemon=True)
-
-    def start(self):
-        if not self._thread.is_alive():
-            logger.info("Starte CacheBuilder Thread...")
-            _stop_event.clear()
-            self._thread = Thread(target=self._run_loop_thread, daemon=True)
-            self._thread.start()
-
-    def stop(self):
-        logger.info("Stoppe CacheBuilder Thread...")
-        _stop_event.set()
-        self._thread.join()
-        logger.info("CacheBuilder Thread gestoppt.")
-
-    def _run_loop_thread(self):
-        asyncio.run(self._run_loop_async())
-
-    async def _run_loop_async(self):
-        while not _stop_event.is_set():
-            try:
-                await self._build_cache_cycle()
-            except Exception as e:
-                logger.error(f"Fehler im CacheBuilder Zyklus: {e}", exc_info=True)
-            await asyncio.sleep(self.interval_sec)
-
-    async def _build_cache_cycle(self):
-        logger.info("Starte Cache-Build Zyklus")
-
-        cached_ids = anime_cache_db.get_cached_session_ids()
-        logger.debug(f"{len(cached_ids)} Session-IDs im Cache gefunden: {cached_ids[:10]}")
-
-        try:
-            all_sessions = crawler.get_all_session_ids()
-            logger.debug(f"{len(all_sessions)} Session-IDs vom Crawler insgesamt: {all_sessions[:10]}")
-        except Exception as e:
-            logger.error(f"Fehler beim Abrufen der Session-IDs vom Crawler: {e}")
-            return
-
-        # Bestimme welche fehlen
-        missing_sessions = [s for s in all_sessions if s not in cached_ids]
-        logger.info(f"{len(missing_sessions)} fehlende Session-IDs gefunden: {missing_sessions[:10]}")
-
-        # Mische die Liste und logge die ersten 10 nach dem Mischen
-        random.shuffle(missing_sessions)
-        logger.debug(f"Nach Shuffle, erste 10 fehlende Session-IDs: {missing_sessions[:10]}")
-
-        limit = CONFIG.get("CACHE_BUILDER_LIMIT_PER_CYCLE", 10)
-        sessions_to_process = missing_sessions[:limit]
-
-        if not sessions_to_process:
-            logger.info("Keine neuen Session-IDs zu verarbeiten. Zyklus beendet.")
-            return
-
-        details_to_cache = []
-        for session_id in sessions_to_process:
-            anime_dict = {"source": "pahe", "session": session_id}
-            try:
-                details = crawler.get_details(anime_dict)
-                if not details:
-                    logger.warning(f"Details für Session {session_id} nicht gefunden.")
-                    continue
-
-                thumb_url = details.get("thumbnail")
-                if thumb_url and not thumb_url.startswith("/cached_images/"):
-                    # Prüfe, ob das Bild bereits lokal existiert
-                    filename = os.path.basename(thumb_url.split("?")[0])
-                    cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
-                    local_path = os.path.join(cache_dir, filename)
-                    if os.path.exists(local_path):
-                        logger.debug(f"Bild {filename} bereits vorhanden, überspringe Download.")
-                        details["thumbnail"] = f"/cached_images/{filename}"
-                    else:
-                        self._cache_image(thumb_url)
-                        # Wenn Download geglückt, setze auf /cached_images/... sonst behalte Original
-                        if os.path.exists(os.path.join(cache_dir, filename)):
-                            details["thumbnail"] = f"/cached_images/{filename}"
-                        else:
-                            logger.warning(f"Bild {filename} konnte nicht gecached werden, belasse Thumbnail als Original.")
-                            details["thumbnail"] = thumb_url
-
-                details["source"] = "pahe"
-                details["identifier"] = session_id
-                details["session"] = session_id  # Explizit sicherstellen, dass 'session' gesetzt ist
-                logger.debug(f"Details für Session {session_id}: {details}")
-                details_to_cache.append(details)
-            except Exception as e:
-                logger.error(f"Fehler beim Verarbeiten von Session {session_id}: {e}", exc_info=True)
-
-        if details_to_cache:
-            try:
-                anime_cache_db.set_details_bulk(details_to_cache)
-                logger.info(f"{len(details_to_cache)} Anime-Details zum Cache hinzugefügt.")
-            except Exception as e:
-                logger.error(f"Fehler beim Speichern der Details in der DB: {e}", exc_info=True)
-
-        logger.info("Cache-Build Zyklus abgeschlossen.")
-
-    def _cache_image(self, image_url: str):
-        try:
-            filename = os.path.basename(image_url.split("?")[0])
-            cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
-            if not os.path.exists(cache_dir):
-                os.makedirs(cache_dir)
-
-            filepath = os.path.join(cache_dir, filename)
-            if os.path.exists(filepath):
-                logger.debug(f"Bild {filename} bereits gecached.")
-                return
-
-            logger.info(f"Lade Bild {filename} herunter...")
-            resp = requests.get(image_url, timeout=15)
-            resp.raise_for_status()
-
-            with open(filepath, "wb") as f:
-                f.write(resp.content)
-            logger.info(f"Bild {filename} erfolgreich gecached.")
-        except Exception as e:
-            logger.error(f"Fehler beim Cachen des Bildes {image_url}: {e}", exc_info=True)
-
-cache_builder = CacheBuilder()
+import asyncio
+import logging
+import os
+import requests
+from threading import Event, Thread
+import random
+from typing import Optional
+from tenacity import RetryError
+from .database import ShadowInUseError, anime_cache_db
+from .crawler import crawler
+from .crawl_pipeline import crawl_details
+from .parsers import parse_details
+from .negative_cache import negative_cache
+from .circuit_breaker import CircuitOpenError
+from .enrichment import metadata_enricher
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Event zum Stoppen des Threads
+_stop_event = Event()
+# Weckt die Schleife vorzeitig auf (Stop oder angeforderter Neuaufbau)
+_wake_event = Event()
+
+def _is_target_failure(error: BaseException) -> bool:
+    """
+    True, wenn der Fehler an der Session selbst liegt (4xx, nicht parsebar) und nicht am Upstream
+    insgesamt (Netzwerk, 5xx, Challenge, offener Circuit Breaker). Nur solche Sessions kommen in
+    den Negativ-Cache.
+    """
+    if isinstance(error, RetryError) and error.last_attempt.failed:
+        error = error.last_attempt.exception()
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in (403, 429)
+    return not isinstance(error, requests.RequestException)
+
+class CacheBuilder:
+    def __init__(self, interval_sec: int = CONFIG.get("CACHE_BUILDER_INTERVAL_SEC", 300)):
+        self.interval_sec = interval_sec
+        self._thread = Thread(target=self._run_loop_thread, daemon=True)
+        self._rebuild_requested = False
+        self.rebuild_in_progress = False
+
+    def start(self):
+        if not self._thread.is_alive():
+            logger.info("Starte CacheBuilder Thread...")
+            _stop_event.clear()
+            _wake_event.clear()
+            self._thread = Thread(target=self._run_loop_thread, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        logger.info("Stoppe CacheBuilder Thread...")
+        _stop_event.set()
+        _wake_event.set()
+        # Follower-Worker starten den Thread nie
+        if self._thread.is_alive():
+            self._thread.join()
+        logger.info("CacheBuilder Thread gestoppt.")
+
+    def _run_loop_thread(self):
+        asyncio.run(self._run_loop_async())
+
+    async def _run_loop_async(self):
+        # Erst crawlen, wenn die Cookies bereitstehen (Jar oder Hintergrund-Browser)
+        timeout = CONFIG.get("COOKIE_WAIT_TIMEOUT_SEC", 120)
+        if not await asyncio.to_thread(crawler.cookies_ready.wait, timeout):
+            logger.warning(f"Keine Cookies nach {timeout}s verfuegbar, starte CacheBuilder trotzdem.")
+        while not _stop_event.is_set():
+            try:
+                if self._rebuild_requested:
+                    self._rebuild_requested = False
+                    await self._rebuild_catalog()
+                else:
+                    await self._build_cache_cycle()
+            except Exception as e:
+                logger.error(f"Fehler im CacheBuilder Zyklus: {e}", exc_info=True)
+            # Auf das Wake-Event warten statt fest zu schlafen, damit stop() (z. B. bei Lease-Verlust)
+            # nicht haengt und ein angeforderter Neuaufbau sofort beginnt
+            await asyncio.to_thread(_wake_event.wait, self.interval_sec)
+            _wake_event.clear()
+
+    def request_rebuild(self):
+        """Fordert einen kompletten Neuaufbau des Katalogs ueber eine Schatten-Datenbank an (siehe _rebuild_catalog)."""
+        logger.info("Neuaufbau des Katalogs angefordert.")
+        self._rebuild_requested = True
+        _wake_event.set()
+
+    async def _rebuild_catalog(self):
+        """
+        Baut den kompletten Katalog in einer Schatten-Datenbank neu auf, waehrend die Live-Datenbank
+        weiter ausliefert, und tauscht sie erst danach atomar aus. Ist der Neuaufbau zu unvollstaendig
+        (z. B. wegen Upstream-Fehlern), wird die Schatten-Datenbank verworfen.
+        """
+        logger.info("Starte Neuaufbau des Katalogs (Schatten-Datenbank)")
+        try:
+            shadow = anime_cache_db.create_shadow()
+        except ShadowInUseError as e:
+            logger.warning(f"Neuaufbau uebersprungen: {e}")
+            return
+        self.rebuild_in_progress = True
+        try:
+            all_sessions = crawler.get_all_session_ids()
+            # Sessions mit laufender Sperre im Negativ-Cache zaehlen nicht zur Vollstaendigkeit
+            skipped = len(all_sessions)
+            all_sessions = negative_cache.filter_due(all_sessions)
+            skipped -= len(all_sessions)
+            if skipped:
+                logger.info("Neuaufbau: %d Sessions im Negativ-Cache uebersprungen", skipped)
+            batch_size = CONFIG.get("BATCH_SIZE", 100)
+            stored = 0
+            batch = []
+
+            def _flush():
+                nonlocal stored
+                if batch:
+                    counts = shadow.set_details_bulk(batch)
+                    negative_cache.forget(d["session"] for d in batch)
+                    stored += counts["inserted"] + counts["updated"] + counts["unchanged"]
+                    batch.clear()
+                logger.info(f"Neuaufbau: {stored}/{len(all_sessions)} Anime in der Schatten-Datenbank")
+
+            processed = 0
+            for details in self._crawl(all_sessions):
+                processed += 1
+                if details:
+                    batch.append(details)
+                if processed % batch_size == 0:
+                    _flush()
+            if _stop_event.is_set():
+                logger.info("Neuaufbau abgebrochen (CacheBuilder wird gestoppt).")
+                anime_cache_db.discard_shadow()
+                return
+            _flush()
+
+            min_ratio = CONFIG.get("CATALOG_REBUILD_MIN_COMPLETENESS", 0.9)
+            if not all_sessions or stored < min_ratio * len(all_sessions):
+                logger.error(f"Neuaufbau verworfen: nur {stored} von {len(all_sessions)} Anime geladen "
+                             f"(mindestens {min_ratio:.0%} erforderlich).")
+                anime_cache_db.discard_shadow()
+                return
+            anime_cache_db.swap_in(shadow)
+            logger.info(f"Neuaufbau abgeschlossen: {stored} Anime.")
+            self._enrich()
+        except BaseException:
+            anime_cache_db.discard_shadow()
+            raise
+        finally:
+            self.rebuild_in_progress = False
+
+    async def _build_cache_cycle(self):
+        logger.info("Starte Cache-Build Zyklus")
+
+        cached_ids = anime_cache_db.get_cached_session_ids()
+        logger.debug("%d Session-IDs im Cache gefunden: %s", len(cached_ids), cached_ids[:10])
+
+        try:
+            all_sessions = crawler.get_all_session_ids()
+            logger.debug("%d Session-IDs vom Crawler insgesamt: %s", len(all_sessions), all_sessions[:10])
+        except Exception as e:
+            logger.error(f"Fehler beim Abrufen der Session-IDs vom Crawler: {e}")
+            return
+
+        # Bestimme welche fehlen; gesperrte Sessions aus dem Negativ-Cache bleiben aussen vor
+        cached_set = set(cached_ids)
+        missing_sessions = [s for s in all_sessions if s not in cached_set]
+        due_sessions = negative_cache.filter_due(missing_sessions)
+        logger.info("%d fehlende Session-IDs gefunden, davon %d im Negativ-Cache gesperrt",
+                    len(missing_sessions), len(missing_sessions) - len(due_sessions))
+        missing_sessions = due_sessions
+
+        # Mische die Liste und logge die ersten 10 nach dem Mischen
+        random.shuffle(missing_sessions)
+        logger.debug("Nach Shuffle, erste 10 fehlende Session-IDs: %s", missing_sessions[:10])
+
+        limit = CONFIG.get("CACHE_BUILDER_LIMIT_PER_CYCLE", 10)
+        sessions_to_process = missing_sessions[:limit]
+
+        if not sessions_to_process:
+            logger.info("Keine neuen Session-IDs zu verarbeiten. Zyklus beendet.")
+            self._enrich()
+            return
+
+        details_to_cache = [d for d in self._crawl(sessions_to_process) if d]
+
+        if details_to_cache:
+            try:
+                counts = anime_cache_db.set_details_bulk(details_to_cache)
+                logger.info(f"{counts['inserted']} Anime-Details zum Cache hinzugefügt, {counts['updated']} aktualisiert.")
+                negative_cache.forget(d["session"] for d in details_to_cache)
+            except Exception as e:
+                logger.error(f"Fehler beim Speichern der Details in der DB: {e}", exc_info=True)
+
+        self._enrich()
+        logger.info("Cache-Build Zyklus abgeschlossen.")
+
+    def _enrich(self):
+        """Ergaenzt fehlende Facetten aus AniList (siehe enrichment.py); Fehler beenden den Zyklus nicht."""
+        if not CONFIG.get("ENRICHMENT_ENABLED", True):
+            return
+        try:
+            metadata_enricher.enrich_missing()
+        except Exception as e:
+            logger.error(f"Fehler bei der Anreicherung aus AniList: {e}", exc_info=True)
+
+    def _crawl(self, sessions: list):
+        """
+        Laedt die Detailseiten ueber die Crawl-Pipeline (Fetch-Threads -> Parse-Prozesse) und liefert
+        pro Session die fertigen Details oder None bei Fehlern.
+        """
+        for session_id, parsed, error in crawl_details(sessions, crawler.fetch_details_html, parse_details,
+                                                       stop_event=_stop_event):
+            if error is not None:
+                self._record_failure(session_id, error)
+                yield None
+            else:
+                yield self._finish_details(session_id, parsed)
+
+    def _finish_details(self, session_id: str, parsed: dict) -> Optional[dict]:
+        """Macht aus dem geparsten dict die Details einer Session inkl. lokal gecachtem Thumbnail; None bei Fehlern."""
+        try:
+            details = crawler.details_from_parsed(session_id, parsed)
+            if not details:
+                logger.warning(f"Details für Session {session_id} nicht gefunden.")
+                negative_cache.record_failure(session_id, "keine Details")
+                return None
+
+            thumb_url = details.get("thumbnail")
+            if thumb_url and not thumb_url.startswith("/cached_images/"):
+                # Prüfe, ob das Bild bereits lokal existiert
+                filename = os.path.basename(thumb_url.split("?")[0])
+                cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+                local_path = os.path.join(cache_dir, filename)
+                if os.path.exists(local_path):
+                    logger.debug("Bild %s bereits vorhanden, überspringe Download.", filename)
+                    details["thumbnail"] = f"/cached_images/{filename}"
+                else:
+                    self._cache_image(thumb_url)
+                    # Wenn Download geglückt, setze auf /cached_images/... sonst behalte Original
+                    if os.path.exists(os.path.join(cache_dir, filename)):
+                        details["thumbnail"] = f"/cached_images/{filename}"
+                    else:
+                        logger.warning(f"Bild {filename} konnte nicht gecached werden, belasse Thumbnail als Original.")
+                        details["thumbnail"] = thumb_url
+
+            details["source"] = "pahe"
+            details["identifier"] = session_id
+            details["session"] = session_id  # Explizit sicherstellen, dass 'session' gesetzt ist
+            logger.debug("Details für Session %s: %s", session_id, details)
+            return details
+        except Exception as e:
+            self._record_failure(session_id, e)
+            return None
+
+    def _record_failure(self, session_id: str, error: BaseException):
+        """Fehler beim Laden/Parsen: an der Session selbst -> Negativ-Cache, sonst nur loggen."""
+        if isinstance(error, CircuitOpenError):
+            logger.debug("Session %s uebersprungen: %s", session_id, error)
+        elif _is_target_failure(error):
+            negative_cache.record_failure(session_id, str(error))
+            logger.warning(f"Session {session_id} fehlgeschlagen: {error}")
+        else:
+            logger.error(f"Fehler beim Verarbeiten von Session {session_id}: {error}", exc_info=error)
+
+    def _cache_image(self, image_url: str):
+        try:
+            filename = os.path.basename(image_url.split("?")[0])
+            cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+            filepath = os.path.join(cache_dir, filename)
+            if os.path.exists(filepath):
+                logger.debug("Bild %s bereits gecached.", filename)
+                return
+
+            logger.debug("Lade Bild %s herunter...", filename)
+            resp = requests.get(image_url, timeout=15)
+            resp.raise_for_status()
+
+            with open(filepath, "wb") as f:
+                f.write(resp.content)
+            logger.debug("Bild %s erfolgreich gecached.", filename)
+        except Exception as e:
+            logger.error(f"Fehler beim Cachen des Bildes {image_url}: {e}", exc_info=True)
+
+cache_builder = CacheBuilder()
@@ -0,0 +1,104 @@
+# backend/cancellation.py
+"""
+Abbruch von Upstream-Arbeit, deren Ergebnis niemand mehr abholt (Client hat die Verbindung getrennt).
+main.py erzeugt pro Anfrage ein CancelToken und bindet es ueber eine ContextVar an den Thread,
+der den Crawler aufruft. Rate-Limiter, adaptive Slots, Retries, HTTP-Aufrufe und Browser-Renderings
+pruefen es und enden dann mit CancelledByClient. Ohne Token (Hintergrund-Threads wie CacheBuilder
+oder Prefetch) laeuft alles wie bisher.
+"""
+import contextvars
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CancelledByClient(Exception):
+    """Die Anfrage wurde abgebrochen, weil der Client nicht mehr verbunden ist."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """Bricht ab und ruft die registrierten Callbacks auf (im Thread des Aufrufers)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Abbruch-Callback fehlgeschlagen: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Registriert einen Callback fuer den Abbruch (z. B. Verbindung schliessen, Browser beenden).
+        Ist das Token bereits abgebrochen, laeuft er sofort.
+        Returns:
+            Funktion, die den Callback wieder abmeldet.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def _unregister():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+                return _unregister
+        callback()
+        return lambda: None
+
+    def wait(self, timeout: float) -> bool:
+        """Wartet hoechstens timeout Sekunden; True, wenn abgebrochen wurde."""
+        return self._event.wait(timeout)
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def run_with(token: Optional[CancelToken], fn: Callable, *args, **kwargs):
+    """Fuehrt fn mit token als aktuellem Abbruch-Token aus."""
+    reset = _current_token.set(token)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current_token.reset(reset)
+
+
+def check_cancelled():
+    """
+    Raises:
+        CancelledByClient: Wenn das aktuelle Token abgebrochen wurde.
+    """
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise CancelledByClient("Client getrennt, Upstream-Arbeit abgebrochen")
+
+
+def sleep(seconds: float):
+    """Wie time.sleep, endet aber bei Abbruch sofort mit CancelledByClient."""
+    token = _current_token.get()
+    if token is None:
+        if seconds > 0:
+            time.sleep(seconds)
+        return
+    if seconds > 0:
+        token.wait(seconds)
+    check_cancelled()
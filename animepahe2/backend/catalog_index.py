@@ -0,0 +1,286 @@
+# backend/catalog_index.py
+"""
+Spaltenorientierte Kopie des Katalogs im Speicher fuer Suche, Filter und Facetten-Zaehlung.
+Jede Zeile hat eine feste Zeilennummer; die Spalten sind Listen bzw. array-Arrays, wiederholte
+Werte (Typ, Genre, Studio, Jahr, Quelle) werden interniert. Pro Facettenwert gibt es eine Bitmap
+(Python-int, Bit i = Zeile i), Filterkombinationen sind damit einfache Bit-Schnittmengen.
+Aufgebaut wird aus SQLite (load_from_db); Schreibvorgaenge dieses Prozesses werden ueber den
+Write-Listener eingepflegt, ein Neuaufbau folgt bei Reload bzw. neuer Katalog-Generation.
+"""
+import logging
+import sys
+import threading
+import time
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .database import _normalize_type, _parse_year, _title_sort_key
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("type", "genre", "studio", "year")
+# Ausgabespalten, passend zu AnimeListItem
+_RESULT_COLUMNS = ("session", "title", "thumbnail", "type", "genre", "studio", "year", "source")
+
+
+def _intern(value) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _split_genres(genre: Optional[str]) -> List[str]:
+    return [g.strip() for g in genre.split(",") if g.strip()] if genre else []
+
+
+def _indices(bits: int) -> List[int]:
+    """Zeilennummern aller gesetzten Bits, aufsteigend."""
+    result = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        base = byte_index * 8
+        while byte:
+            low = byte & -byte
+            result.append(base + low.bit_length() - 1)
+            byte ^= low
+    return result
+
+
+class ColumnarCatalog:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.generation: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        self._row_of: Dict[str, int] = {}
+        self._columns: Dict[str, list] = {name: [] for name in _RESULT_COLUMNS}
+        self._title_lc: List[str] = []
+        self._title_sort: List[Optional[str]] = []
+        self._year_int = array("i")        # 0 = unbekannt
+        self._cached_at = array("d")
+        self._live = 0                     # Bitmap der gueltigen Zeilen
+        # Facette -> Schluessel -> Bitmap; Schluessel -> Anzeigewert
+        self._bitmaps: Dict[str, Dict[object, int]] = {facet: {} for facet in FACETS}
+        self._labels: Dict[str, Dict[object, str]] = {facet: {} for facet in FACETS}
+        # Sortierung -> (Zeilennummern in Reihenfolge, Rang pro Zeilennummer)
+        self._orders: Dict[str, Tuple[array, array]] = {}
+
+    # ---------- Aufbau und Pflege ----------
+    def load_from_db(self, db):
+        """Baut den Katalog komplett aus SQLite neu auf (db: AnimeCacheDB)."""
+        started = time.time()
+        try:
+            # Generation vor dem Lesen merken: spaetere Schreibvorgaenge fuehren so zu einem erneuten Aufbau
+            generation = db.get_generation()
+            rows = list(db.iter_rows(batch_size=5000))
+        except Exception as e:
+            logger.error(f"Spalten-Katalog konnte nicht aufgebaut werden: {e}", exc_info=True)
+            return
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._upsert_locked(row)
+            # Sortierungen gleich vorberechnen, damit die erste Anfrage nicht darauf wartet
+            for sort in ("title", "year", "recent"):
+                self._order_locked(sort)
+            self.generation = generation
+            self.ready = True
+        logger.info("Spalten-Katalog aufgebaut: %d Anime in %.0f ms (Generation %s)",
+                    len(rows), (time.time() - started) * 1000, generation)
+
+    def on_rows_written(self, rows: List[Dict]):
+        """Write-Listener fuer AnimeCacheDB.set_details_bulk: pflegt geaenderte Zeilen ein."""
+        with self._lock:
+            if not self.ready:
+                return
+            for row in rows:
+                if row.get("session"):
+                    self._upsert_locked(row)
+
+    def _upsert_locked(self, row: Dict):
+        session = row["session"]
+        index = self._row_of.get(session)
+        if index is None:
+            index = len(self._columns["session"])
+            self._row_of[session] = index
+            for name in _RESULT_COLUMNS:
+                self._columns[name].append(None)
+            self._title_lc.append("")
+            self._title_sort.append(None)
+            self._year_int.append(0)
+            self._cached_at.append(row.get("cached_at") or time.time())
+        else:
+            self._clear_facets_locked(index)
+            if row.get("cached_at"):
+                self._cached_at[index] = row["cached_at"]
+
+        for name in _RESULT_COLUMNS:
+            value = row.get(name)
+            self._columns[name][index] = value if name in ("session", "title", "thumbnail") else _intern(value)
+        title = row.get("title") or ""
+        self._title_lc[index] = title.lower()
+        self._title_sort[index] = _title_sort_key(row.get("title"))
+        self._year_int[index] = _parse_year(row.get("year")) or 0
+
+        bit = 1 << index
+        self._live |= bit
+        for facet, key, label in self._facet_keys(index):
+            bitmaps = self._bitmaps[facet]
+            bitmaps[key] = bitmaps.get(key, 0) | bit
+            self._labels[facet].setdefault(key, label)
+        self._orders.clear()
+
+    def _facet_keys(self, index: int) -> Iterable[Tuple[str, object, str]]:
+        anime_type = self._columns["type"][index]
+        if _normalize_type(anime_type):
+            yield "type", _normalize_type(anime_type), anime_type.strip()
+        for genre in _split_genres(self._columns["genre"][index]):
+            yield "genre", sys.intern(genre.lower()), sys.intern(genre)
+        studio = self._columns["studio"][index]
+        if studio:
+            yield "studio", studio, studio
+        if self._year_int[index]:
+            yield "year", self._year_int[index], str(self._year_int[index])
+
+    def _clear_facets_locked(self, index: int):
+        mask = ~(1 << index)
+        for facet, key, _label in self._facet_keys(index):
+            bitmaps = self._bitmaps[facet]
+            remaining = bitmaps.get(key, 0) & mask
+            if remaining:
+                bitmaps[key] = remaining
+            else:
+                bitmaps.pop(key, None)
+                self._labels[facet].pop(key, None)
+
+    def _order_locked(self, sort: str) -> Tuple[array, array]:
+        """Zeilennummern in Sortierreihenfolge (wie _SORT_ORDERS in database.py) und Rang pro Zeile."""
+        cached = self._orders.get(sort)
+        if cached is None:
+            rows = range(len(self._title_sort))
+            title_key = lambda i: (self._title_sort[i] is not None, self._title_sort[i] or "")
+            if sort == "year":
+                key = lambda i: (self._year_int[i] == 0, -self._year_int[i], title_key(i))
+            elif sort == "recent":
+                key = lambda i: -self._cached_at[i]
+            else:
+                key = title_key
+            order = array("I", sorted(rows, key=key))
+            rank = array("I", [0]) * len(order)
+            for position, row in enumerate(order):
+                rank[row] = position
+            cached = self._orders[sort] = (order, rank)
+        return cached
+
+    # ---------- Abfragen ----------
+    def _filter_bits_locked(self, type_filter: str = "All", genre_filter: str = "All", studio_filter: str = "All",
+                            year_filter: str = "All", year_from: Optional[int] = None, year_to: Optional[int] = None,
+                            sessions: Optional[List[str]] = None, exclude: Optional[str] = None) -> int:
+        """Bitmap aller Zeilen, die den Filtern entsprechen (`exclude`: diese Facette ignorieren)."""
+        bits = self._live
+        if type_filter and type_filter != "All" and exclude != "type":
+            bits &= self._bitmaps["type"].get(_normalize_type(type_filter), 0)
+        if genre_filter and genre_filter != "All" and exclude != "genre":
+            bits &= self._bitmaps["genre"].get(genre_filter.strip().lower(), 0)
+        if studio_filter and studio_filter != "All" and exclude != "studio":
+            bits &= self._bitmaps["studio"].get(studio_filter, 0)
+        if exclude != "year":
+            if year_filter and year_filter != "All":
+                bits &= self._bitmaps["year"].get(_parse_year(year_filter), 0)
+            if year_from is not None or year_to is not None:
+                low = year_from if year_from is not None else -1
+                high = year_to if year_to is not None else 1 << 30
+                in_range = 0
+                for year, year_bits in self._bitmaps["year"].items():
+                    if low <= year <= high:
+                        in_range |= year_bits
+                bits &= in_range
+        if sessions is not None:
+            wanted = 0
+            for session in sessions:
+                index = self._row_of.get(session)
+                if index is not None:
+                    wanted |= 1 << index
+            bits &= wanted
+        return bits
+
+    def _text_bits_locked(self, query: str, bits: int) -> int:
+        """Schraenkt `bits` auf Titel ein, die `query` enthalten (wie LIKE '%query%')."""
+        needle = query.lower()
+        titles = self._title_lc
+        candidates = _indices(bits) if bits.bit_count() < len(titles) // 4 else range(len(titles))
+        matched = 0
+        for i in candidates:
+            if needle in titles[i]:
+                matched |= 1 << i
+        return bits & matched
+
+    def search(self, query: str = "", type_filter: str = "All", genre_filter: str = "All", studio_filter: str = "All",
+               year_filter: str = "All", sort: str = "title", year_from: Optional[int] = None,
+               year_to: Optional[int] = None, limit: Optional[int] = None, offset: int = 0,
+               sessions: Optional[List[str]] = None) -> Tuple[List[Dict], int]:
+        """
+        Gleiche Semantik wie AnimeCacheDB.search_cached_anime (Genre aber als exakter Listeneintrag).
+        Returns:
+            (Zeilen der angefragten Seite, Gesamtzahl der Treffer)
+        """
+        with self._lock:
+            bits = self._filter_bits_locked(type_filter, genre_filter, studio_filter, year_filter,
+                                            year_from, year_to, sessions)
+            if query:
+                bits = self._text_bits_locked(query, bits)
+            total = bits.bit_count()
+            end = None if limit is None else offset + limit
+            order, rank = self._order_locked(sort)
+            if bits == self._live:
+                ordered = order[offset:end]
+            elif total > len(order) // 8:
+                # Viele Treffer: in Sortierreihenfolge laufen, bis die Seite voll ist
+                mask = bytearray(len(order))
+                for i in _indices(bits):
+                    mask[i] = 1
+                ordered = list(islice((i for i in order if mask[i]), offset, end))
+            else:
+                ordered = sorted(_indices(bits), key=rank.__getitem__)[offset:end]
+            columns = self._columns
+            results = [{name: columns[name][i] for name in _RESULT_COLUMNS} for i in ordered]
+        return results, total
+
+    def facet_counts(self, query: str = "", type_filter: str = "All", genre_filter: str = "All",
+                     studio_filter: str = "All", year_filter: str = "All", year_from: Optional[int] = None,
+                     year_to: Optional[int] = None) -> Dict:
+        """
+        Trefferzahl pro Facettenwert. Fuer jede Facette gelten alle anderen Filter, nur ihr eigener
+        nicht, damit die Auswahl innerhalb einer Facette sichtbar bleibt.
+        """
+        filters = dict(type_filter=type_filter, genre_filter=genre_filter, studio_filter=studio_filter,
+                       year_filter=year_filter, year_from=year_from, year_to=year_to)
+        with self._lock:
+            text_bits = self._text_bits_locked(query, self._live) if query else self._live
+            total = (self._filter_bits_locked(**filters) & text_bits).bit_count()
+            counts = {}
+            for facet in FACETS:
+                base = self._filter_bits_locked(**filters, exclude=facet) & text_bits
+                labels = self._labels[facet]
+                counts[facet] = {labels[key]: n for key, bitmap in self._bitmaps[facet].items()
+                                 if (n := (bitmap & base).bit_count())}
+        return {"total": total, **counts}
+
+    def filter_options(self) -> Dict[str, List[str]]:
+        """Alle Facettenwerte im Format von AnimeCacheDB.get_unique_filters."""
+        with self._lock:
+            labels = {facet: list(self._labels[facet].values()) for facet in FACETS}
+        return {
+            "types": ["All"] + sorted(set(labels["type"])),
+            "genres": ["All"] + sorted(set(labels["genre"])),
+            "studios": ["All"] + sorted(set(labels["studio"])),
+            "years": ["All"] + sorted(set(labels["year"]), reverse=True),
+        }
+
+    def __len__(self) -> int:
+        return self._live.bit_count()
+
+
+# Globale Instanz
+catalog_index = ColumnarCatalog()
@@ -0,0 +1,131 @@
+# backend/circuit_breaker.py
+"""
+Circuit Breaker pro Upstream-Host. Nach CIRCUIT_FAILURE_THRESHOLD Fehlschlaegen in Folge
+(Netzwerkfehler, Timeouts, 429, 5xx) ist der Breaker offen: Aufrufe scheitern sofort mit
+CircuitOpenError, statt Timeouts und Retries abzuwarten. Nach Ablauf der Sperrzeit laesst er
+einen einzelnen Probe-Aufruf durch (halboffen); gelingt er, ist der Breaker wieder geschlossen,
+sonst bleibt er mit verdoppelter Sperrzeit offen.
+"""
+import logging
+import threading
+import time
+from typing import Dict
+
+import requests
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.RequestException):
+    """Der Breaker des Hosts ist offen; der Aufruf wurde gar nicht erst gesendet."""
+
+
+class CircuitBreaker:
+    def __init__(self, host: str,
+                 failure_threshold: int = CONFIG.get("CIRCUIT_FAILURE_THRESHOLD", 5),
+                 open_sec: float = CONFIG.get("CIRCUIT_OPEN_SEC", 30),
+                 max_open_sec: float = CONFIG.get("CIRCUIT_MAX_OPEN_SEC", 600)):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.base_open_sec = open_sec
+        self.max_open_sec = max_open_sec
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_sec = open_sec
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def before_call(self):
+        """
+        Prueft, ob ein Aufruf erlaubt ist.
+        Raises:
+            CircuitOpenError: Breaker offen bzw. die halboffene Probe laeuft bereits.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_sec:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info("Circuit Breaker %s halboffen: sende Probe-Aufruf", self.host)
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.opened_at + self.open_sec - time.time())
+        raise CircuitOpenError(f"Upstream {self.host} nicht verfuegbar (Breaker offen, naechster Versuch in {retry_in:.0f}s)")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit Breaker %s geschlossen: Upstream antwortet wieder", self.host)
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.open_sec = self.base_open_sec
+            self._probe_in_flight = False
+
+    def record_failure(self, reason: str):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # Probe gescheitert: laenger gesperrt bleiben
+                self.open_sec = min(self.max_open_sec, self.open_sec * 2)
+            elif self.consecutive_failures < self.failure_threshold:
+                return
+            if self.state != OPEN:
+                logger.warning("Circuit Breaker %s geoeffnet fuer %.0fs (%s, %d Fehlschlaege in Folge)",
+                               self.host, self.open_sec, reason, self.consecutive_failures)
+            self.state = OPEN
+            self.opened_at = time.time()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Der erlaubte Aufruf wurde nicht gesendet (Client-Abbruch): die halboffene Probe wieder freigeben."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == OPEN and time.time() - self.opened_at < self.open_sec
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for_sec": round(max(0.0, self.opened_at + self.open_sec - time.time()), 1) if self.state == OPEN else 0.0,
+                "rejected": self.rejected
+            }
+
+
+class CircuitBreakers:
+    """Ein CircuitBreaker pro Host."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_host(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host)
+                self._breakers[host] = breaker
+            return breaker
+
+    def stats(self) -> Dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.stats() for host, breaker in breakers.items()}
+
+
+# Globale Instanz
+upstream_breakers = CircuitBreakers()
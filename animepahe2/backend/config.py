@@ -1,29 +1,101 @@
-# backend/config.py
-import os
-
-# Basis-Konfiguration
-CONFIG = {
-    "IMAGE_CACHE_DIR": "cached_images",
-    "DATABASE_PATH": "anime_cache.db",
-    "PAGE_SIZE": 20,
-    "BATCH_SIZE": 100,
-    "MAX_WORKER_THREADS": 5,
-    "IMAGE_CACHE_MAX_WORKERS": 5,
-    "ANILIST_API_URL": "https://graphql.anilist.co",
-    "JIKAN_API_BASE_URL": "https://api.jikan.moe/v4",
-    "ANIMEPAHE_BASE_URL": "https://animepahe.ru",
-    "DEFAULT_USER_AGENT": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    "DEFAULT_IMAGE_SIZE": (200, 300),
-    "LOGGING_LEVEL": "INFO",  # Wird später in logging konvertiert
-    "PLAYER_COMMAND": ["mpv"],
-    "BACKGROUND_CACHE_INTERVAL_MS": 30000,       # 30 Sekunden, falls du das brauchst
-    "BACKGROUND_CACHE_BATCH_SIZE": 5,            # Anzahl der Animes pro Batch
-    "PROACTIVE_CACHE_INTERVAL_MS": 120000,       # 2 Minuten (120.000 ms)
-    # Für den CacheBuilder:
-    "CACHE_BUILDER_INTERVAL_SEC": 300,           # 5 Minuten
-    "CACHE_BUILDER_LIMIT_PER_CYCLE": 100          # Wie viele fehlende Animes pro Zyklus verarbeitet werden
-}
-
-# Stelle sicher, dass das Cache-Verzeichnis existiert
-if not os.path.exists(CONFIG["IMAGE_CACHE_DIR"]):
-    os.makedirs(CONFIG["IMAGE_CACHE_DIR"])
+# backend/config.py
+import os
+
+# Basis-Konfiguration
+CONFIG = {
+    "IMAGE_CACHE_DIR": "cached_images",
+    "DATABASE_PATH": "anime_cache.db",
+    "PAGE_SIZE": 20,
+    "BATCH_SIZE": 100,
+    "MAX_WORKER_THREADS": 5,
+    "BATCH_DETAILS_CONCURRENCY": 4,              # Parallele Upstream-Abrufe fuer /api/anime/batch (nur Cache-Misses)
+    "CLIENT_DISCONNECT_POLL_SEC": 0.5,           # Abstand der Pruefung, ob der Client bei laufender Upstream-Arbeit noch verbunden ist
+    "IMAGE_CACHE_MAX_WORKERS": 5,
+    "ANILIST_API_URL": "https://graphql.anilist.co",
+    "JIKAN_API_BASE_URL": "https://api.jikan.moe/v4",
+    "ANIMEPAHE_BASE_URL": "https://animepahe.ru",
+    "DEFAULT_USER_AGENT": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    "DEFAULT_IMAGE_SIZE": (200, 300),
+    "LOGGING_LEVEL": "INFO",  # Wird später in logging konvertiert
+    "PLAYER_COMMAND": ["mpv"],
+    "PLAYER_PLAYLIST_DIR": "playlists",          # M3U-Playlists fuer den externen Player
+    "PLAYER_RESOLVE_CONCURRENCY": 3,             # Gleichzeitig aufgeloeste Episoden fuer /api/play_external
+    "PLAYER_USE_HLS_PROXY": False,               # Player ueber den lokalen HLS-Proxy statt direkt vom CDN laden
+    "PLAYER_STATUS_POLL_SEC": 0.5,               # So oft prueft der startende Worker Prozessende und Stopp-Anfragen
+    "BACKGROUND_CACHE_INTERVAL_MS": 30000,       # 30 Sekunden, falls du das brauchst
+    "BACKGROUND_CACHE_BATCH_SIZE": 5,            # Anzahl der Animes pro Batch
+    "PROACTIVE_CACHE_INTERVAL_MS": 120000,       # 2 Minuten (120.000 ms)
+    # Für den CacheBuilder:
+    "CACHE_BUILDER_INTERVAL_SEC": 300,           # 5 Minuten
+    "CACHE_BUILDER_LIMIT_PER_CYCLE": 100,         # Wie viele fehlende Animes pro Zyklus verarbeitet werden
+    "CATALOG_REBUILD_MIN_COMPLETENESS": 0.9,      # Neuaufbau wird nur uebernommen, wenn mind. 90 % der Anime geladen wurden
+    # Cloudflare-Cookies werden persistiert, damit Neustarts sie wiederverwenden
+    "COOKIE_JAR_PATH": "cookie_jar.json",
+    "COOKIE_JAR_MAX_AGE_SEC": 6 * 3600,          # Obergrenze, falls cf_clearance kein Ablaufdatum hat
+    "COOKIE_WAIT_TIMEOUT_SEC": 120,               # Wie lange der CacheBuilder beim Start auf Cookies wartet
+    "CLEARANCE_REFRESH_COOLDOWN_SEC": 60,         # Mindestabstand zwischen zwei Clearance-Refreshes (403/Challenge)
+    # HTTP-Cache fuer Upstream-Seiten (ETag/Last-Modified); innerhalb der Frische kein Upstream-Request
+    "HTTP_CACHE_DIR": "http_cache",
+    "HTTP_CACHE_FRESHNESS_SEC": {
+        "detail": 24 * 3600,                      # /anime/{session}
+        "index": 3600,                            # /anime
+        "release": 300                            # /api?m=release (Episodenlisten)
+    },
+    # Mehrere Worker-Prozesse (uvicorn --workers N) koordinieren sich ueber diese SQLite-Datei
+    "COORDINATION_DB_PATH": "coordination.db",
+    "LEADER_LEASE_TTL_SEC": 30,                   # Lease fuer CacheBuilder/Cookie-Refresh
+    "SHARED_RATE_LIMITS": True,                   # Rate-Limits gelten ueber alle Worker hinweg
+    "SHARED_RATE_SYNC_SEC": 1.0,                  # So oft schreibt ein Worker seine angepasste Rate hoechstens in die Koordinations-DB
+    "CLEARANCE_FOLLOWER_WAIT_SEC": 45,            # Wie lange Follower auf neue Cookies vom Leader warten
+    # Lokaler HLS-Proxy (/api/hls/...): Segment-Cache auf der Platte und Read-Ahead
+    "HLS_CACHE_DIR": "hls_cache",
+    "HLS_CACHE_MAX_BYTES": 2 * 1024 ** 3,         # 2 GB, danach werden die aeltesten Segmente verdraengt
+    "HLS_READ_AHEAD_SEGMENTS": 3,                 # So viele folgende Segmente werden vorab geladen
+    "HLS_FETCH_WORKERS": 4,                       # Gepoolte Verbindungen/Threads fuer Segment-Downloads
+    "HLS_UPSTREAM_REFERER": "https://kwik.si/",   # Die Stream-CDNs erwarten den Kwik-Player als Referer
+    "HLS_MAX_STREAMS": 32,                        # So viele Episoden (URL-Zuordnung) haelt der Proxy, aelteste zuerst verdraengt
+    # Vorab-Aufloesen der naechsten Episoden (niedrige Prioritaet)
+    "PREFETCH_EPISODES": 2,                       # So viele folgende Episoden werden vorab aufgeloest
+    "PREFETCH_MAX_PER_MINUTE": 4,                 # Eigenes Budget, zusaetzlich zum Upstream-Rate-Limit
+    "PREFETCH_MAX_FOREGROUND_FLIGHTS": 2,         # Prefetch wartet, solange mindestens so viele Crawler-Aufrufe laufen
+    "PREFETCH_CANCEL_POLL_SEC": 0.5,              # So oft prueft der Worker mit dem Plan auf Abbruchsignale anderer Worker
+    "STREAM_URL_TTL_SEC": 1800,                   # So lange gilt eine aufgeloeste m3u8-URL als gueltig (Prefetch und HLS-Proxy)
+    # Kwik-Links: Play-Seite zuerst per HTTP laden, Chrome nur als Fallback
+    "KWIK_HTTP_TIER": True,                       # False: immer im Browser rendern (altes Verhalten)
+    "KWIK_BROWSER_MEMORY_SEC": 3600,              # So lange geht ein Anime, der den Browser brauchte, direkt dorthin
+    "LOG_FILE": None,                             # Optional zusaetzlich in diese Datei loggen (rotierend)
+    "LOG_SAMPLE_BURST": 20,                       # Max. Meldungen pro Aufrufstelle und Fenster (unter ERROR)
+    "LOG_SAMPLE_WINDOW_SEC": 60,
+    "DEBUG_DUMPS": False,                         # Debug-Artefakte (z. B. gerenderte Seiten) schreiben
+    "DEBUG_DUMP_DIR": "debug_dumps",
+    # Adaptive Upstream-Limits (AIMD) pro Host; Startrate ist die des jeweiligen Rate-Limiters
+    "ADAPTIVE_MIN_RATE": 0.5,                     # Requests/s, Untergrenze nach Absenkungen
+    "ADAPTIVE_MAX_RATE": 6,                       # Requests/s, Obergrenze bei gesundem Upstream
+    "ADAPTIVE_RATE_STEP": 0.25,                   # Additive Erhoehung pro Runde gesunder Antworten
+    "ADAPTIVE_MIN_CONCURRENCY": 1,
+    "ADAPTIVE_MAX_CONCURRENCY": 8,
+    "ADAPTIVE_INITIAL_CONCURRENCY": 2,
+    "ADAPTIVE_DECREASE_FACTOR": 0.5,              # Multiplikative Absenkung bei 403/429/5xx/Timeouts
+    "ADAPTIVE_LATENCY_SPIKE_FACTOR": 3.0,         # Latenz > Faktor * gleitendes Mittel gilt als Ueberlast
+    "ADAPTIVE_LATENCY_FLOOR_SEC": 2.0,            # ... aber erst oberhalb dieser absoluten Latenz
+    "CIRCUIT_FAILURE_THRESHOLD": 5,               # Fehlschlaege in Folge, bis der Breaker eines Hosts oeffnet
+    "CIRCUIT_OPEN_SEC": 30,                       # Sperrzeit bis zum Probe-Aufruf (verdoppelt sich bei Misserfolg)
+    "CIRCUIT_MAX_OPEN_SEC": 600,
+    "NEGATIVE_CACHE_DB_PATH": "negative_cache.db",
+    "NEGATIVE_CACHE_BASE_SEC": 3600,              # Erste Sperre einer fehlgeschlagenen Session
+    "NEGATIVE_CACHE_MAX_SEC": 604800,             # Obergrenze der exponentiell wachsenden Sperre (7 Tage)
+    "ENRICHMENT_ENABLED": True,                   # Fehlende Facetten nach jedem CacheBuilder-Zyklus aus AniList ergaenzen
+    "ENRICHMENT_DB_PATH": "enrichment.db",
+    "ENRICHMENT_BATCH_SIZE": 10,                  # Titel pro GraphQL-Anfrage (Aliase q0..q9)
+    "ENRICHMENT_LOOKUPS_PER_CYCLE": 50,           # Neue AniList-Suchen pro Zyklus; Cache-Treffer zaehlen nicht
+    "ENRICHMENT_TTL_SEC": 2592000,                # Gueltigkeit gecachter AniList-Metadaten (30 Tage)
+    "ENRICHMENT_MISS_TTL_SEC": 604800,            # Erst nach 7 Tagen erneut suchen, wenn es keinen Treffer gab
+    "ENRICHMENT_MIN_TITLE_SIMILARITY": 0.85,      # Treffer mit unaehnlichem Titel werden verworfen
+    "PARSE_POOL_WORKERS": None,                   # Prozesse fuers HTML-Parsen; None = CPU-Kerne - 1 (max. 4), 0 = im Thread parsen
+    "CRAWL_FETCH_WORKERS": 2,                     # Fetch-Threads der Crawl-Pipeline (Rate-Limiter gilt weiterhin)
+    "CRAWL_QUEUE_SIZE": 16                        # Max. geladene, noch ungeparste Seiten zwischen Fetch und Parse
+}
+
+# Stelle sicher, dass das Cache-Verzeichnis existiert
+if not os.path.exists(CONFIG["IMAGE_CACHE_DIR"]):
+    os.makedirs(CONFIG["IMAGE_CACHE_DIR"])
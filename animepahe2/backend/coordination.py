@@ -0,0 +1,355 @@
+# backend/coordination.py
+"""
+Koordination mehrerer Worker-Prozesse (z. B. uvicorn --workers 4) ueber eine lokale SQLite-Datei.
+- LeaderElector: genau ein Worker haelt eine Lease und betreibt CacheBuilder und Cookie-Refresh.
+- SharedRateLimiter: Rate-Limit, das sich alle Worker teilen (naechster Slot und aktuelle Rate).
+- Clearance-Anfragen: Follower bitten den Leader um einen Cookie-Refresh.
+- PlayerRegistry: gestartete externe Player, damit jeder Worker Status und Stopp beantworten kann.
+"""
+import logging
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .cancellation import sleep as cancellable_sleep
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # isolation_level=None: Transaktionen werden explizit mit BEGIN IMMEDIATE gesteuert
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_coordination_db(db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db")):
+    """Erstellt die Tabellen der Koordinations-Datenbank, falls noetig."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT, expires_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_limits "
+                     "(name TEXT PRIMARY KEY, next_slot REAL, rate REAL, base_rate REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS signals (name TEXT PRIMARY KEY, raised_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS players (handle TEXT PRIMARY KEY, holder TEXT, pid INTEGER, "
+                     "playlist_path TEXT, titles TEXT, started_at REAL, running INTEGER, returncode INTEGER, "
+                     "stop_requested INTEGER DEFAULT 0)")
+        # Aeltere Koordinations-DBs kennen die Spalten rate/base_rate noch nicht
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(rate_limits)")]
+        for column in ("rate", "base_rate"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE rate_limits ADD COLUMN {column} REAL")
+    finally:
+        conn.close()
+
+
+class SharedRateLimiter:
+    """
+    Rate-Limiter mit derselben Schnittstelle wie crawler.RateLimiter, dessen Zustand
+    (naechster freier Slot und aktuelle Rate) in der Koordinations-DB liegt und damit fuer alle
+    Worker gilt. Senkt der AdaptiveController eines Workers max_per_second, reservieren auch
+    die anderen Worker ihre Slots kurz darauf mit der niedrigeren Rate.
+    Das Setzen von max_per_second aendert nur die lokale Kopie; sie wird beim naechsten
+    Reservieren (hoechstens alle rate_sync_sec) in derselben Transaktion wie der Slot geschrieben.
+    """
+    def __init__(self, name: str, max_per_second: float,
+                 db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db"),
+                 rate_sync_sec: float = CONFIG.get("SHARED_RATE_SYNC_SEC", 1.0)):
+        self.name = name
+        self.base_rate = max_per_second
+        self.db_path = db_path
+        self.rate_sync_sec = rate_sync_sec
+        self.last_call = 0
+        # Lokale Kopie der geteilten Rate; Fallback, wenn die DB nicht erreichbar ist
+        self._rate = max_per_second
+        self._rate_dirty = False
+        self._rate_written_at = 0.0
+        init_coordination_db(db_path)
+        self._init_rate()
+
+    def _init_rate(self):
+        # Angepasste Raten ueberleben einen Neustart nur, solange die konfigurierte Basis gleich bleibt
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO rate_limits (name, next_slot, rate, base_rate) VALUES (?, 0, ?, ?)",
+                         (self.name, self.base_rate, self.base_rate))
+            conn.execute("UPDATE rate_limits SET rate = ?, base_rate = ? "
+                         "WHERE name = ? AND (rate IS NULL OR base_rate IS NULL OR base_rate != ?)",
+                         (self.base_rate, self.base_rate, self.name, self.base_rate))
+            self._rate = conn.execute("SELECT rate FROM rate_limits WHERE name = ?", (self.name,)).fetchone()[0]
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def reset_rate(self):
+        """Setzt die geteilte Rate auf die konfigurierte Basis zurueck (z. B. wenn ein Worker Leader wird)."""
+        self._rate, self._rate_dirty = self.base_rate, False
+        try:
+            conn = _connect(self.db_path)
+            try:
+                conn.execute("UPDATE rate_limits SET rate = ?, base_rate = ? WHERE name = ?",
+                             (self.base_rate, self.base_rate, self.name))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Geteilte Rate '{self.name}' nicht zurueckgesetzt: {e}")
+
+    @property
+    def max_per_second(self) -> float:
+        """Aktuelle Rate; beim Reservieren eines Slots mit der Koordinations-DB abgeglichen."""
+        return self._rate
+
+    @max_per_second.setter
+    def max_per_second(self, value: float):
+        # Ohne Datenbankzugriff: der AdaptiveController ruft das unter seinem Lock auf
+        self._rate = value
+        self._rate_dirty = True
+
+    def _reserve_slot(self) -> float:
+        """Reserviert atomar den naechsten freien Zeitslot (mit der geteilten Rate) und gibt ihn zurueck."""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_slot, rate FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            slot = max(now, row[0] if row else 0.0)
+            stored_rate = row[1] if row and row[1] else self._rate
+            if self._rate_dirty:
+                # Eigene Anpassung hoechstens alle rate_sync_sec schreiben, bis dahin nur lokal anwenden
+                if now - self._rate_written_at >= self.rate_sync_sec:
+                    stored_rate = self._rate
+                    self._rate_dirty = False
+                    self._rate_written_at = now
+            else:
+                self._rate = stored_rate
+            conn.execute("INSERT INTO rate_limits (name, next_slot, rate, base_rate) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET next_slot = excluded.next_slot, rate = excluded.rate",
+                         (self.name, slot + 1.0 / self._rate, stored_rate, self.base_rate))
+            conn.execute("COMMIT")
+            return slot
+        finally:
+            conn.close()
+
+    def idle(self) -> bool:
+        """True, wenn ein Aufruf jetzt ohne Wartezeit moeglich waere (kein Worker hat den naechsten Slot belegt)."""
+        try:
+            conn = _connect(self.db_path)
+            try:
+                row = conn.execute("SELECT next_slot FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return time.time() - self.last_call >= 1.0 / self._rate
+        return row is None or row[0] <= time.time()
+
+    def wait(self):
+        try:
+            slot = self._reserve_slot()
+        except sqlite3.Error as e:
+            # Fallback auf prozesslokales Limit, damit ein DB-Problem nicht alle Requests blockiert
+            logger.warning(f"Geteiltes Rate-Limit '{self.name}' nicht verfuegbar, nutze lokales Limit: {e}")
+            slot = max(time.time(), self.last_call + 1.0 / self._rate)
+        delay = slot - time.time()
+        if delay > 0:
+            cancellable_sleep(delay)
+        self.last_call = time.time()
+
+
+def raise_signal(name: str, db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db")):
+    """Setzt ein prozessuebergreifendes Signal (z. B. 'clearance_refresh')."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("INSERT OR REPLACE INTO signals (name, raised_at) VALUES (?, ?)", (name, time.time()))
+    finally:
+        conn.close()
+
+
+def signal_raised_at(name: str, db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db")) -> float:
+    """Zeitpunkt, zu dem das Signal zuletzt gesetzt wurde (0, wenn nie)."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT raised_at FROM signals WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0.0
+    finally:
+        conn.close()
+
+
+class PlayerRegistry:
+    """
+    Gestartete externe Player aller Worker. Den Prozess kann nur der startende Worker abfragen
+    und beenden; er traegt den Zustand hier ein und fuehrt Stopp-Anfragen anderer Worker aus.
+    """
+    def __init__(self, db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db")):
+        self.db_path = db_path
+        init_coordination_db(db_path)
+
+    def publish(self, handle: str, holder: str, pid: int, playlist_path: str, titles: List[str], started_at: float):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("INSERT OR REPLACE INTO players (handle, holder, pid, playlist_path, titles, started_at, "
+                         "running, returncode, stop_requested) VALUES (?, ?, ?, ?, ?, ?, 1, NULL, 0)",
+                         (handle, holder, pid, playlist_path, json.dumps(titles), started_at))
+        finally:
+            conn.close()
+
+    def update(self, handle: str, running: bool, returncode: Optional[int]):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("UPDATE players SET running = ?, returncode = ? WHERE handle = ?",
+                         (int(running), returncode, handle))
+        finally:
+            conn.close()
+
+    def get(self, handle: str) -> Optional[Dict]:
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT handle, holder, pid, playlist_path, titles, started_at, running, returncode "
+                               "FROM players WHERE handle = ?", (handle,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"handle": row[0], "holder": row[1], "pid": row[2], "playlist_path": row[3],
+                "episodes": json.loads(row[4] or "[]"), "started_at": row[5],
+                "running": bool(row[6]), "returncode": row[7]}
+
+    def request_stop(self, handle: str):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("UPDATE players SET stop_requested = 1 WHERE handle = ?", (handle,))
+        finally:
+            conn.close()
+
+    def stop_requests(self, holder: str) -> List[str]:
+        """Handles dieses Workers, fuer die ein anderer Worker den Stopp angefordert hat."""
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT handle FROM players WHERE holder = ? AND running = 1 AND stop_requested = 1",
+                                (holder,)).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+    def remove(self, handle: str):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("DELETE FROM players WHERE handle = ?", (handle,))
+        finally:
+            conn.close()
+
+
+class LeaderElector:
+    """
+    Lease-basierte Leader-Wahl. Jeder Worker versucht periodisch, die Lease zu erwerben
+    bzw. zu verlaengern; laeuft sie ab (Worker haengt oder ist beendet), uebernimmt ein anderer.
+    """
+    def __init__(self, name: str, ttl_sec: float = CONFIG.get("LEADER_LEASE_TTL_SEC", 30),
+                 db_path: str = CONFIG.get("COORDINATION_DB_PATH", "coordination.db")):
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.db_path = db_path
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def try_acquire(self) -> bool:
+        """Erwirbt oder verlaengert die Lease. Returns: True, wenn dieser Worker Leader ist."""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            if row is None or row[0] == self.holder_id or row[1] < now:
+                conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                             (self.name, self.holder_id, now + self.ttl_sec))
+                acquired = True
+            else:
+                acquired = False
+            conn.execute("COMMIT")
+            return acquired
+        finally:
+            conn.close()
+
+    def release(self):
+        """Gibt die Lease frei, damit ein anderer Worker sofort uebernehmen kann."""
+        try:
+            conn = _connect(self.db_path)
+            try:
+                conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder_id))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Lease '{self.name}' konnte nicht freigegeben werden: {e}")
+        self.is_leader = False
+
+    def start(self, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+              on_tick: Optional[Callable[[bool], None]] = None):
+        """
+        Startet den Wahl-Thread.
+        Args:
+            on_elected: Wird aufgerufen, wenn dieser Worker Leader wird.
+            on_demoted: Wird aufgerufen, wenn die Lease verloren geht.
+            on_tick: Optional, wird bei jedem Durchlauf mit dem aktuellen Leader-Status aufgerufen.
+        """
+        init_coordination_db(self.db_path)
+        self._stop_event.clear()
+
+        def _run():
+            while not self._stop_event.is_set():
+                try:
+                    leader_now = self.try_acquire()
+                except sqlite3.Error as e:
+                    logger.error(f"Leader-Wahl '{self.name}' fehlgeschlagen: {e}")
+                    leader_now = False
+                if leader_now and not self.is_leader:
+                    logger.info(f"Worker {self.holder_id} ist Leader fuer '{self.name}'.")
+                    self.is_leader = True
+                    try:
+                        on_elected()
+                    except Exception as e:
+                        # Halb gestarteter Leader: Lease abgeben, damit kein zweiter Worker parallel schreibt
+                        logger.error(f"Start als Leader fehlgeschlagen, gebe Lease '{self.name}' ab: {e}", exc_info=True)
+                        self._abdicate(on_demoted)
+                elif not leader_now and self.is_leader:
+                    logger.warning(f"Worker {self.holder_id} hat die Lease '{self.name}' verloren.")
+                    self.is_leader = False
+                    try:
+                        on_demoted()
+                    except Exception as e:
+                        logger.error(f"Fehler beim Abgeben der Leader-Rolle: {e}", exc_info=True)
+                if on_tick:
+                    try:
+                        on_tick(self.is_leader)
+                    except Exception as e:
+                        logger.error(f"Fehler im Leader-Tick: {e}", exc_info=True)
+                self._stop_event.wait(self.ttl_sec / 3)
+
+        self._thread = threading.Thread(target=_run, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _abdicate(self, on_demoted: Callable[[], None]):
+        """Raeumt nach einem fehlgeschlagenen on_elected auf und gibt die Lease frei."""
+        try:
+            on_demoted()
+        except Exception as e:
+            logger.error(f"Fehler beim Abgeben der Leader-Rolle: {e}", exc_info=True)
+        self.release()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        if self.is_leader:
+            self.release()
+
+
+# Globale Instanz: Lease fuer CacheBuilder und Cookie-Refresh
+leader_elector = LeaderElector("cache_builder")
@@ -0,0 +1,113 @@
+# backend/crawl_pipeline.py
+"""
+Zweistufige Crawl-Pipeline fuer Detailseiten: Fetch-Threads laden rohes HTML (I/O, Rate-Limiter
+und Circuit Breaker greifen wie gewohnt im Crawler), der Parse-Schritt laeuft im Prozess-Pool
+(parse_pool.py). Die Stufen sind ueber eine begrenzte Queue verbunden; ist sie voll, warten die
+Fetch-Threads (Backpressure), statt HTML unbegrenzt im Speicher zu sammeln.
+"""
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from .parse_pool import parse_pool
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Markiert das Ende eines Fetch-Threads in der Queue
+_DONE = object()
+
+
+def crawl_details(sessions: Iterable[str], fetch: Callable[[str], bytes], parse: Callable,
+                  fetch_workers: int = CONFIG.get("CRAWL_FETCH_WORKERS", 2),
+                  queue_size: int = CONFIG.get("CRAWL_QUEUE_SIZE", 16),
+                  stop_event: Optional[threading.Event] = None
+                  ) -> Iterator[Tuple[str, Optional[dict], Optional[BaseException]]]:
+    """
+    Laedt und parst die Detailseiten von `sessions`.
+    Args:
+        fetch: Session -> rohes HTML (laeuft in den Fetch-Threads)
+        parse: picklebarer Parser auf Modulebene, HTML -> dict (laeuft im Prozess-Pool)
+        stop_event: bricht die Pipeline ab; bereits geladene Seiten werden verworfen
+    Yields:
+        (session, geparstes dict oder None, Fehler oder None); Fetch-Fehler sofort, sonst in Ladereihenfolge
+    """
+    work: "queue.Queue[str]" = queue.Queue()
+    for session in sessions:
+        work.put(session)
+    raw: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    stop = stop_event or threading.Event()
+    cancelled = threading.Event()
+
+    def _put(item) -> bool:
+        # Nicht endlos blockieren, falls der Verbraucher abgebrochen hat
+        while not (stop.is_set() or cancelled.is_set()):
+            try:
+                raw.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_loop():
+        try:
+            while not (stop.is_set() or cancelled.is_set()):
+                try:
+                    session = work.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    item = (session, fetch(session), None)
+                except Exception as e:
+                    item = (session, None, e)
+                if not _put(item):
+                    break
+        finally:
+            _put(_DONE)
+
+    workers = max(1, fetch_workers)
+    threads = [threading.Thread(target=_fetch_loop, name=f"crawl-fetch-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # Parse-Stufe: hoechstens queue_size Seiten gleichzeitig im Pool
+    pending: deque = deque()
+    running = workers
+    try:
+        while running or pending:
+            if stop.is_set():
+                break
+            if running and len(pending) < raw.maxsize:
+                try:
+                    item = raw.get(timeout=0.1 if pending else 0.5)
+                except queue.Empty:
+                    item = None
+                if item is _DONE:
+                    running -= 1
+                elif item is not None:
+                    session, html, error = item
+                    if error is not None:
+                        yield session, None, error
+                    else:
+                        pending.append((session, html, parse_pool.submit(parse, html)))
+            while pending and (pending[0][2].done() or not running or len(pending) >= raw.maxsize):
+                session, html, future = pending.popleft()
+                try:
+                    try:
+                        parsed = future.result()
+                    except BrokenProcessPool:
+                        # Pool abgestuerzt: run() ersetzt ihn bzw. parst im Thread
+                        parsed = parse_pool.run(parse, html)
+                except Exception as e:
+                    yield session, None, e
+                else:
+                    yield session, parsed, None
+    finally:
+        cancelled.set()
+        for _session, _html, future in pending:
+            future.cancel()
+        for thread in threads:
+            thread.join(timeout=5)
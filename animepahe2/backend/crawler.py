@@ -1,515 +1,799 @@
-# backend/crawler.py
-"""
-AnimePahe Crawler: Scraping-Logik fuer die neue Webanwendung.
-Basierend auf dem alten AnimePaheStreamer-Code.
-"""
-import requests
-import re
-import jsbeautifier
-import time
-import logging
-import random
-from urllib.parse import quote_plus, urlparse
-from bs4 import BeautifulSoup
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-import undetected_chromedriver as uc
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
-
-from .utils import cache_image, clean_title
-from .config import CONFIG
-
-logger = logging.getLogger(__name__)
-
-# Rate Limiter (vereinfacht)
-class RateLimiter:
-    def __init__(self, max_per_second: int):
-        self.max_per_second = max_per_second
-        self.last_call = 0
-
-    def wait(self):
-        elapsed = time.time() - self.last_call
-        if elapsed < 1.0 / self.max_per_second:
-            time.sleep(1.0 / self.max_per_second - elapsed)
-        self.last_call = time.time()
-
-jikan_rate_limiter = RateLimiter(max_per_second=1)
-animepahe_rate_limiter = RateLimiter(max_per_second=3)
-
-class AnimePaheCrawler:
-    def __init__(self):
-        self.base_url = CONFIG.get("ANIMEPAHE_BASE_URL", "https://animepahe.ru")
-        self.api_url = f"{self.base_url}/api"
-        self.cookies = None
-        self.driver = None
-        self.session = requests.Session()
-        # Setze sinnvolle Defaults; erlaubt Override via CONFIG
-        self.session.headers.update({
-            'User-Agent': CONFIG.get("DEFAULT_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"),
-            'Referer': self.base_url,
-            'Accept': 'application/json, text/javascript, */*; q=0.01',
-            'Accept-Language': 'en-US,en;q=0.9'
-        })
-
-    def get_site_cookies(self):
-        """
-        Versucht, die Seite mit undetected_chromedriver zu laden und Cookies zu extrahieren.
-        Diese Cookies werden dann in self.session gesetzt, damit subsequent requests
-        seltener auf Blocker (Cloudflare) treffen.
-        """
-        logger.info("Hole Cookies von AnimePahe...")
-        options = uc.ChromeOptions()
-        options.headless = True
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        # Mögliches Flag für Chromedriver - passe ggf. an
-        chrome_version_main = CONFIG.get("CHROME_VERSION_MAIN", 138)
-        try:
-            self.driver = uc.Chrome(version_main=chrome_version_main, options=options)
-            self.driver.get(self.base_url)
-            retries = 3
-            while retries > 0:
-                try:
-                    WebDriverWait(self.driver, 20).until(
-                        EC.presence_of_element_located((By.XPATH, '//img[@alt="AnimePahe"]'))
-                    )
-                    break
-                except (NoSuchElementException, TimeoutException):
-                    logger.warning(f"Warte auf das Laden der Seite... ({4 - retries} Versuche verbleiben)")
-                    time.sleep(5)
-                    retries -= 1
-            if retries == 0:
-                raise Exception("Fehler beim Umgehen des Cloudflare-Schutzes oder Laden der Startseite")
-            self.cookies = {c['name']: c['value'] for c in self.driver.get_cookies()}
-            # Merge Cookies into requests.Session
-            self.session.cookies.update(self.cookies)
-            logger.info(f"Cookies erfolgreich geholt: {list(self.cookies.keys())}")
-        finally:
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
-
-    # tenacity retry bleibt, aber wir behandeln 403 explizit, damit keine endlosen Retries entstehen
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10))
-    def search_anime_pahe(self, query: str) -> list[dict]:
-        """
-        Ruft die AnimePahe-API (/api?m=search&q=...) ab und gibt eine Liste von dicts zurück.
-        Besonderheiten:
-         - Bei HTTP 403: gibt [] zurück (Remote blockiert) — damit der Backend-Fallback auf DB greifen kann.
-         - Robustheit beim JSON-Parsing.
-        """
-        params = {'m': 'search', 'q': query}
-        animepahe_rate_limiter.wait()
-        logger.debug("Calling animepahe API: %s params=%s", self.api_url, params)
-        try:
-            response = self.session.get(self.api_url, params=params, timeout=10)
-        except requests.RequestException as e:
-            logger.error("Netzwerkfehler beim Abruf der AnimePahe-API: %s", e)
-            # Tenacity wird hier evtl. retryen; wir lassen die Exception weiter werfen
-            raise
-
-        # Spezielles Handling für 403: oft Cloudflare/IP-Block; gib leeres Result zurück
-        if response.status_code == 403:
-            logger.warning("AnimePahe API returned 403 Forbidden for query=%s — returning empty result (will fallback to DB)", query)
-            return []
-
-        try:
-            response.raise_for_status()
-        except requests.HTTPError as e:
-            logger.error("AnimePahe API returned HTTP error: %s", e)
-            raise
-
-        # Robustes JSON-Parsing
-        try:
-            payload = response.json()
-        except ValueError:
-            logger.error("Konnte Antwort der AnimePahe API nicht als JSON parsen (response.text first 500 chars): %s", response.text[:500])
-            return []
-
-        results = payload.get('data') or payload.get('results') or []
-        out = []
-        for anime in results:
-            session_val = anime.get('session') or anime.get('identifier') or anime.get('id') or anime.get('slug')
-            # studio might be a list or string; normalize
-            studio_val = None
-            if anime.get('studio'):
-                if isinstance(anime.get('studio'), list):
-                    studio_val = ", ".join(anime.get('studio'))
-                else:
-                    studio_val = anime.get('studio')
-
-            out.append({
-                'title': clean_title(anime.get('title', 'Unknown')),
-                'session': session_val,
-                'thumbnail': anime.get('image') or anime.get('thumbnail'),
-                'type': anime.get('type'),
-                'genre': anime.get('genre'),
-                'studio': studio_val,
-                'year': anime.get('year'),
-                'source': 'pahe'
-            })
-        return out
-
-    def search_anime(self, query: str) -> list[dict]:
-        """Öffentliche Suche (Wrapper) — ruft search_anime_pahe auf."""
-        return self.search_anime_pahe(query)
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10))
-    def get_all_anime(self) -> list[dict]:
-        url = f"{self.base_url}/anime"
-        animepahe_rate_limiter.wait()
-        response = self.session.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        anime_list = []
-        nav_container = soup.find("div", class_="scrollable-ul")
-        if nav_container:
-            nav_links = nav_container.find_all("a")
-            for link in nav_links:
-                tab_id = link.get("href")
-                if not tab_id:
-                    continue
-                tab_id = tab_id.lstrip("#")
-                tab_pane = soup.find("div", id=tab_id)
-                if tab_pane:
-                    anime_links = tab_pane.find_all("a", href=True)
-                    for a in anime_links:
-                        href = a.get("href")
-                        title = a.get("title") or a.get_text(strip=True)
-                        if not href or not title:
-                            continue
-                        parsed = urlparse(href)
-                        path = parsed.path or href
-                        if path.startswith("/anime/"):
-                            session = path.rstrip("/").split("/")[-1]
-                            if not session:
-                                logger.warning(f"Leerer Session-Slug von href={href}, title={title}")
-                                continue
-                            anime_list.append({"title": clean_title(title), 'session': session, 'source': 'pahe'})
-        else:
-            logger.debug("Kein nav_container mit class 'scrollable-ul' gefunden beim Parsen von /anime")
-        return anime_list
-
-    def get_all_session_ids(self) -> list[str]:
-        try:
-            anime_list = self.get_all_anime()
-            session_ids = [anime['session'] for anime in anime_list if anime.get('session')]
-            random.shuffle(session_ids)
-            logger.info(f"{len(session_ids)} Session-IDs vom Crawler geladen: {session_ids[:10]}")
-            return session_ids
-        except Exception as e:
-            logger.error(f"Fehler beim Abrufen der Session-IDs vom Crawler: {e}")
-            return []
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10))
-    def _fetch_all_episodes(self, anime_id: str) -> list[dict]:
-        episodes = []
-        page = 1
-        last_page = 1
-        while page <= last_page:
-            params = {'m': 'release', 'id': anime_id, 'sort': 'episode_asc', 'page': page}
-            animepahe_rate_limiter.wait()
-            response = self.session.get(self.api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            last_page = data.get('last_page', 1)
-            episodes.extend(data.get('data', []))
-            page += 1
-        # Sortiere numerisch (Episode kann float/str sein)
-        try:
-            return sorted(episodes, key=lambda x: float(x.get('episode', 0)))
-        except Exception:
-            return episodes
-
-    def fetch_episodes(self, anime: dict) -> list[dict]:
-        if anime.get('source') == 'pahe':
-            episodes = self._fetch_all_episodes(anime['session'])
-            for ep in episodes:
-                ep['source'] = 'pahe'
-            return episodes
-        else:
-            raise ValueError("Unbekannte Quelle")
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10))
-    def get_stream_url(self, anime_session: str, episode_session: str) -> str:
-        episode_url = f"/play/{anime_session}/{episode_session}"
-        logger.info(f"Verarbeite Episoden-URL: {episode_url}")
-        episode_data = self._parse_episode_url(episode_url)
-        kwik_links = self._get_kwik_links(episode_data)
-        logger.info(f"Gefundene Kwik-Links: {kwik_links}")
-        if not kwik_links:
-            raise ValueError("Keine abspielbaren Links gefunden")
-        # best resolution heuristic
-        try:
-            best_res = max(kwik_links.keys(), key=lambda x: int(re.sub(r'\D', '', x) or 0))
-        except Exception:
-            best_res = list(kwik_links.keys())[0]
-        return self._extract_m3u8(kwik_links[best_res]['kwik'])
-
-    def _get_kwik_links(self, episode_data: dict) -> dict:
-        url = f"{self.base_url}/play/{episode_data['anime_id']}/{episode_data['session_id']}"
-        logger.info(f"Rufe Episoden-Seite auf: {url}")
-        animepahe_rate_limiter.wait()
-        options = uc.ChromeOptions()
-        options.headless = True
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_version_main = CONFIG.get("CHROME_VERSION_MAIN", 138)
-        links = {}
-        driver = None
-        try:
-            driver = uc.Chrome(version_main=chrome_version_main, options=options)
-            driver.get(url)
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "theatre-info"))
-            )
-            time.sleep(4)  # zusätzliche Zeit für dynamisches Laden
-            # Versuche mehrere Selektoren
-            page_source = driver.page_source
-            # Debug speichern
-            try:
-                with open('debug_rendered_page.html', 'w', encoding='utf-8') as f:
-                    f.write(page_source)
-                logger.debug("Gerendertes HTML in debug_rendered_page.html gespeichert")
-            except Exception:
-                logger.debug("Konnte debug_rendered_page.html nicht schreiben")
-
-            soup = BeautifulSoup(page_source, 'html.parser')
-            selectors = [
-                'div.episode-menu a[href*="kwik"]',
-                'div#resolutionMenu a[href*="kwik"]',
-                'div#resolutionMenu button[data-src*="kwik"]',
-                'a[href*="kwik"]',
-                'button[data-src*="kwik"]'
-            ]
-            for selector in selectors:
-                elements = soup.select(selector)
-                logger.info(f"Gefundene Elemente für Selektor '{selector}': {len(elements)}")
-                for elem in elements:
-                    kwik_url = elem.get('href') or elem.get('data-src')
-                    resolution = elem.get('data-resolution') or (elem.get_text(strip=True) if elem.get_text() else 'unknown')
-                    audio = elem.get('data-audio', 'unknown')
-                    if kwik_url:
-                        links[resolution] = {'kwik': kwik_url, 'audio': audio}
-                        logger.info(f"Link hinzugefügt: Resolution={resolution}, Kwik={kwik_url}, Audio={audio}")
-            if not links:
-                logger.warning("Keine Kwik-Links in HTML gefunden, versuche JavaScript-Fallback")
-                script_tags = soup.find_all('script')
-                for script in script_tags:
-                    text = script.string or ""
-                    if 'kwik' in text.lower():
-                        matches = re.findall(r'https?://kwik\.[a-z]+/[^\s\'"]+', text)
-                        for kwik_url in matches:
-                            links[f"unknown_{len(links)+1}"] = {'kwik': kwik_url, 'audio': 'unknown'}
-                            logger.info(f"JavaScript-Link hinzugefügt: Kwik={kwik_url}")
-            if not links:
-                logger.error(f"Keine Kwik-Links gefunden für URL: {url}")
-        except Exception as e:
-            logger.error(f"Fehler beim Rendern der Seite mit undetected_chromedriver: {str(e)}", exc_info=True)
-        finally:
-            if driver:
-                driver.quit()
-        return links
-
-    def _extract_m3u8(self, kwik_url: str) -> str:
-        logger.info(f"Extrahiere m3u8 von Kwik-URL: {kwik_url}")
-        # Achte auf korrekte Header; Referer kann nötig sein
-        try:
-            response = self.session.get(kwik_url, headers={'Referer': self.base_url}, timeout=15)
-        except requests.RequestException as e:
-            logger.error(f"Fehler beim Abruf der Kwik-URL: {e}")
-            raise
-        response.raise_for_status()
-        # Suche nach eval(...) JS-Block und beautify um m3u8 zu finden
-        match = re.search(r';eval\(.*\)', response.text, flags=re.DOTALL)
-        if not match:
-            logger.error("Kein Videoplayer-Code (eval) gefunden")
-            raise ValueError("Fehler beim Finden des Videoplayer-Codes")
-        beautified = jsbeautifier.beautify(match.group(0).replace('\\', ''))
-        m3u8_match = re.search(r'https?://[^\s\'"]+\.m3u8', beautified)
-        if not m3u8_match:
-            logger.error("Keine m3u8-URL im beautified Code gefunden")
-            raise ValueError("Fehler beim Extrahieren der Video-Stream-URL")
-        m3u8_url = m3u8_match.group(0)
-        logger.info(f"Extrahierte m3u8-URL: {m3u8_url}")
-        return m3u8_url
-
-    def _parse_episode_url(self, url: str) -> dict:
-        logger.info(f"Parse Episoden-URL: {url}")
-        parsed = urlparse(url)
-        if not parsed.path.startswith('/play/'):
-            raise ValueError("Ungültige AnimePahe-Episoden-URL")
-        path_parts = parsed.path.split('/')
-        return {'anime_id': path_parts[-2], 'session_id': path_parts[-1]}
-
-    def get_details(self, anime: dict) -> dict:
-        source = anime.get('source')
-        session_id = anime.get('session')
-        if source == 'pahe':
-            details = self._get_pahe_details(session_id)
-        else:
-            raise ValueError("Unbekannte Quelle")
-        details["source"] = source
-        details["identifier"] = session_id
-        details["session"] = session_id  # sicherstellen
-        details["title"] = clean_title(details.get("title", "Unknown"))
-        logger.debug(f"Details für Anime (Session: {session_id}): {details}")
-        return details
-
-    def _parse_pahe_title(self, soup: BeautifulSoup) -> str:
-        title_tag = soup.find("h1")
-        return clean_title(title_tag.get_text(strip=True)) if title_tag else "Unknown"
-
-    def _parse_pahe_synopsis(self, soup: BeautifulSoup) -> str:
-        summary_div = soup.find("div", class_="tab-content anime-detail") or soup.find("div", class_="anime-info")
-        return summary_div.decode_contents() if summary_div else "No summary available."
-
-    def _parse_pahe_relations(self, soup: BeautifulSoup) -> str:
-        relations_div = soup.find(lambda tag: tag.name == "div" and tag.get("class") and "anime-relation" in " ".join(tag.get("class")))
-        return relations_div.decode_contents() if relations_div else "No relations found."
-
-    def _parse_pahe_recommendations(self, soup: BeautifulSoup) -> str:
-        recommendations_div = soup.find(lambda tag: tag.name == "div" and tag.get("class") and "anime-recommendation" in " ".join(tag.get("class")))
-        return recommendations_div.decode_contents() if recommendations_div else "No recommendations found."
-
-    def _parse_pahe_genre(self, soup: BeautifulSoup) -> str:
-        genre_div = soup.find("div", class_="anime-genre")
-        if not genre_div:
-            return "N/A"
-        parts = [li.get_text(strip=True) for li in genre_div.find_all("li")]
-        return ", ".join(parts) if parts else "N/A"
-
-    def _parse_pahe_thumbnail(self, soup: BeautifulSoup) -> str | None:
-        poster_div = soup.find("div", class_="anime-poster")
-        if poster_div and poster_div.find("img"):
-            return poster_div.find("img").get("src") or poster_div.find("img").get("data-src")
-        return None
-
-    # ---------- REPLACED: Robuste Info-Parser (Studio, Type, Season, Year) ----------
-    def _parse_pahe_info(self, soup: BeautifulSoup) -> tuple[str | None, str | None, str | None, str | None]:
-        """
-        Robusteres Parsen der Info-Box auf AnimePahe-Detailseiten.
-        Liefert: (type, studio, season, year) - oder None wenn nicht gefunden.
-        """
-        anime_type = None
-        studio = None
-        season = None
-        year = None
-
-        info_div = soup.find("div", class_="anime-info")
-        if not info_div:
-            # Fallback: suche allgemein nach Abschnitten die 'Studio' enthalten
-            possible = soup.find_all(text=lambda t: t and "studio" in t.lower())
-            for t in possible:
-                parent = t.parent
-                if parent and parent.get_text(strip=True):
-                    txt = parent.get_text(" ", strip=True)
-                    m = re.search(r'Studios?:\s*(.+)', txt, re.IGNORECASE)
-                    if m:
-                        studio_candidate = m.group(1).split("|")[0].split(",")[0].strip()
-                        if studio_candidate and studio_candidate.lower() not in ("n/a","unknown"):
-                            studio = studio_candidate
-                            break
-            return anime_type, studio, season, year
-
-        # Durchlaufe <p>-Elemente in der Info-Box
-        for p in info_div.find_all(["p", "div"]):
-            text = p.get_text(" ", strip=True)
-            lowered = text.lower()
-
-            # TYPE
-            if "type:" in lowered and not anime_type:
-                a = p.find("a")
-                if a and a.get_text(strip=True):
-                    anime_type = a.get_text(strip=True)
-                else:
-                    m = re.search(r'Type:\s*(.+)', text, re.IGNORECASE)
-                    if m:
-                        anime_type = m.group(1).split("|")[0].strip()
-
-            # STUDIO / STUDIOS / Studio(s)
-            if "studio" in lowered and not studio:
-                # 1) Wenn <a> Tags vorhanden, nimm deren Texte (häufig)
-                anchors = [a.get_text(strip=True) for a in p.find_all("a") if a.get_text(strip=True)]
-                if anchors:
-                    studio = ", ".join(anchors)
-                else:
-                    # 2) Fallback: versuche Text nach Label zu extrahieren
-                    m = re.search(r'Studios?:\s*(.+)', text, re.IGNORECASE)
-                    if m:
-                        val = m.group(1).strip()
-                        # Entferne nachfolgende Labels oder Separatoren
-                        val = re.split(r'\s*\||\n', val)[0].strip()
-                        # Falls mehrere durch Komma getrennt, nimm alle
-                        parts = [x.strip() for x in val.split(",") if x.strip()]
-                        if parts:
-                            studio = ", ".join(parts)
-
-            # AIRED -> Jahr & Saison
-            if "aired:" in lowered and (not year or not season):
-                m = re.search(r'\b(\d{4})\b', text)
-                if m:
-                    year = m.group(1)
-                m_month = re.search(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', text, re.IGNORECASE)
-                if m_month:
-                    month = m_month.group(1).lower()
-                    season = {"dec": "Winter", "jan": "Winter", "feb": "Winter",
-                              "mar": "Spring", "apr": "Spring", "may": "Spring",
-                              "jun": "Summer", "jul": "Summer", "aug": "Summer",
-                              "sep": "Fall", "oct": "Fall", "nov": "Fall"}.get(month[:3], None)
-
-        # Normalize: keep None if empty/placeholder
-        if isinstance(studio, str) and studio.strip().lower() in ("n/a","unknown",""):
-            studio = None
-
-        return anime_type or None, studio or None, season or None, year or None
-    # ---------- END REPLACED FUNCTION ----------
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10))
-    def _get_pahe_details(self, session: str) -> dict:
-        url = f"{self.base_url}/anime/{session}"
-        animepahe_rate_limiter.wait()
-        response = self.session.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title = self._parse_pahe_title(soup)
-        synopsis = self._parse_pahe_synopsis(soup)
-        relations = self._parse_pahe_relations(soup)
-        recommendations = self._parse_pahe_recommendations(soup)
-        genre = self._parse_pahe_genre(soup)
-        thumbnail_url = self._parse_pahe_thumbnail(soup)
-        logger.debug(f"Gefundene Thumbnail-URL für '{title}' (Session: {session}): {thumbnail_url}")
-        cached_filename = None
-        thumbnail_to_store = None
-        if thumbnail_url:
-            logger.debug(f"Starte Caching für Thumbnail von '{title}' (Session: {session})...")
-            try:
-                cached_filename = cache_image(thumbnail_url)
-                if cached_filename:
-                    logger.info(f"Thumbnail für '{title}' (Session: {session}) erfolgreich gecached: {cached_filename}")
-                    thumbnail_to_store = f"/cached_images/{cached_filename}"
-                else:
-                    logger.warning(f"Fehler beim Cachen des Thumbnails für '{title}' (Session: {session}) von {thumbnail_url}. Speichere Original-URL.")
-                    thumbnail_to_store = thumbnail_url
-            except Exception as e:
-                logger.error(f"Fehler beim Cachen des Thumbnails: {e}", exc_info=True)
-                thumbnail_to_store = thumbnail_url
-        else:
-            logger.info(f"Keine Thumbnail-URL für '{title}' (Session: {session}) gefunden.")
-        anime_type, studio, season, year = self._parse_pahe_info(soup)
-        return {
-            "title": title,
-            "synopsis": synopsis,
-            "info": synopsis,
-            "relations": relations,
-            "recommendations": recommendations,
-            "thumbnail": thumbnail_to_store,
-            "genre": genre,
-            "type": anime_type,
-            "studio": studio,
-            "season": season,
-            "year": year
-        }
-
-# Globale Instanz
-crawler = AnimePaheCrawler()
+# backend/crawler.py
+"""
+AnimePahe Crawler: Scraping-Logik fuer die neue Webanwendung.
+Basierend auf dem alten AnimePaheStreamer-Code.
+"""
+from __future__ import annotations
+
+import requests
+import re
+import time
+import json
+import os
+import threading
+import logging
+import random
+from collections import OrderedDict
+from types import SimpleNamespace
+from urllib.parse import quote_plus, urlparse
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from .utils import cache_image, clean_title
+from .singleflight import coalesced
+from .http_cache import http_cache
+from .coordination import SharedRateLimiter, raise_signal
+from .logging_setup import write_debug_artifact
+from .adaptive import parse_retry_after, upstream_limits
+from .circuit_breaker import CircuitOpenError, upstream_breakers
+from .parsers import parse_anime_index, parse_details, parse_kwik_links
+from .parse_pool import parse_pool
+from .cancellation import CancelledByClient, check_cancelled, current_token, sleep as cancellable_sleep
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# --- Verzoegerte Imports ---
+# selenium, undetected_chromedriver, jsbeautifier und bs4 sind schwergewichtig.
+# Sie werden erst geladen, wenn der Browser- bzw. Scraper-Pfad wirklich gebraucht wird,
+# damit der Server (und reine DB-Anfragen) nicht auf diese Imports warten muessen.
+_browser_modules = None
+
+def _load_browser_modules() -> SimpleNamespace:
+    """Laedt undetected_chromedriver und die benoetigten Selenium-Helfer beim ersten Aufruf."""
+    global _browser_modules
+    if _browser_modules is None:
+        import undetected_chromedriver as uc
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException
+        _browser_modules = SimpleNamespace(
+            uc=uc, By=By, WebDriverWait=WebDriverWait, EC=EC,
+            NoSuchElementException=NoSuchElementException, TimeoutException=TimeoutException
+        )
+    return _browser_modules
+
+# Rate Limiter (vereinfacht)
+class RateLimiter:
+    def __init__(self, max_per_second: int):
+        self.max_per_second = max_per_second
+        self.last_call = 0
+
+    def wait(self):
+        elapsed = time.time() - self.last_call
+        if elapsed < 1.0 / self.max_per_second:
+            cancellable_sleep(1.0 / self.max_per_second - elapsed)
+        self.last_call = time.time()
+
+    def idle(self) -> bool:
+        """True, wenn ein Aufruf jetzt ohne Wartezeit moeglich waere."""
+        return time.time() - self.last_call >= 1.0 / self.max_per_second
+
+# Mit SHARED_RATE_LIMITS teilen sich alle Worker-Prozesse dasselbe Budget pro Upstream
+if CONFIG.get("SHARED_RATE_LIMITS", True):
+    jikan_rate_limiter = SharedRateLimiter("jikan", max_per_second=1)
+    animepahe_rate_limiter = SharedRateLimiter("animepahe", max_per_second=3)
+    # AniList erlaubt 90 Anfragen pro Minute (zeitweise nur 30); wir bleiben deutlich darunter
+    anilist_rate_limiter = SharedRateLimiter("anilist", max_per_second=0.5)
+else:
+    jikan_rate_limiter = RateLimiter(max_per_second=1)
+    animepahe_rate_limiter = RateLimiter(max_per_second=3)
+    anilist_rate_limiter = RateLimiter(max_per_second=0.5)
+
+class CloudflareChallengeError(requests.HTTPError):
+    """Upstream liefert trotz Clearance-Refresh weiterhin 403 bzw. eine Challenge-Seite."""
+
+# Texte, an denen Cloudflare-Challenge-Seiten erkannt werden
+_CHALLENGE_MARKERS = ("Just a moment...", "cf-browser-verification", "challenge-platform", "cf_chl_opt")
+
+def _is_challenge_response(response: requests.Response) -> bool:
+    """Erkennt 403-Antworten und Cloudflare-Challenge-Seiten."""
+    if response.status_code == 403:
+        return True
+    if response.headers.get('cf-mitigated', '').lower() == 'challenge':
+        return True
+    if response.status_code in (429, 503) and 'text/html' in response.headers.get('Content-Type', ''):
+        head = response.text[:4096]
+        return any(marker in head for marker in _CHALLENGE_MARKERS)
+    return False
+
+def _is_retryable(error: BaseException) -> bool:
+    """
+    Challenge-Fehler werden nicht erneut versucht (der Clearance-Refresh in fetch() hat dann bereits
+    stattgefunden), ebenso wenig ein offener Circuit Breaker oder 4xx-Antworten wie 404: ein zweiter
+    Versuch liefert dasselbe Ergebnis. Nach einem Client-Abbruch wird ebenfalls nicht wiederholt.
+    """
+    if isinstance(error, (CloudflareChallengeError, CircuitOpenError, CancelledByClient)):
+        return False
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return not 400 <= error.response.status_code < 500 or error.response.status_code == 429
+    return True
+
+# Gemeinsame Retry-Strategie fuer Upstream-Aufrufe; die Wartezeit zwischen Versuchen endet bei Client-Abbruch
+upstream_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=1, max=10),
+    retry=retry_if_exception(_is_retryable),
+    sleep=cancellable_sleep
+)
+
+class AnimePaheCrawler:
+    def __init__(self):
+        self.base_url = CONFIG.get("ANIMEPAHE_BASE_URL", "https://animepahe.ru")
+        self.api_url = f"{self.base_url}/api"
+        self.cookies = None
+        self.driver = None
+        self.session = requests.Session()
+        # Setze sinnvolle Defaults; erlaubt Override via CONFIG
+        self.session.headers.update({
+            'User-Agent': CONFIG.get("DEFAULT_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"),
+            'Referer': self.base_url,
+            'Accept': 'application/json, text/javascript, */*; q=0.01',
+            'Accept-Language': 'en-US,en;q=0.9'
+        })
+        # Wird gesetzt, sobald Cookies (aus dem Jar oder per Browser) bereitstehen
+        self.cookies_ready = threading.Event()
+        self.cookies_expire_at = 0.0
+        self._cookie_jar_saved_at = 0.0
+        # Single-Flight-Zustand fuer den Clearance-Refresh (siehe refresh_clearance)
+        self._clearance_lock = threading.Lock()
+        self._clearance_generation = 0
+        self._last_clearance_refresh = 0.0
+        # Nur der Besitzer (bei mehreren Workern: der Leader) startet Chrome; alle anderen
+        # fordern beim Leader neue Cookies an und uebernehmen sie aus dem Cookie-Jar
+        self.clearance_owner = True
+        # (Digest, geparste Liste) des zuletzt geparsten /anime-Index
+        self._anime_index_memo = None
+        # Kwik-Resolver: pro Anime die zuletzt erfolgreiche Stufe ("http"/"browser", Zeitpunkt)
+        self._kwik_tiers: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._kwik_tiers_lock = threading.Lock()
+        self._kwik_counts = {"http": 0, "browser": 0, "escalated": 0, "browser_direct": 0, "failed": 0}
+        if self.load_cookie_jar():
+            self.cookies_ready.set()
+
+    def get_site_cookies(self):
+        """
+        Versucht, die Seite mit undetected_chromedriver zu laden und Cookies zu extrahieren.
+        Diese Cookies werden dann in self.session gesetzt, damit subsequent requests
+        seltener auf Blocker (Cloudflare) treffen.
+        """
+        logger.info("Hole Cookies von AnimePahe...")
+        b = _load_browser_modules()
+        options = b.uc.ChromeOptions()
+        options.headless = True
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        # Mögliches Flag für Chromedriver - passe ggf. an
+        chrome_version_main = CONFIG.get("CHROME_VERSION_MAIN", 138)
+        try:
+            self.driver = b.uc.Chrome(version_main=chrome_version_main, options=options)
+            self.driver.get(self.base_url)
+            retries = 3
+            while retries > 0:
+                try:
+                    b.WebDriverWait(self.driver, 20).until(
+                        b.EC.presence_of_element_located((b.By.XPATH, '//img[@alt="AnimePahe"]'))
+                    )
+                    break
+                except (b.NoSuchElementException, b.TimeoutException):
+                    logger.warning(f"Warte auf das Laden der Seite... ({4 - retries} Versuche verbleiben)")
+                    time.sleep(5)
+                    retries -= 1
+            if retries == 0:
+                raise Exception("Fehler beim Umgehen des Cloudflare-Schutzes oder Laden der Startseite")
+            raw_cookies = self.driver.get_cookies()
+            self.cookies = {c['name']: c['value'] for c in raw_cookies}
+            # Merge Cookies into requests.Session
+            self.session.cookies.update(self.cookies)
+            self.cookies_expire_at = self._cookie_jar_expiry(raw_cookies, time.time())
+            self._cookie_jar_saved_at = self._save_cookie_jar(raw_cookies)
+            logger.info(f"Cookies erfolgreich geholt: {list(self.cookies.keys())}")
+        finally:
+            if self.driver:
+                self.driver.quit()
+                self.driver = None
+
+    # ---------- Persistierter Cookie-Jar ----------
+    def _cookie_jar_expiry(self, raw_cookies: list[dict], saved_at: float) -> float:
+        """
+        Bestimmt, bis wann ein Cookie-Jar wiederverwendet werden darf.
+        Massgeblich ist das Ablaufdatum von cf_clearance (falls vorhanden),
+        begrenzt durch COOKIE_JAR_MAX_AGE_SEC.
+        """
+        expires_at = saved_at + CONFIG.get("COOKIE_JAR_MAX_AGE_SEC", 6 * 3600)
+        for c in raw_cookies:
+            if c.get('name') == 'cf_clearance' and c.get('expiry'):
+                expires_at = min(expires_at, float(c['expiry']))
+        return expires_at
+
+    def _save_cookie_jar(self, raw_cookies: list[dict]) -> float:
+        """Schreibt die Cookies (inkl. Ablaufzeit) atomar in COOKIE_JAR_PATH und gibt den Zeitstempel zurueck."""
+        path = CONFIG.get("COOKIE_JAR_PATH", "cookie_jar.json")
+        saved_at = time.time()
+        payload = {
+            "saved_at": saved_at,
+            "expires_at": self._cookie_jar_expiry(raw_cookies, saved_at),
+            "cookies": [
+                {k: c.get(k) for k in ("name", "value", "domain", "path", "expiry") if c.get(k) is not None}
+                for c in raw_cookies
+            ]
+        }
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+            logger.debug("Cookie-Jar gespeichert unter %s", path)
+        except OSError as e:
+            logger.warning(f"Konnte Cookie-Jar nicht speichern ({path}): {e}")
+        return saved_at
+
+    def load_cookie_jar(self, only_if_newer: bool = False) -> bool:
+        """
+        Laedt einen zuvor gespeicherten Cookie-Jar, falls er noch nicht abgelaufen ist.
+        Args:
+            only_if_newer (bool): Nur laden, wenn der Jar juenger ist als die aktuell verwendeten Cookies.
+        Returns:
+            bool: True, wenn gueltige Cookies in die Session uebernommen wurden.
+        """
+        path = CONFIG.get("COOKIE_JAR_PATH", "cookie_jar.json")
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cookie-Jar {path} konnte nicht gelesen werden: {e}")
+            return False
+        if only_if_newer and payload.get("saved_at", 0) <= self._cookie_jar_saved_at:
+            return False
+        expires_at = payload.get("expires_at", 0)
+        if expires_at <= time.time():
+            logger.info("Gespeicherter Cookie-Jar ist abgelaufen, hole neue Cookies.")
+            return False
+        self.cookies = {c['name']: c['value'] for c in payload.get("cookies", []) if c.get('name')}
+        self.session.cookies.update(self.cookies)
+        self.cookies_expire_at = expires_at
+        self._cookie_jar_saved_at = payload.get("saved_at", 0)
+        logger.info(f"Cookie-Jar geladen ({len(self.cookies)} Cookies, gueltig fuer weitere {int(expires_at - time.time())}s)")
+        return True
+
+    def start_cookie_refresh(self):
+        """
+        Stellt sicher, dass gueltige Cookies vorhanden sind, ohne den Aufrufer zu blockieren.
+        Ist ein gueltiger Cookie-Jar geladen, passiert nichts; sonst wird Chrome in einem
+        Hintergrund-Thread gestartet. cookies_ready wird in jedem Fall gesetzt, sobald
+        der Vorgang abgeschlossen ist.
+        """
+        if self.cookies and self.cookies_expire_at > time.time():
+            self.cookies_ready.set()
+            return
+
+        def _run():
+            try:
+                if self.refresh_clearance(self._clearance_generation):
+                    logger.info("Crawler initialisiert.")
+            finally:
+                self.cookies_ready.set()
+
+        threading.Thread(target=_run, name="cookie-refresh", daemon=True).start()
+
+    # ---------- Clearance-Refresh & zentraler Request-Pfad ----------
+    def refresh_clearance(self, seen_generation: int) -> bool:
+        """
+        Erneuert die Cloudflare-Clearance genau einmal fuer alle gleichzeitigen Aufrufer.
+        Der erste Thread fuehrt den Refresh aus, alle weiteren warten auf dem Lock und
+        erkennen anschliessend an der geaenderten Generation, dass sie nur wiederholen muessen.
+        Ein Cooldown (CLEARANCE_REFRESH_COOLDOWN_SEC) verhindert Refresh-Stuerme.
+        Args:
+            seen_generation (int): Clearance-Generation, mit der der fehlgeschlagene Request lief.
+        Returns:
+            bool: True, wenn neue Cookies vorliegen und der Request wiederholt werden soll.
+        """
+        with self._clearance_lock:
+            if self._clearance_generation != seen_generation:
+                return True
+            # Ein anderer Prozess kann den Jar bereits erneuert haben — das ist billiger als Chrome
+            if self.load_cookie_jar(only_if_newer=True):
+                self._clearance_generation += 1
+                return True
+            if not self.clearance_owner:
+                return self._await_clearance_from_leader()
+            cooldown = CONFIG.get("CLEARANCE_REFRESH_COOLDOWN_SEC", 60)
+            since_last = time.time() - self._last_clearance_refresh
+            if since_last < cooldown:
+                logger.warning(f"Clearance-Refresh uebersprungen (Cooldown, letzter Refresh vor {since_last:.0f}s)")
+                return False
+            self._last_clearance_refresh = time.time()
+            try:
+                self.get_site_cookies()
+            except Exception as e:
+                logger.error(f"Clearance-Refresh fehlgeschlagen: {e}", exc_info=True)
+                return False
+            self._clearance_generation += 1
+            logger.info(f"Clearance erneuert (Generation {self._clearance_generation})")
+            return True
+
+    def _await_clearance_from_leader(self) -> bool:
+        """Follower: bittet den Leader um einen Refresh und wartet, bis ein neuerer Cookie-Jar vorliegt."""
+        try:
+            raise_signal("clearance_refresh")
+        except Exception as e:
+            logger.error(f"Clearance-Anfrage an den Leader fehlgeschlagen: {e}")
+            return False
+        deadline = time.time() + CONFIG.get("CLEARANCE_FOLLOWER_WAIT_SEC", 45)
+        while time.time() < deadline:
+            time.sleep(1)
+            if self.load_cookie_jar(only_if_newer=True):
+                self._clearance_generation += 1
+                logger.info(f"Clearance vom Leader uebernommen (Generation {self._clearance_generation})")
+                return True
+        logger.warning("Keine neuen Cookies vom Leader erhalten.")
+        return False
+
+    def handle_clearance_request(self, requested_at: float):
+        """Leader: bearbeitet die Clearance-Anfrage eines Followers, sofern der Cookie-Jar nicht schon neuer ist."""
+        if requested_at <= self._cookie_jar_saved_at:
+            return
+        self.refresh_clearance(self._clearance_generation)
+
+    def fetch(self, url: str, params: dict | None = None, headers: dict | None = None, timeout: float = 10,
+              limiter: RateLimiter | None = animepahe_rate_limiter, refresh_on_challenge: bool = True,
+              use_cache: bool = True) -> requests.Response:
+        """
+        Zentraler GET-Pfad fuer Upstream-Aufrufe.
+        Erkennt 403/Challenge-Seiten, stoesst einen (Single-Flight-)Clearance-Refresh an
+        und wiederholt den Request danach einmal mit den neuen Cookies.
+        Detailseiten, der /anime-Index und m=release-JSON laufen ueber den HTTP-Cache:
+        frische Eintraege kommen direkt von der Platte, sonst wird konditional angefragt
+        und ein 304 aus dem Cache beantwortet.
+        Raises:
+            CloudflareChallengeError: Wenn Upstream auch nach dem Refresh blockiert.
+            requests.RequestException: Bei Netzwerkfehlern.
+        """
+        url_class = http_cache.classify(url, params) if use_cache else None
+        if not url_class:
+            return self._send(url, params, headers, timeout, limiter, refresh_on_challenge)
+
+        cached = http_cache.get_fresh(url, params, url_class)
+        if cached is not None:
+            return cached
+        conditional = http_cache.conditional_headers(url, params)
+        response = self._send(url, params, {**(headers or {}), **conditional}, timeout, limiter, refresh_on_challenge)
+        if response.status_code == 304:
+            revalidated = http_cache.revalidate(url, params)
+            if revalidated is not None:
+                return revalidated
+            # Eintrag ist zwischenzeitlich verschwunden: unkonditional neu laden
+            response = self._send(url, params, headers, timeout, limiter, refresh_on_challenge)
+        http_cache.store(url, params, response)
+        return response
+
+    def _send(self, url: str, params: dict | None, headers: dict | None, timeout: float,
+              limiter: RateLimiter | None, refresh_on_challenge: bool) -> requests.Response:
+        """Fuehrt den eigentlichen GET aus (inkl. Rate-Limit und Clearance-Refresh bei Challenge)."""
+        generation = self._clearance_generation
+        control = upstream_limits.for_host(urlparse(url).netloc, limiter)
+        response = self._controlled_get(control, url, params, headers, timeout)
+        if not _is_challenge_response(response):
+            return response
+
+        logger.warning(f"Challenge/403 von {urlparse(url).netloc} fuer {urlparse(url).path} (Status {response.status_code})")
+        if refresh_on_challenge and self.refresh_clearance(generation):
+            response = self._controlled_get(control, url, params, headers, timeout)
+            if not _is_challenge_response(response):
+                return response
+        raise CloudflareChallengeError(f"Upstream blockiert ({response.status_code}) fuer {url}", response=response)
+
+    def _controlled_get(self, control, url: str, params: dict | None, headers: dict | None,
+                        timeout: float) -> requests.Response:
+        """
+        GET innerhalb der adaptiven Limits des Hosts; Status und Latenz fliessen zurueck in die Regelung.
+        Raises:
+            CircuitOpenError: Wenn der Circuit Breaker des Hosts offen ist (ohne zu senden).
+            CancelledByClient: Wenn der Client waehrend des Wartens oder Ladens getrennt hat.
+        """
+        check_cancelled()
+        breaker = upstream_breakers.for_host(control.host)
+        breaker.before_call()
+        try:
+            with control.slot():
+                check_cancelled()
+                started = time.monotonic()
+                try:
+                    response = self._get(url, params, headers, timeout)
+                except requests.RequestException as e:
+                    control.record_error(e)
+                    breaker.record_failure(type(e).__name__)
+                    raise
+        except CancelledByClient:
+            # Kein Urteil ueber den Upstream: nichts an Breaker und Regelung melden
+            breaker.release_probe()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure(f"Status {response.status_code}")
+        else:
+            breaker.record_success()
+        control.record(response.status_code, time.monotonic() - started,
+                       challenge=_is_challenge_response(response),
+                       retry_after=parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def _get(self, url: str, params: dict | None, headers: dict | None, timeout: float) -> requests.Response:
+        """
+        session.get; mit Abbruch-Token wird der Body gestreamt gelesen und die Verbindung beim
+        Abbruch geschlossen, statt die Antwort fuer niemanden fertig zu laden.
+        """
+        token = current_token()
+        if token is None:
+            return self.session.get(url, params=params, headers=headers, timeout=timeout)
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout, stream=True)
+        unregister = token.on_cancel(response.close)
+        try:
+            chunks = []
+            for chunk in response.iter_content(64 * 1024):
+                check_cancelled()
+                chunks.append(chunk)
+            # Eine beim Abbruch geschlossene Verbindung endet ggf. ohne Fehler, nur mit leerem Body
+            check_cancelled()
+            # Wie Response.content, damit Aufrufer und HTTP-Cache die Antwort normal lesen koennen
+            response._content = b"".join(chunks)
+        except requests.RequestException:
+            # Die vom Abbruch geschlossene Verbindung ist kein Upstream-Fehler
+            check_cancelled()
+            raise
+        finally:
+            unregister()
+        response.close()
+        return response
+
+    # 403/Challenge wird in fetch() per Clearance-Refresh behandelt; danach kein weiterer Retry
+    @upstream_retry
+    def search_anime_pahe(self, query: str) -> list[dict]:
+        """
+        Ruft die AnimePahe-API (/api?m=search&q=...) ab und gibt eine Liste von dicts zurück.
+        Besonderheiten:
+         - Bei HTTP 403/Challenge: Clearance-Refresh und einmalige Wiederholung (siehe fetch);
+           blockiert Upstream weiterhin, wird CloudflareChallengeError geworfen.
+         - Robustheit beim JSON-Parsing.
+        """
+        params = {'m': 'search', 'q': query}
+        logger.debug("Calling animepahe API: %s params=%s", self.api_url, params)
+        try:
+            response = self.fetch(self.api_url, params=params, timeout=10)
+        except requests.RequestException as e:
+            logger.error("Netzwerkfehler beim Abruf der AnimePahe-API: %s", e)
+            # Tenacity wird hier evtl. retryen; wir lassen die Exception weiter werfen
+            raise
+
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            logger.error("AnimePahe API returned HTTP error: %s", e)
+            raise
+
+        # Robustes JSON-Parsing
+        try:
+            payload = response.json()
+        except ValueError:
+            logger.error("Konnte Antwort der AnimePahe API nicht als JSON parsen (response.text first 500 chars): %s", response.text[:500])
+            return []
+
+        results = payload.get('data') or payload.get('results') or []
+        out = []
+        for anime in results:
+            session_val = anime.get('session') or anime.get('identifier') or anime.get('id') or anime.get('slug')
+            # studio might be a list or string; normalize
+            studio_val = None
+            if anime.get('studio'):
+                if isinstance(anime.get('studio'), list):
+                    studio_val = ", ".join(anime.get('studio'))
+                else:
+                    studio_val = anime.get('studio')
+
+            out.append({
+                'title': clean_title(anime.get('title', 'Unknown')),
+                'session': session_val,
+                'thumbnail': anime.get('image') or anime.get('thumbnail'),
+                'type': anime.get('type'),
+                'genre': anime.get('genre'),
+                'studio': studio_val,
+                'year': anime.get('year'),
+                'source': 'pahe'
+            })
+        return out
+
+    @coalesced("search_anime")
+    def search_anime(self, query: str) -> list[dict]:
+        """Öffentliche Suche (Wrapper) — ruft search_anime_pahe auf."""
+        return self.search_anime_pahe(query)
+
+    @coalesced("get_all_anime")
+    @upstream_retry
+    def get_all_anime(self) -> list[dict]:
+        url = f"{self.base_url}/anime"
+        response = self.fetch(url)
+        response.raise_for_status()
+        # Unveraenderter Index (Cache-Treffer mit gleichem Digest) muss nicht neu geparst werden
+        digest = getattr(response, 'cache_digest', None)
+        if digest and self._anime_index_memo and self._anime_index_memo[0] == digest:
+            return [dict(a) for a in self._anime_index_memo[1]]
+        anime_list = parse_pool.run(parse_anime_index, response.content)
+        if digest:
+            self._anime_index_memo = (digest, [dict(a) for a in anime_list])
+        return anime_list
+
+    def get_all_session_ids(self) -> list[str]:
+        try:
+            anime_list = self.get_all_anime()
+            session_ids = [anime['session'] for anime in anime_list if anime.get('session')]
+            random.shuffle(session_ids)
+            logger.info("%d Session-IDs vom Crawler geladen", len(session_ids))
+            logger.debug("Erste Session-IDs: %s", session_ids[:10])
+            return session_ids
+        except Exception as e:
+            logger.error(f"Fehler beim Abrufen der Session-IDs vom Crawler: {e}")
+            return []
+
+    @coalesced("fetch_episodes")
+    @upstream_retry
+    def _fetch_all_episodes(self, anime_id: str) -> list[dict]:
+        episodes = []
+        page = 1
+        last_page = 1
+        while page <= last_page:
+            check_cancelled()
+            params = {'m': 'release', 'id': anime_id, 'sort': 'episode_asc', 'page': page}
+            response = self.fetch(self.api_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            last_page = data.get('last_page', 1)
+            episodes.extend(data.get('data', []))
+            page += 1
+        # Sortiere numerisch (Episode kann float/str sein)
+        try:
+            return sorted(episodes, key=lambda x: float(x.get('episode', 0)))
+        except Exception:
+            return episodes
+
+    def fetch_episodes(self, anime: dict) -> list[dict]:
+        if anime.get('source') == 'pahe':
+            episodes = self._fetch_all_episodes(anime['session'])
+            for ep in episodes:
+                ep['source'] = 'pahe'
+            return episodes
+        else:
+            raise ValueError("Unbekannte Quelle")
+
+    @coalesced("get_stream_url")
+    @upstream_retry
+    def get_stream_url(self, anime_session: str, episode_session: str) -> str:
+        episode_url = f"/play/{anime_session}/{episode_session}"
+        logger.info("Verarbeite Episoden-URL: %s", episode_url)
+        episode_data = self._parse_episode_url(episode_url)
+        kwik_links = self._get_kwik_links(episode_data)
+        logger.info("Gefundene Kwik-Links: %s", kwik_links)
+        if not kwik_links:
+            raise ValueError("Keine abspielbaren Links gefunden")
+        # best resolution heuristic
+        try:
+            best_res = max(kwik_links.keys(), key=lambda x: int(re.sub(r'\D', '', x) or 0))
+        except Exception:
+            best_res = list(kwik_links.keys())[0]
+        return self._extract_m3u8(kwik_links[best_res]['kwik'])
+
+    def _get_kwik_links(self, episode_data: dict) -> dict:
+        """
+        Gestufter Resolver: Die Play-Seite wird zuerst per einfachem GET geladen, die Kwik-Links
+        stehen meist schon im statischen HTML. Nur wenn dort keine Links sind oder Upstream eine
+        Challenge liefert, wird sie in Chrome gerendert. Welche Stufe funktioniert hat, wird pro
+        Anime gemerkt; Anime, die den Browser brauchten, gehen eine Weile direkt dorthin.
+        """
+        anime_id = episode_data['anime_id']
+        url = f"{self.base_url}/play/{anime_id}/{episode_data['session_id']}"
+        tier = self._kwik_tier(anime_id)
+        if CONFIG.get("KWIK_HTTP_TIER", True) and tier != "browser":
+            links = self._get_kwik_links_http(url)
+            if links:
+                self._remember_kwik_tier(anime_id, "http")
+                return links
+            self._count_kwik("escalated")
+        elif tier == "browser":
+            self._count_kwik("browser_direct")
+        links = self._get_kwik_links_browser(url)
+        if links:
+            self._remember_kwik_tier(anime_id, "browser")
+        else:
+            self._count_kwik("failed")
+        return links
+
+    def _get_kwik_links_http(self, url: str) -> dict:
+        """Stufe 1: Play-Seite ueber die gepoolte Session laden und parsen. Leeres dict = Browser noetig."""
+        logger.info("Lade Episoden-Seite per HTTP: %s", url)
+        try:
+            response = self.fetch(url, headers={'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8'}, timeout=10)
+        except CloudflareChallengeError:
+            logger.info("Challenge auf der Episoden-Seite, weiche auf den Browser aus: %s", url)
+            return {}
+        response.raise_for_status()
+        return parse_pool.run(parse_kwik_links, response.content)
+
+    def _get_kwik_links_browser(self, url: str) -> dict:
+        """Stufe 2: Play-Seite in Chrome rendern (dynamisch nachgeladene Links, Challenges)."""
+        logger.info("Rendere Episoden-Seite im Browser: %s", url)
+        animepahe_rate_limiter.wait()
+        check_cancelled()
+        b = _load_browser_modules()
+        options = b.uc.ChromeOptions()
+        options.headless = True
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        chrome_version_main = CONFIG.get("CHROME_VERSION_MAIN", 138)
+        links = {}
+        driver = None
+        token = current_token()
+        unregister = None
+        try:
+            driver = b.uc.Chrome(version_main=chrome_version_main, options=options)
+            if token is not None:
+                # Client getrennt: Browser sofort beenden, das laufende driver.get/WebDriverWait scheitert dann
+                unregister = token.on_cancel(driver.quit)
+            driver.get(url)
+            b.WebDriverWait(driver, 30).until(
+                b.EC.presence_of_element_located((b.By.CLASS_NAME, "theatre-info"))
+            )
+            cancellable_sleep(4)  # zusätzliche Zeit für dynamisches Laden
+            # Versuche mehrere Selektoren
+            page_source = driver.page_source
+            # Debug speichern (nur mit CONFIG["DEBUG_DUMPS"])
+            if write_debug_artifact("debug_rendered_page.html", page_source):
+                logger.debug("Gerendertes HTML in debug_rendered_page.html gespeichert")
+
+            links = parse_pool.run(parse_kwik_links, page_source)
+            if not links:
+                logger.error(f"Keine Kwik-Links gefunden für URL: {url}")
+        except CancelledByClient:
+            raise
+        except Exception as e:
+            check_cancelled()
+            logger.error(f"Fehler beim Rendern der Seite mit undetected_chromedriver: {str(e)}", exc_info=True)
+        finally:
+            if unregister:
+                unregister()
+            if driver:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    logger.debug(f"Browser bereits beendet: {e}")
+        return links
+
+    def _extract_m3u8(self, kwik_url: str) -> str:
+        logger.info("Extrahiere m3u8 von Kwik-URL: %s", kwik_url)
+        # Achte auf korrekte Header; Referer kann nötig sein
+        try:
+            # kwik hat eigene Cloudflare-Cookies; ein AnimePahe-Refresh hilft dort nicht
+            response = self.fetch(kwik_url, headers={'Referer': self.base_url}, timeout=15,
+                                  limiter=None, refresh_on_challenge=False)
+        except requests.RequestException as e:
+            logger.error(f"Fehler beim Abruf der Kwik-URL: {e}")
+            raise
+        response.raise_for_status()
+        # Suche nach eval(...) JS-Block und beautify um m3u8 zu finden
+        match = re.search(r';eval\(.*\)', response.text, flags=re.DOTALL)
+        if not match:
+            logger.error("Kein Videoplayer-Code (eval) gefunden")
+            raise ValueError("Fehler beim Finden des Videoplayer-Codes")
+        import jsbeautifier
+        beautified = jsbeautifier.beautify(match.group(0).replace('\\', ''))
+        m3u8_match = re.search(r'https?://[^\s\'"]+\.m3u8', beautified)
+        if not m3u8_match:
+            logger.error("Keine m3u8-URL im beautified Code gefunden")
+            raise ValueError("Fehler beim Extrahieren der Video-Stream-URL")
+        m3u8_url = m3u8_match.group(0)
+        logger.info("Extrahierte m3u8-URL: %s", m3u8_url)
+        return m3u8_url
+
+    def _parse_episode_url(self, url: str) -> dict:
+        logger.debug("Parse Episoden-URL: %s", url)
+        parsed = urlparse(url)
+        if not parsed.path.startswith('/play/'):
+            raise ValueError("Ungültige AnimePahe-Episoden-URL")
+        path_parts = parsed.path.split('/')
+        return {'anime_id': path_parts[-2], 'session_id': path_parts[-1]}
+
+    @coalesced("get_details")
+    def get_details(self, anime: dict) -> dict:
+        source = anime.get('source')
+        session_id = anime.get('session')
+        if source == 'pahe':
+            details = self._get_pahe_details(session_id)
+        else:
+            raise ValueError("Unbekannte Quelle")
+        details["source"] = source
+        details["identifier"] = session_id
+        details["session"] = session_id  # sicherstellen
+        details["title"] = clean_title(details.get("title", "Unknown"))
+        logger.debug("Details für Anime (Session: %s): %s", session_id, details)
+        return details
+
+    @upstream_retry
+    def fetch_details_html(self, session: str) -> bytes:
+        """Fetch-Stufe: rohes HTML der Detailseite, ungeparst (Parsen siehe parsers.parse_details)."""
+        url = f"{self.base_url}/anime/{session}"
+        response = self.fetch(url, timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    def _get_pahe_details(self, session: str) -> dict:
+        parsed = parse_pool.run(parse_details, self.fetch_details_html(session))
+        return self.details_from_parsed(session, parsed)
+
+    def details_from_parsed(self, session: str, parsed: dict) -> dict:
+        """Ergebnis von parsers.parse_details -> Detail-dict; cached dabei das Thumbnail."""
+        title = parsed["title"]
+        thumbnail_url = parsed["thumbnail_url"]
+        logger.debug("Gefundene Thumbnail-URL für '%s' (Session: %s): %s", title, session, thumbnail_url)
+        cached_filename = None
+        thumbnail_to_store = None
+        if thumbnail_url:
+            logger.debug("Starte Caching für Thumbnail von '%s' (Session: %s)...", title, session)
+            try:
+                cached_filename = cache_image(thumbnail_url)
+                if cached_filename:
+                    logger.info("Thumbnail für '%s' (Session: %s) erfolgreich gecached: %s", title, session, cached_filename)
+                    thumbnail_to_store = f"/cached_images/{cached_filename}"
+                else:
+                    logger.warning(f"Fehler beim Cachen des Thumbnails für '{title}' (Session: {session}) von {thumbnail_url}. Speichere Original-URL.")
+                    thumbnail_to_store = thumbnail_url
+            except Exception as e:
+                logger.error(f"Fehler beim Cachen des Thumbnails: {e}", exc_info=True)
+                thumbnail_to_store = thumbnail_url
+        else:
+            logger.info("Keine Thumbnail-URL für '%s' (Session: %s) gefunden.", title, session)
+        return {
+            "title": title,
+            "synopsis": parsed["synopsis"],
+            "info": parsed["synopsis"],
+            "relations": parsed["relations"],
+            "recommendations": parsed["recommendations"],
+            "thumbnail": thumbnail_to_store,
+            "genre": parsed["genre"],
+            "type": parsed["type"],
+            "studio": parsed["studio"],
+            "season": parsed["season"],
+            "year": parsed["year"]
+        }
+
+    def _kwik_tier(self, anime_id: str) -> str | None:
+        with self._kwik_tiers_lock:
+            entry = self._kwik_tiers.get(anime_id)
+        if entry is None:
+            return None
+        tier, remembered_at = entry
+        # "browser" laeuft ab, damit die billige Stufe spaeter wieder versucht wird
+        if tier == "browser" and time.time() - remembered_at > CONFIG.get("KWIK_BROWSER_MEMORY_SEC", 3600):
+            return None
+        return tier
+
+    def _remember_kwik_tier(self, anime_id: str, tier: str):
+        with self._kwik_tiers_lock:
+            self._kwik_tiers[anime_id] = (tier, time.time())
+            self._kwik_tiers.move_to_end(anime_id)
+            while len(self._kwik_tiers) > 2000:
+                self._kwik_tiers.popitem(last=False)
+            self._kwik_counts[tier] += 1
+
+    def _count_kwik(self, name: str):
+        with self._kwik_tiers_lock:
+            self._kwik_counts[name] += 1
+
+    def kwik_stats(self) -> dict:
+        """Zaehler des Kwik-Resolvers fuer /api/metrics (Aufloesungen pro Stufe, Eskalationen)."""
+        with self._kwik_tiers_lock:
+            tiers = [tier for tier, _ in self._kwik_tiers.values()]
+            return {
+                **self._kwik_counts,
+                "anime_http": tiers.count("http"),
+                "anime_browser": tiers.count("browser")
+            }
+
+# Globale Instanz
+crawler = AnimePaheCrawler()
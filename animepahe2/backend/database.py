@@ -1,223 +1,720 @@
-import sqlite3
-import os
-import logging
-from typing import List, Dict, Optional
-from .config import CONFIG
-
-logger = logging.getLogger(__name__)
-
-class AnimeCacheDB:
-    def __init__(self, db_path: str = CONFIG.get("DB_PATH", "anime_cache.db")):
-        """Initialisiert die SQLite-Datenbank."""
-        self.db_path = db_path
-        self._init_db()
-        logger.info(f"Datenbank initialisiert unter: {self.db_path}")
-
-    def _init_db(self):
-        """Erstellt die Datenbanktabellen, falls sie nicht existieren."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS anime_cache (
-                        session TEXT PRIMARY KEY,
-                        title TEXT,
-                        thumbnail TEXT,
-                        type TEXT,
-                        genre TEXT,
-                        studio TEXT,
-                        year TEXT,
-                        synopsis TEXT,
-                        info TEXT,
-                        source TEXT,
-                        identifier TEXT
-                    )
-                """)
-                conn.commit()
-                logger.debug("Datenbanktabellen erfolgreich erstellt oder überprüft.")
-        except sqlite3.Error as e:
-            logger.error(f"Fehler beim Initialisieren der Datenbank: {e}")
-            raise
-
-    def _build_thumbnail_url(self, thumb_input: Optional[str]) -> Optional[str]:
-        """Erstellt eine Thumbnail-URL basierend auf dem Input, prüft lokale Existenz."""
-        if not thumb_input:
-            return None
-        # Extrahiere den Basenamen (z. B. 'xxx.png' aus '/cached_images/xxx.png' oder voller URL)
-        basename = os.path.basename(thumb_input)
-        cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
-        local_path = os.path.join(cache_dir, basename)
-        if os.path.exists(local_path):
-            return f"/cached_images/{basename}"
-        logger.warning(f"Thumbnail-Datei {local_path} nicht im Cache gefunden. Rückgabe der Original-URL falls vorhanden.")
-        # Wenn das Original eine URL oder relative Pfad ist, gib es zurück — besser für das Frontend
-        if isinstance(thumb_input, str) and (thumb_input.startswith("http") or thumb_input.startswith("/")):
-            return thumb_input
-        return None
-
-    def set_details_bulk(self, anime_details: List[Dict]):
-        """Speichert eine Liste von Anime-Details in der Datenbank."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                inserted_count = 0
-                for anime in anime_details:
-                    session_id = anime.get('session')
-                    if not session_id:
-                        logger.error(f"Keine Session-ID für Anime {anime.get('title')} gefunden. Überspringe Eintrag: {anime}")
-                        continue
-                    logger.debug(f"Speichere Anime: session={session_id}, title={anime.get('title')}, thumbnail={anime.get('thumbnail')}, identifier={anime.get('identifier')}")
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO anime_cache (
-                            session, title, thumbnail, type, genre, studio, year, synopsis, info, source, identifier
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        session_id,
-                        anime.get("title"),
-                        self._build_thumbnail_url(anime.get("thumbnail")),
-                        anime.get("type"),
-                        anime.get("genre"),
-                        anime.get("studio"),
-                        anime.get("year"),
-                        anime.get("synopsis"),
-                        anime.get("info"),
-                        anime.get("source", "pahe"),
-                        anime.get("identifier")
-                    ))
-                    inserted_count += 1
-                conn.commit()
-                # Überprüfe, wie viele Einträge tatsächlich in der DB sind
-                cursor.execute("SELECT COUNT(*) FROM anime_cache")
-                count = cursor.fetchone()[0]
-                cursor.execute("SELECT session, title, identifier FROM anime_cache LIMIT 5")
-                sample_entries = cursor.fetchall()
-                logger.info(f"{inserted_count} Anime-Details erfolgreich in die Datenbank eingefügt. Gesamtanzahl Einträge: {count}")
-                logger.debug(f"Beispielhafte Einträge: {sample_entries}")
-        except sqlite3.Error as e:
-            logger.error(f"Fehler beim Speichern der Anime-Details: {e}")
-            raise
-
-    def search_cached_anime(self, query: str, type_filter: str, genre_filter: str, studio_filter: str, year_filter: str) -> List[Dict]:
-        """Sucht im Cache nach Anime basierend auf dem Suchbegriff und Filtern."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                sql = """
-                    SELECT session, title, thumbnail, type, genre, studio, year, synopsis, info, source, identifier
-                    FROM anime_cache
-                    WHERE 1=1
-                """
-                params = []
-                if query:
-                    sql += " AND title LIKE ?"
-                    params.append(f"%{query}%")
-                if type_filter and type_filter != "All":
-                    sql += " AND type = ?"
-                    params.append(type_filter)
-                if genre_filter and genre_filter != "All":
-                    sql += " AND genre LIKE ?"
-                    params.append(f"%{genre_filter}%")
-                if studio_filter and studio_filter != "All":
-                    sql += " AND studio = ?"
-                    params.append(studio_filter)
-                if year_filter and year_filter != "All":
-                    sql += " AND year = ?"
-                    params.append(year_filter)
-
-                cursor.execute(sql, params)
-                rows = cursor.fetchall()
-                results = [
-                    {
-                        "session": row[0],
-                        "title": row[1],
-                        "thumbnail": row[2],
-                        "type": row[3],
-                        "genre": row[4],
-                        "studio": row[5],
-                        "year": row[6],
-                        "synopsis": row[7],
-                        "info": row[8],
-                        "source": row[9],
-                        "identifier": row[10]
-                    } for row in rows
-                ]
-                logger.debug(f"Cache-Suche ergab {len(results)} Ergebnisse für Abfrage: {query}")
-                return results
-        except sqlite3.Error as e:
-            logger.error(f"Fehler bei der Cache-Suche: {e}")
-            raise
-
-    def get_unique_filters(self) -> Dict:
-        """Gibt eindeutige Filteroptionen zurück (Typen, Genres, Studios, Jahre)."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                filters = {
-                    "types": ["All"],
-                    "genres": ["All"],
-                    "studios": ["All"],
-                    "years": ["All"]
-                }
-
-                # Typen
-                cursor.execute("SELECT DISTINCT type FROM anime_cache WHERE type IS NOT NULL")
-                types = [row[0] for row in cursor.fetchall()]
-                filters["types"].extend(sorted(types))
-
-                # Genres (zerlegt kommaseparierte Genres)
-                cursor.execute("SELECT DISTINCT genre FROM anime_cache WHERE genre IS NOT NULL")
-                genres = set()
-                for row in cursor.fetchall():
-                    if row[0]:
-                        genres.update(g.strip() for g in row[0].split(","))
-                filters["genres"].extend(sorted(genres))
-
-                # Studios
-                cursor.execute("SELECT DISTINCT studio FROM anime_cache WHERE studio IS NOT NULL")
-                studios = [row[0] for row in cursor.fetchall()]
-                filters["studios"].extend(sorted(studios))
-
-                # Jahre
-                cursor.execute("SELECT DISTINCT year FROM anime_cache WHERE year IS NOT NULL")
-                years = [row[0] for row in cursor.fetchall()]
-                filters["years"].extend(sorted(years, reverse=True))
-
-                logger.debug(f"Filteroptionen abgerufen: {filters}")
-                return filters
-        except sqlite3.Error as e:
-            logger.error(f"Fehler beim Abrufen der Filteroptionen: {e}")
-            raise
-
-    def get_cached_session_ids(self) -> List[str]:
-        """Gibt alle gespeicherten Session-IDs zurück."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT session FROM anime_cache WHERE session IS NOT NULL")
-                session_ids = [row[0] for row in cursor.fetchall()]
-                logger.debug(f"{len(session_ids)} Session-IDs im Cache gefunden: {session_ids[:10]}")
-                if not session_ids:
-                    cursor.execute("SELECT session, title, identifier FROM anime_cache LIMIT 5")
-                    sample_entries = cursor.fetchall()
-                    cursor.execute("SELECT COUNT(*) FROM anime_cache WHERE session IS NULL")
-                    null_count = cursor.fetchone()[0]
-                    logger.warning(f"Keine Session-IDs gefunden. Beispielhafte Einträge: {sample_entries}, Anzahl NULL-Session-Einträge: {null_count}")
-                return session_ids
-        except sqlite3.Error as e:
-            logger.error(f"Fehler beim Abrufen der Session-IDs: {e}")
-            raise
-
-    def clear_cache(self):
-        """Löscht alle Daten aus der Datenbank."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM anime_cache")
-                conn.commit()
-                logger.info("Anime-Cache erfolgreich gelöscht.")
-        except sqlite3.Error as e:
-            logger.error(f"Fehler beim Löschen des Caches: {e}")
-            raise
-
-# Instanz der Datenbank erstellen
-anime_cache_db = AnimeCacheDB()
+import sqlite3
+import os
+import re
+import time
+import hashlib
+import json
+import logging
+import threading
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Spalten von anime_cache in Schreibreihenfolge (content_hash wird separat angehaengt)
+_ANIME_COLUMNS = ("session", "title", "thumbnail", "type", "genre", "studio", "year", "synopsis", "info", "source", "identifier")
+# SQLite erlaubt standardmaessig max. 999 Parameter pro Statement
+_SQL_VARIABLE_CHUNK = 900
+
+class ShadowInUseError(RuntimeError):
+    """Es laeuft bereits ein Neuaufbau bzw. Snapshot-Import ueber die Schatten-Datenbank."""
+
+def _row_hash(values: tuple) -> str:
+    """Inhalts-Hash einer Zeile, um unveraenderte Datensaetze beim Upsert zu erkennen."""
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def _parse_year(year) -> Optional[int]:
+    """Extrahiert ein vierstelliges Jahr aus dem (Text-)Jahresfeld."""
+    if year is None:
+        return None
+    m = re.search(r'\b(\d{4})\b', str(year))
+    return int(m.group(1)) if m else None
+
+def _normalize_type(anime_type) -> Optional[str]:
+    """Normalisiert den Typ fuer Filter und Index (z. B. ' TV ' -> 'tv')."""
+    if not anime_type or not str(anime_type).strip():
+        return None
+    return str(anime_type).strip().lower()
+
+def _title_sort_key(title) -> Optional[str]:
+    return str(title).strip().lower() if title else None
+
+def _full_row(values: tuple) -> tuple:
+    """Haengt an die Werte aus _ANIME_COLUMNS die abgeleiteten Spalten und den Inhalts-Hash an."""
+    derived = (_parse_year(values[6]), _normalize_type(values[3]), _title_sort_key(values[1]))
+    return values + derived + (_row_hash(values),)
+
+# ---------- Schema-Migrationen ----------
+# Jede Migration wird genau einmal ausgefuehrt; der Stand steht in PRAGMA user_version.
+# Neue Migrationen nur hinten anhaengen, bestehende nie veraendern.
+
+def _add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, declaration: str):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def _migration_1_base_schema(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS anime_cache (
+            session TEXT PRIMARY KEY,
+            title TEXT,
+            thumbnail TEXT,
+            type TEXT,
+            genre TEXT,
+            studio TEXT,
+            year TEXT,
+            synopsis TEXT,
+            info TEXT,
+            source TEXT,
+            identifier TEXT
+        )
+    """)
+
+def _migration_2_content_hash(cursor: sqlite3.Cursor):
+    _add_column_if_missing(cursor, "anime_cache", "content_hash", "TEXT")
+
+def _migration_3_sort_columns(cursor: sqlite3.Cursor):
+    """Typisierte Spalten (Jahr als INTEGER, normalisierter Typ, Sortiertitel, Cache-Zeit) plus Indizes."""
+    _add_column_if_missing(cursor, "anime_cache", "year_int", "INTEGER")
+    _add_column_if_missing(cursor, "anime_cache", "type_norm", "TEXT")
+    _add_column_if_missing(cursor, "anime_cache", "title_sort", "TEXT")
+    _add_column_if_missing(cursor, "anime_cache", "cached_at", "REAL")
+    cursor.execute("SELECT session, title, type, year FROM anime_cache")
+    backfill = [(_parse_year(year), _normalize_type(anime_type), _title_sort_key(title), session)
+                for session, title, anime_type, year in cursor.fetchall()]
+    cursor.executemany("UPDATE anime_cache SET year_int = ?, type_norm = ?, title_sort = ? WHERE session = ?", backfill)
+    cursor.execute("UPDATE anime_cache SET cached_at = ? WHERE cached_at IS NULL", (time.time(),))
+    for name, columns in _SORT_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON anime_cache ({columns})")
+
+def _migration_4_catalog_meta(cursor: sqlite3.Cursor):
+    """Zaehler 'generation', der bei jeder inhaltlichen Aenderung erhoeht wird (auch prozessuebergreifend sichtbar)."""
+    cursor.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('generation', 0)")
+
+def _bump_generation(cursor: sqlite3.Cursor):
+    cursor.execute("UPDATE catalog_meta SET value = value + 1 WHERE key = 'generation'")
+
+# Indizes fuer die Kombinationen aus Filter (Typ/Studio/Jahr-Bereich) und Sortierung (Titel/Jahr/zuletzt gecacht)
+_SORT_INDEXES = (
+    ("idx_anime_title_sort", "title_sort"),
+    ("idx_anime_year", "year_int DESC, title_sort"),
+    ("idx_anime_cached_at", "cached_at"),
+    ("idx_anime_type_title", "type_norm, title_sort"),
+    ("idx_anime_type_year", "type_norm, year_int DESC, title_sort"),
+    ("idx_anime_type_cached_at", "type_norm, cached_at"),
+    ("idx_anime_studio_title", "studio, title_sort"),
+    ("idx_anime_studio_year", "studio, year_int DESC, title_sort"),
+)
+
+_MIGRATIONS = (
+    (1, _migration_1_base_schema),
+    (2, _migration_2_content_hash),
+    (3, _migration_3_sort_columns),
+    (4, _migration_4_catalog_meta),
+)
+
+# Schnelle, aber nicht crash-sichere Einstellungen fuer Schatten-Datenbanken: die Datei wird
+# ohnehin verworfen, wenn der Neuaufbau abbricht
+_BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+
+# Sortierungen fuer search_cached_anime; jede passt zu einem der Indizes oben
+_SORT_ORDERS = {
+    "title": "title_sort ASC",
+    "year": "year_int DESC, title_sort ASC",
+    "recent": "cached_at DESC",
+}
+
+class AnimeCacheDB:
+    def __init__(self, db_path: str = CONFIG.get("DB_PATH", "anime_cache.db"), bulk_load_mode: bool = False):
+        """
+        Initialisiert die SQLite-Datenbank.
+        Args:
+            bulk_load_mode (bool): Schreibverbindungen mit _BULK_LOAD_PRAGMAS (nur fuer Schatten-Datenbanken).
+        """
+        self.db_path = db_path
+        self.bulk_load_mode = bulk_load_mode
+        # Serialisiert Schreibvorgaenge dieses Prozesses mit dem Austausch der Datei (swap_in)
+        self._write_lock = threading.RLock()
+        # Callbacks, die nach jedem Schreibvorgang die geaenderten Zeilen erhalten (z. B. Such-Indizes)
+        self._write_listeners: List[Callable[[List[Dict]], None]] = []
+        # Callbacks, die nach einem Komplett-Austausch des Katalogs (bulk_load) neu laden muessen
+        self._reload_listeners: List[Callable[[], None]] = []
+        # Hoechstens eine Schatten-Datenbank gleichzeitig (Neuaufbau oder Snapshot-Import)
+        self._shadow_lock = threading.Lock()
+        # Waehrend eine Schatten-Datenbank existiert: Zeilen, die in die Live-Datenbank geschrieben
+        # wurden; swap_in spielt sie vor dem Austausch in die Schatten-Datenbank nach
+        self._shadow_pending: Optional[List[Dict]] = None
+        self._init_db()
+        logger.info(f"Datenbank initialisiert unter: {self.db_path}")
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """Verbindung fuer Schreibvorgaenge (im bulk_load_mode mit den schnellen Pragmas)."""
+        conn = sqlite3.connect(self.db_path, **kwargs)
+        if self.bulk_load_mode:
+            for pragma in _BULK_LOAD_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    def _init_db(self):
+        """Erstellt bzw. migriert das Schema auf den aktuellen Stand (siehe _MIGRATIONS)."""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("PRAGMA user_version")
+                version = cursor.fetchone()[0]
+                for target_version, migration in _MIGRATIONS:
+                    if version >= target_version:
+                        continue
+                    migration(cursor)
+                    cursor.execute(f"PRAGMA user_version = {target_version}")
+                    conn.commit()
+                    version = target_version
+                    logger.info(f"Datenbank-Schema migriert auf Version {target_version} ({migration.__name__})")
+                logger.debug(f"Datenbank-Schema auf Version {version}.")
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Initialisieren der Datenbank: {e}")
+            raise
+
+    def add_write_listener(self, listener: Callable[[List[Dict]], None]):
+        """Registriert einen Callback, der nach set_details_bulk die neuen/geaenderten Zeilen erhaelt."""
+        self._write_listeners.append(listener)
+
+    def _notify_write_listeners(self, rows: List[Dict]):
+        for listener in self._write_listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"Fehler in Write-Listener {listener}: {e}", exc_info=True)
+
+    def add_reload_listener(self, listener: Callable[[], None]):
+        """Registriert einen Callback, der nach bulk_load aufgerufen wird (Katalog komplett neu einlesen)."""
+        self._reload_listeners.append(listener)
+
+    def _notify_reload_listeners(self):
+        for listener in self._reload_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Fehler in Reload-Listener {listener}: {e}", exc_info=True)
+
+    def get_generation(self) -> int:
+        """Aktuelle Katalog-Generation; aendert sich bei jedem Schreibvorgang, auch aus anderen Prozessen."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'generation'").fetchone()
+                return row[0] if row else 0
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Lesen der Katalog-Generation: {e}")
+            raise
+
+    def _thumbnail_index(self) -> Set[str]:
+        """Liest die Dateinamen im Bild-Cache einmalig ein (statt einem stat() pro Zeile)."""
+        cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+        try:
+            with os.scandir(cache_dir) as entries:
+                return {entry.name for entry in entries if entry.is_file()}
+        except OSError as e:
+            logger.warning(f"Bild-Cache {cache_dir} konnte nicht gelesen werden: {e}")
+            return set()
+
+    def _build_thumbnail_url(self, thumb_input: Optional[str], thumbnail_index: Optional[Set[str]] = None) -> Optional[str]:
+        """
+        Erstellt eine Thumbnail-URL basierend auf dem Input, prüft lokale Existenz.
+        Mit thumbnail_index (siehe _thumbnail_index) wird gegen den In-Memory-Index geprueft.
+        """
+        if not thumb_input:
+            return None
+        # Extrahiere den Basenamen (z. B. 'xxx.png' aus '/cached_images/xxx.png' oder voller URL)
+        basename = os.path.basename(thumb_input)
+        if thumbnail_index is not None:
+            if basename in thumbnail_index:
+                return f"/cached_images/{basename}"
+        else:
+            cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+            local_path = os.path.join(cache_dir, basename)
+            if os.path.exists(local_path):
+                return f"/cached_images/{basename}"
+            logger.warning(f"Thumbnail-Datei {local_path} nicht im Cache gefunden. Rückgabe der Original-URL falls vorhanden.")
+        # Wenn das Original eine URL oder relative Pfad ist, gib es zurück — besser für das Frontend
+        if isinstance(thumb_input, str) and (thumb_input.startswith("http") or thumb_input.startswith("/")):
+            return thumb_input
+        return None
+
+    def set_details_bulk(self, anime_details: List[Dict]) -> Dict[str, int]:
+        """
+        Speichert eine Liste von Anime-Details in der Datenbank (Upsert).
+        Alle Zeilen werden in einer Transaktion per executemany geschrieben; Zeilen, deren
+        Inhalts-Hash sich nicht geaendert hat, werden gar nicht erst angefasst.
+        Returns:
+            Dict[str, int]: Anzahl 'inserted', 'updated', 'unchanged' und 'skipped' (ohne Session-ID).
+        """
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        thumbnail_index = self._thumbnail_index()
+        rows = {}
+        for anime in anime_details:
+            session_id = anime.get('session')
+            if not session_id:
+                logger.error(f"Keine Session-ID für Anime {anime.get('title')} gefunden. Überspringe Eintrag.")
+                counts["skipped"] += 1
+                continue
+            values = (
+                session_id,
+                anime.get("title"),
+                self._build_thumbnail_url(anime.get("thumbnail"), thumbnail_index),
+                anime.get("type"),
+                anime.get("genre"),
+                anime.get("studio"),
+                anime.get("year"),
+                anime.get("synopsis"),
+                anime.get("info"),
+                anime.get("source", "pahe"),
+                anime.get("identifier")
+            )
+            # Bei doppelten Sessions gewinnt der letzte Eintrag (wie zuvor bei INSERT OR REPLACE)
+            rows[session_id] = _full_row(values)
+        if not rows:
+            return counts
+
+        try:
+            with self._write_lock, self._connect() as conn:
+                cursor = conn.cursor()
+                existing_hashes = {}
+                sessions = list(rows)
+                for i in range(0, len(sessions), _SQL_VARIABLE_CHUNK):
+                    chunk = sessions[i:i + _SQL_VARIABLE_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor.execute(f"SELECT session, content_hash FROM anime_cache WHERE session IN ({placeholders})", chunk)
+                    existing_hashes.update(cursor.fetchall())
+
+                to_write = []
+                for session_id, row in rows.items():
+                    if session_id not in existing_hashes:
+                        counts["inserted"] += 1
+                    elif existing_hashes[session_id] != row[-1]:
+                        counts["updated"] += 1
+                    else:
+                        counts["unchanged"] += 1
+                        continue
+                    to_write.append(row)
+
+                # cached_at wird nur beim ersten Einfuegen gesetzt ("zuletzt gecacht")
+                now = time.time()
+                to_write = [row + (now,) for row in to_write]
+                columns = _ANIME_COLUMNS + ("year_int", "type_norm", "title_sort", "content_hash", "cached_at")
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in ("session", "cached_at"))
+                cursor.executemany(f"""
+                    INSERT INTO anime_cache ({", ".join(columns)})
+                    VALUES ({", ".join("?" * len(columns))})
+                    ON CONFLICT(session) DO UPDATE SET {updates}
+                """, to_write)
+                if to_write:
+                    _bump_generation(cursor)
+                conn.commit()
+                if self._shadow_pending is not None:
+                    self._shadow_pending.extend(anime_details)
+                logger.info("Anime-Details gespeichert: %d neu, %d aktualisiert, %d unverändert, %d übersprungen",
+                            counts["inserted"], counts["updated"], counts["unchanged"], counts["skipped"])
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Speichern der Anime-Details: {e}")
+            raise
+        if to_write:
+            self._notify_write_listeners([dict(zip(_ANIME_COLUMNS, row)) for row in to_write])
+        return counts
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Liefert alle Zeilen (Spalten aus _ANIME_COLUMNS plus cached_at) nach Session sortiert.
+        Gelesen wird seitenweise per Keyset-Paginierung, jede Seite mit eigener Verbindung,
+        damit der Generator auch ueber Threads hinweg (StreamingResponse) verwendet werden kann.
+        """
+        columns = _ANIME_COLUMNS + ("cached_at",)
+        last_session = ""
+        while True:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    batch = conn.execute(
+                        f"SELECT {', '.join(columns)} FROM anime_cache WHERE session > ? ORDER BY session LIMIT ?",
+                        (last_session, batch_size)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Fehler beim Lesen der Anime-Zeilen: {e}")
+                raise
+            for row in batch:
+                yield dict(zip(columns, row))
+            if len(batch) < batch_size:
+                return
+            last_session = batch[-1][0]
+
+    def bulk_load(self, rows: Iterable[Dict], replace: bool = True, batch_size: int = 5000) -> int:
+        """
+        Schnelles Laden vieler Zeilen (z. B. aus einem Snapshot) in einer einzigen Transaktion.
+        Die Sortier-Indizes werden vorher entfernt und erst nach dem Laden neu aufgebaut.
+        Schlaegt etwas fehl (auch im uebergebenen Iterator), bleibt der alte Stand unveraendert.
+        Args:
+            rows: Dicts mit den Spalten aus _ANIME_COLUMNS (optional cached_at).
+            replace (bool): True ersetzt den kompletten Katalog, False fuehrt zusammen (Upsert).
+        Returns:
+            int: Anzahl geladener Zeilen.
+        """
+        columns = _ANIME_COLUMNS + ("year_int", "type_norm", "title_sort", "content_hash", "cached_at")
+        now = time.time()
+        loaded = 0
+        self._write_lock.acquire()
+        conn = self._connect(isolation_level=None)
+        try:
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("BEGIN IMMEDIATE")
+            for name, _ in _SORT_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            if replace:
+                conn.execute("DELETE FROM anime_cache")
+            statement = f"INSERT OR REPLACE INTO anime_cache ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            valid_rows = (row for row in rows if row.get("session"))
+            while True:
+                batch = [
+                    _full_row(tuple(row.get(c) for c in _ANIME_COLUMNS)) + (row.get("cached_at") or now,)
+                    for row in islice(valid_rows, batch_size)
+                ]
+                if not batch:
+                    break
+                conn.executemany(statement, batch)
+                loaded += len(batch)
+            for name, index_columns in _SORT_INDEXES:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON anime_cache ({index_columns})")
+            _bump_generation(conn.cursor())
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+            self._write_lock.release()
+        logger.info(f"Bulk-Load abgeschlossen: {loaded} Zeilen ({'ersetzt' if replace else 'zusammengefuehrt'})")
+        self._notify_reload_listeners()
+        return loaded
+
+    def _build_search_where(self, query: str, type_filter: str, genre_filter: str, studio_filter: str, year_filter: str,
+                            year_from: Optional[int], year_to: Optional[int], sessions: Optional[List[str]] = None) -> tuple[str, list]:
+        """Baut die WHERE-Klausel fuer Suche und Zaehlung (nutzt die typisierten, indizierten Spalten)."""
+        sql = " WHERE 1=1"
+        params = []
+        if sessions is not None:
+            sql += f" AND session IN ({','.join('?' * len(sessions))})"
+            params.extend(sessions)
+        if query:
+            sql += " AND title LIKE ?"
+            params.append(f"%{query}%")
+        if type_filter and type_filter != "All":
+            sql += " AND type_norm = ?"
+            params.append(_normalize_type(type_filter))
+        if genre_filter and genre_filter != "All":
+            sql += " AND genre LIKE ?"
+            params.append(f"%{genre_filter}%")
+        if studio_filter and studio_filter != "All":
+            sql += " AND studio = ?"
+            params.append(studio_filter)
+        if year_filter and year_filter != "All":
+            year_int = _parse_year(year_filter)
+            if year_int is not None:
+                sql += " AND year_int = ?"
+                params.append(year_int)
+            else:
+                sql += " AND year = ?"
+                params.append(year_filter)
+        if year_from is not None:
+            sql += " AND year_int >= ?"
+            params.append(year_from)
+        if year_to is not None:
+            sql += " AND year_int <= ?"
+            params.append(year_to)
+        return sql, params
+
+    def search_cached_anime(self, query: str, type_filter: str, genre_filter: str, studio_filter: str, year_filter: str,
+                            sort: str = "title", year_from: Optional[int] = None, year_to: Optional[int] = None,
+                            limit: Optional[int] = None, offset: int = 0, sessions: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Sucht im Cache nach Anime basierend auf dem Suchbegriff und Filtern.
+        Args:
+            sessions (List[str] | None): Beschraenkt die Suche auf diese Sessions (z. B. Fuzzy-Treffer, max. 900).
+            sort (str): 'title', 'year' (neueste zuerst) oder 'recent' (zuletzt gecacht zuerst).
+            year_from/year_to (int | None): Optionaler Jahresbereich (inklusive).
+            limit/offset: Optionale Paginierung direkt in SQL.
+        Raises:
+            ValueError: Bei unbekannter Sortierung.
+        """
+        if sort not in _SORT_ORDERS:
+            raise ValueError(f"Unbekannte Sortierung: {sort}")
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                where, params = self._build_search_where(query, type_filter, genre_filter, studio_filter, year_filter,
+                                                         year_from, year_to, sessions)
+                sql = f"""
+                    SELECT session, title, thumbnail, type, genre, studio, year, synopsis, info, source, identifier
+                    FROM anime_cache
+                    {where}
+                    ORDER BY {_SORT_ORDERS[sort]}
+                """
+                if limit is not None:
+                    sql += " LIMIT ? OFFSET ?"
+                    params += [limit, offset]
+
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                results = [
+                    {
+                        "session": row[0],
+                        "title": row[1],
+                        "thumbnail": row[2],
+                        "type": row[3],
+                        "genre": row[4],
+                        "studio": row[5],
+                        "year": row[6],
+                        "synopsis": row[7],
+                        "info": row[8],
+                        "source": row[9],
+                        "identifier": row[10]
+                    } for row in rows
+                ]
+                logger.debug("Cache-Suche ergab %d Ergebnisse für Abfrage: %s", len(results), query)
+                return results
+        except sqlite3.Error as e:
+            logger.error(f"Fehler bei der Cache-Suche: {e}")
+            raise
+
+    def count_cached_anime(self, query: str = "", type_filter: str = "All", genre_filter: str = "All", studio_filter: str = "All",
+                           year_filter: str = "All", year_from: Optional[int] = None, year_to: Optional[int] = None) -> int:
+        """Zaehlt die Treffer einer Suche (fuer Paginierung ohne alle Zeilen zu laden)."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                where, params = self._build_search_where(query, type_filter, genre_filter, studio_filter, year_filter, year_from, year_to)
+                cursor.execute(f"SELECT COUNT(*) FROM anime_cache{where}", params)
+                return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Zählen der Cache-Einträge: {e}")
+            raise
+
+    def get_unique_filters(self) -> Dict:
+        """Gibt eindeutige Filteroptionen zurück (Typen, Genres, Studios, Jahre)."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                filters = {
+                    "types": ["All"],
+                    "genres": ["All"],
+                    "studios": ["All"],
+                    "years": ["All"]
+                }
+
+                # Typen
+                cursor.execute("SELECT DISTINCT type FROM anime_cache WHERE type IS NOT NULL")
+                types = [row[0] for row in cursor.fetchall()]
+                filters["types"].extend(sorted(types))
+
+                # Genres (zerlegt kommaseparierte Genres)
+                cursor.execute("SELECT DISTINCT genre FROM anime_cache WHERE genre IS NOT NULL")
+                genres = set()
+                for row in cursor.fetchall():
+                    if row[0]:
+                        genres.update(g.strip() for g in row[0].split(","))
+                filters["genres"].extend(sorted(genres))
+
+                # Studios
+                cursor.execute("SELECT DISTINCT studio FROM anime_cache WHERE studio IS NOT NULL")
+                studios = [row[0] for row in cursor.fetchall()]
+                filters["studios"].extend(sorted(studios))
+
+                # Jahre
+                cursor.execute("SELECT DISTINCT year FROM anime_cache WHERE year IS NOT NULL")
+                years = [row[0] for row in cursor.fetchall()]
+                filters["years"].extend(sorted(years, reverse=True))
+
+                logger.debug("Filteroptionen abgerufen: %s", filters)
+                return filters
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Abrufen der Filteroptionen: {e}")
+            raise
+
+    def get_titles(self) -> List[tuple]:
+        """Gibt (session, title) aller Eintraege zurueck, z. B. fuer den Aufbau des Trigramm-Index."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT session, title FROM anime_cache WHERE session IS NOT NULL AND title IS NOT NULL")
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Abrufen der Titel: {e}")
+            raise
+
+    def get_details_by_sessions(self, sessions: List[str]) -> Dict[str, Dict]:
+        """
+        Laedt mehrere Anime auf einmal (WHERE session IN (...), in Bloecken von _SQL_VARIABLE_CHUNK).
+        Returns:
+            Dict[str, Dict]: session -> Zeile; nicht gecachte Sessions fehlen im Ergebnis.
+        """
+        unique = list(dict.fromkeys(s for s in sessions if s))
+        found = {}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                for i in range(0, len(unique), _SQL_VARIABLE_CHUNK):
+                    chunk = unique[i:i + _SQL_VARIABLE_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor.execute(f"SELECT {', '.join(_ANIME_COLUMNS)} FROM anime_cache WHERE session IN ({placeholders})", chunk)
+                    for row in cursor.fetchall():
+                        found[row[0]] = dict(zip(_ANIME_COLUMNS, row))
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Abrufen mehrerer Anime-Details: {e}")
+            raise
+        return found
+
+    def get_sessions_missing_facets(self) -> List[tuple]:
+        """(session, title) aller Anime, denen Typ, Studio, Jahr oder Genre fehlt."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT session, title FROM anime_cache
+                    WHERE title IS NOT NULL AND (type_norm IS NULL OR year_int IS NULL
+                        OR studio IS NULL OR TRIM(studio) = '' OR genre IS NULL OR TRIM(genre) = '')
+                """)
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Suchen unvollstaendiger Anime: {e}")
+            raise
+
+    def get_cached_session_ids(self) -> List[str]:
+        """Gibt alle gespeicherten Session-IDs zurück."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT session FROM anime_cache WHERE session IS NOT NULL")
+                session_ids = [row[0] for row in cursor.fetchall()]
+                logger.debug("%d Session-IDs im Cache gefunden: %s", len(session_ids), session_ids[:10])
+                if not session_ids:
+                    cursor.execute("SELECT session, title, identifier FROM anime_cache LIMIT 5")
+                    sample_entries = cursor.fetchall()
+                    cursor.execute("SELECT COUNT(*) FROM anime_cache WHERE session IS NULL")
+                    null_count = cursor.fetchone()[0]
+                    logger.warning(f"Keine Session-IDs gefunden. Beispielhafte Einträge: {sample_entries}, Anzahl NULL-Session-Einträge: {null_count}")
+                return session_ids
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Abrufen der Session-IDs: {e}")
+            raise
+
+    def clear_cache(self):
+        """Löscht alle Daten aus der Datenbank."""
+        try:
+            with self._write_lock, self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM anime_cache")
+                _bump_generation(cursor)
+                conn.commit()
+                logger.info("Anime-Cache erfolgreich gelöscht.")
+        except sqlite3.Error as e:
+            logger.error(f"Fehler beim Löschen des Caches: {e}")
+            raise
+        self._notify_reload_listeners()
+
+    # ---------- Neuaufbau ueber eine Schatten-Datenbank ----------
+    @property
+    def shadow_path(self) -> str:
+        return f"{self.db_path}.shadow"
+
+    @property
+    def shadow_active(self) -> bool:
+        return self._shadow_lock.locked()
+
+    def create_shadow(self) -> "AnimeCacheDB":
+        """
+        Legt eine leere Schatten-Datenbank neben der Live-Datenbank an (vorhandene Reste werden verworfen).
+        Sie wird mit set_details_bulk/bulk_load befuellt, waehrend die Live-Datenbank weiter ausliefert,
+        und anschliessend per swap_in uebernommen oder per discard_shadow verworfen.
+        Raises:
+            ShadowInUseError: Wenn bereits eine Schatten-Datenbank in Arbeit ist.
+        """
+        if not self._shadow_lock.acquire(blocking=False):
+            raise ShadowInUseError("Neuaufbau oder Snapshot-Import laeuft bereits")
+        try:
+            self._remove_shadow_files()
+            shadow = AnimeCacheDB(self.shadow_path, bulk_load_mode=True)
+        except BaseException:
+            self._shadow_lock.release()
+            raise
+        with self._write_lock:
+            self._shadow_pending = []
+        return shadow
+
+    def discard_shadow(self):
+        """Verwirft die Schatten-Datenbank des laufenden Neuaufbaus bzw. Imports."""
+        with self._write_lock:
+            self._shadow_pending = None
+        self._remove_shadow_files()
+        self._release_shadow()
+
+    def _remove_shadow_files(self):
+        for path in (self.shadow_path, f"{self.shadow_path}-journal"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _release_shadow(self):
+        if self._shadow_lock.locked():
+            self._shadow_lock.release()
+
+    def swap_in(self, shadow: "AnimeCacheDB", keep_cached_at: bool = True):
+        """
+        Ersetzt die Live-Datenbank atomar durch die Schatten-Datenbank (os.replace).
+        Da jede Abfrage eine eigene Verbindung oeffnet, lesen alle folgenden Abfragen sofort die neue
+        Datei; laufende Abfragen beenden sich noch auf der alten. Die Katalog-Generation wird
+        fortgefuehrt, damit sie fuer Clients monoton bleibt.
+        Args:
+            keep_cached_at (bool): 'zuletzt gecacht' fuer bereits bekannte Sessions aus der Live-DB uebernehmen.
+        """
+        with self._write_lock:
+            # Waehrenddessen in die Live-Datenbank geschriebene Zeilen (z. B. Remote-Suche) nicht verlieren
+            pending, self._shadow_pending = self._shadow_pending or [], None
+            if pending:
+                shadow.set_details_bulk(pending)
+                logger.info(f"{len(pending)} waehrend des Neuaufbaus geschriebene Zeilen in die Schatten-Datenbank uebernommen")
+            live_generation = self.get_generation()
+            conn = sqlite3.connect(shadow.db_path)
+            try:
+                if keep_cached_at:
+                    conn.execute("ATTACH DATABASE ? AS live", (self.db_path,))
+                    conn.execute("""
+                        UPDATE anime_cache SET cached_at = (
+                            SELECT l.cached_at FROM live.anime_cache l WHERE l.session = anime_cache.session
+                        ) WHERE session IN (SELECT session FROM live.anime_cache)
+                    """)
+                conn.execute("UPDATE catalog_meta SET value = ? WHERE key = 'generation'", (live_generation + 1,))
+                conn.commit()
+                if keep_cached_at:
+                    conn.execute("DETACH DATABASE live")
+            finally:
+                conn.close()
+            # Unter Windows schlaegt os.replace fehl, solange eine Verbindung die Datei offen haelt
+            for attempt in range(10):
+                try:
+                    os.replace(shadow.db_path, self.db_path)
+                    break
+                except PermissionError:
+                    if attempt == 9:
+                        raise
+                    time.sleep(0.2)
+            self._release_shadow()
+        logger.info(f"Schatten-Datenbank uebernommen: {self.db_path} (Generation {live_generation + 1})")
+        self._notify_reload_listeners()
+
+# Instanz der Datenbank erstellen
+anime_cache_db = AnimeCacheDB()
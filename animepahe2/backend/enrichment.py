@@ -0,0 +1,307 @@
+# backend/enrichment.py
+"""
+Ergaenzt fehlende Facetten (Typ, Studio, Jahr, Genre) im Katalog aus AniList.
+- Viele Titel pro Anfrage: eine GraphQL-Query mit einem Alias (q0, q1, ...) pro Titel.
+- Lokaler Cache (enrichment.db): Metadaten pro AniList-ID mit langer TTL, dazu die Zuordnung
+  Session -> AniList-ID (auch "kein Treffer"). Nach einem Neuaufbau des Katalogs werden die
+  Facetten daraus ohne erneute API-Aufrufe wieder aufgefuellt.
+- AniList-Limits: eigener Rate-Limiter, Retry-After bei 429, Circuit Breaker pro Host.
+Die API-URL kommt aus CONFIG["ANILIST_API_URL"] und laesst sich fuer Tests auf einen lokalen
+Mock-Server umstellen.
+"""
+import json
+import logging
+import sqlite3
+import time
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from .circuit_breaker import upstream_breakers
+from .config import CONFIG
+from .crawler import anilist_rate_limiter
+from .database import anime_cache_db
+from .fuzzy_search import normalize_title
+
+logger = logging.getLogger(__name__)
+
+SOURCE_ANILIST = "anilist"
+
+_MEDIA_FIELDS = """
+    id idMal format season seasonYear genres synonyms
+    title { romaji english native }
+    studios(isMain: true) { nodes { name } }
+"""
+
+# AniList-Format -> Typ-Schreibweise von AnimePahe
+_FORMAT_TO_TYPE = {
+    "TV": "TV", "TV_SHORT": "TV", "MOVIE": "Movie", "SPECIAL": "Special",
+    "OVA": "OVA", "ONA": "ONA", "MUSIC": "Music",
+}
+
+
+class AniListError(requests.RequestException):
+    """AniList hat die Anfrage abgelehnt oder keine verwertbare Antwort geliefert."""
+
+
+class AniListClient:
+    def __init__(self, api_url: str = CONFIG.get("ANILIST_API_URL", "https://graphql.anilist.co"),
+                 limiter=anilist_rate_limiter, http: Optional[requests.Session] = None, timeout: float = 15):
+        self.api_url = api_url
+        self.limiter = limiter
+        self.http = http or requests.Session()
+        self.timeout = timeout
+        self.requests_sent = 0
+
+    @staticmethod
+    def build_query(count: int) -> str:
+        """GraphQL-Query mit `count` aliasierten Media-Suchen ($t0 .. $tN)."""
+        variables = ", ".join(f"$t{i}: String" for i in range(count))
+        selections = "\n".join(f"  q{i}: Media(search: $t{i}, type: ANIME) {{ ...media }}" for i in range(count))
+        return f"query ({variables}) {{\n{selections}\n}}\nfragment media on Media {{{_MEDIA_FIELDS}}}"
+
+    def search_batch(self, titles: List[str]) -> List[Optional[Dict]]:
+        """
+        Sucht alle Titel mit einer Anfrage.
+        Returns:
+            List[Optional[Dict]]: Media-Objekt pro Titel (gleiche Reihenfolge), None ohne Treffer.
+        Raises:
+            AniListError / requests.RequestException: Bei 429 nach Retry, 5xx oder Netzwerkfehlern.
+        """
+        if not titles:
+            return []
+        payload = {
+            "query": self.build_query(len(titles)),
+            "variables": {f"t{i}": title for i, title in enumerate(titles)}
+        }
+        data = self._post(payload)
+        return [data.get(f"q{i}") for i in range(len(titles))]
+
+    def _post(self, payload: Dict, attempts: int = 2) -> Dict:
+        breaker = upstream_breakers.for_host(urlparse(self.api_url).netloc)
+        for attempt in range(attempts):
+            breaker.before_call()
+            if self.limiter:
+                self.limiter.wait()
+            try:
+                response = self.http.post(self.api_url, json=payload, timeout=self.timeout,
+                                          headers={"Accept": "application/json"})
+            except requests.RequestException as e:
+                breaker.record_failure(type(e).__name__)
+                raise
+            self.requests_sent += 1
+            if response.status_code == 429:
+                breaker.record_failure("Status 429")
+                retry_after = float(response.headers.get("Retry-After") or 60)
+                logger.warning("AniList-Rate-Limit erreicht, warte %.0fs", retry_after)
+                if attempt + 1 < attempts:
+                    time.sleep(retry_after)
+                    continue
+                raise AniListError("AniList-Rate-Limit erreicht", response=response)
+            if response.status_code >= 500:
+                breaker.record_failure(f"Status {response.status_code}")
+                raise AniListError(f"AniList antwortet mit {response.status_code}", response=response)
+            breaker.record_success()
+            # Einzelne Suchen ohne Treffer liefern einen 404 mit Teilergebnis in "data"
+            try:
+                body = response.json()
+            except ValueError:
+                raise AniListError(f"Keine JSON-Antwort von AniList ({response.status_code})", response=response)
+            if not isinstance(body.get("data"), dict):
+                raise AniListError(f"AniList-Fehler: {body.get('errors')}", response=response)
+            return body["data"]
+        raise AniListError("AniList-Anfrage fehlgeschlagen")
+
+
+class EnrichmentStore:
+    def __init__(self, db_path: str = CONFIG.get("ENRICHMENT_DB_PATH", "enrichment.db")):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS external_metadata (
+                    source TEXT NOT NULL,
+                    external_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (source, external_id)
+                )
+            """)
+            # external_id NULL: gesucht, aber kein passender Treffer
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS external_matches (
+                    session TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    external_id TEXT,
+                    matched_at REAL NOT NULL,
+                    PRIMARY KEY (session, source)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_matches(self, sessions: List[str], source: str, max_age_sec: float,
+                    miss_max_age_sec: float) -> Dict[str, Optional[Dict]]:
+        """
+        Gueltige Zuordnungen fuer `sessions`: session -> Metadaten (None = bekannt ohne Treffer).
+        Sessions ohne gueltige Zuordnung fehlen im Ergebnis.
+        """
+        now = time.time()
+        result = {}
+        with self._connect() as conn:
+            for i in range(0, len(sessions), 900):
+                chunk = sessions[i:i + 900]
+                rows = conn.execute(f"""
+                    SELECT m.session, m.external_id, m.matched_at, d.data, d.fetched_at
+                    FROM external_matches m
+                    LEFT JOIN external_metadata d ON d.source = m.source AND d.external_id = m.external_id
+                    WHERE m.source = ? AND m.session IN ({",".join("?" * len(chunk))})
+                """, [source] + chunk).fetchall()
+                for session, external_id, matched_at, data, fetched_at in rows:
+                    if external_id is None:
+                        if now - matched_at < miss_max_age_sec:
+                            result[session] = None
+                    elif data is not None and now - fetched_at < max_age_sec:
+                        result[session] = json.loads(data)
+        return result
+
+    def store(self, source: str, matches: List[Tuple[str, Optional[Dict]]]):
+        """Speichert (session, Media-Objekt oder None) inkl. der Metadaten pro externer ID."""
+        now = time.time()
+        with self._connect() as conn:
+            for session, media in matches:
+                external_id = str(media["id"]) if media else None
+                if media:
+                    conn.execute("INSERT OR REPLACE INTO external_metadata (source, external_id, data, fetched_at) "
+                                 "VALUES (?, ?, ?, ?)", (source, external_id, json.dumps(media, ensure_ascii=False), now))
+                conn.execute("INSERT OR REPLACE INTO external_matches (session, source, external_id, matched_at) "
+                             "VALUES (?, ?, ?, ?)", (session, source, external_id, now))
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            metadata = conn.execute("SELECT COUNT(*) FROM external_metadata").fetchone()[0]
+            matched, misses = conn.execute(
+                "SELECT COALESCE(SUM(external_id IS NOT NULL), 0), COALESCE(SUM(external_id IS NULL), 0) FROM external_matches"
+            ).fetchone()
+        return {"metadata": metadata, "matched": matched, "no_match": misses}
+
+
+def _title_similarity(title: str, media: Dict) -> float:
+    """Beste Aehnlichkeit des Katalogtitels zu einem der AniList-Titel bzw. Synonyme (0..1)."""
+    wanted = normalize_title(title)
+    names = list((media.get("title") or {}).values()) + list(media.get("synonyms") or [])
+    best = 0.0
+    for name in names:
+        if name:
+            best = max(best, SequenceMatcher(None, wanted, normalize_title(name)).ratio())
+    return best
+
+
+def facets_from_media(media: Dict) -> Dict[str, Optional[str]]:
+    """Uebersetzt ein AniList-Media-Objekt in die Katalogfelder type/studio/year/genre."""
+    studios = [node.get("name") for node in ((media.get("studios") or {}).get("nodes") or []) if node.get("name")]
+    return {
+        "type": _FORMAT_TO_TYPE.get(media.get("format") or ""),
+        "studio": ", ".join(studios) or None,
+        "year": str(media["seasonYear"]) if media.get("seasonYear") else None,
+        "genre": ", ".join(media.get("genres") or []) or None,
+    }
+
+
+class MetadataEnricher:
+    def __init__(self, db=anime_cache_db, store: Optional[EnrichmentStore] = None,
+                 client: Optional[AniListClient] = None,
+                 batch_size: int = CONFIG.get("ENRICHMENT_BATCH_SIZE", 10),
+                 ttl_sec: float = CONFIG.get("ENRICHMENT_TTL_SEC", 30 * 24 * 3600),
+                 miss_ttl_sec: float = CONFIG.get("ENRICHMENT_MISS_TTL_SEC", 7 * 24 * 3600),
+                 min_similarity: float = CONFIG.get("ENRICHMENT_MIN_TITLE_SIMILARITY", 0.85)):
+        self.db = db
+        self._store = store
+        self._client = client
+        self.batch_size = batch_size
+        self.ttl_sec = ttl_sec
+        self.miss_ttl_sec = miss_ttl_sec
+        self.min_similarity = min_similarity
+
+    @property
+    def store(self) -> EnrichmentStore:
+        # Erst bei Bedarf anlegen, damit reine Importe keine Datei erzeugen
+        if self._store is None:
+            self._store = EnrichmentStore()
+        return self._store
+
+    @property
+    def client(self) -> AniListClient:
+        if self._client is None:
+            self._client = AniListClient()
+        return self._client
+
+    def enrich_missing(self, max_lookups: int = CONFIG.get("ENRICHMENT_LOOKUPS_PER_CYCLE", 50)) -> Dict[str, int]:
+        """
+        Fuellt fehlende Facetten aller betroffenen Anime: zuerst aus dem lokalen Cache, fuer
+        hoechstens `max_lookups` weitere Titel per gebuendelter AniList-Anfrage.
+        Returns:
+            Dict[str, int]: {"candidates", "from_cache", "looked_up", "enriched"}
+        """
+        counts = {"candidates": 0, "from_cache": 0, "looked_up": 0, "enriched": 0}
+        candidates = self.db.get_sessions_missing_facets()
+        counts["candidates"] = len(candidates)
+        if not candidates:
+            return counts
+        titles = dict(candidates)
+        known = self.store.get_matches(list(titles), SOURCE_ANILIST, self.ttl_sec, self.miss_ttl_sec)
+        counts["from_cache"] = sum(1 for media in known.values() if media)
+        resolved: Dict[str, Dict] = {session: media for session, media in known.items() if media}
+
+        to_lookup = [session for session in titles if session not in known][:max_lookups]
+        for i in range(0, len(to_lookup), self.batch_size):
+            batch = to_lookup[i:i + self.batch_size]
+            try:
+                results = self.client.search_batch([titles[s] for s in batch])
+            except requests.RequestException as e:
+                logger.warning("AniList-Anreicherung abgebrochen: %s", e)
+                break
+            matches = []
+            for session, media in zip(batch, results):
+                if media and _title_similarity(titles[session], media) < self.min_similarity:
+                    logger.debug("AniList-Treffer fuer '%s' verworfen: %s", titles[session], media.get("title"))
+                    media = None
+                matches.append((session, media))
+                if media:
+                    resolved[session] = media
+            self.store.store(SOURCE_ANILIST, matches)
+            counts["looked_up"] += len(batch)
+
+        counts["enriched"] = self._apply(resolved)
+        logger.info("Anreicherung: %d Kandidaten, %d aus dem Cache, %d nachgeschlagen, %d ergaenzt",
+                    counts["candidates"], counts["from_cache"], counts["looked_up"], counts["enriched"])
+        return counts
+
+    def _apply(self, resolved: Dict[str, Dict]) -> int:
+        """Setzt nur leere Felder; vorhandene (gescrapte) Werte haben Vorrang."""
+        if not resolved:
+            return 0
+        rows = self.db.get_details_by_sessions(list(resolved))
+        updated = []
+        for session, row in rows.items():
+            changed = False
+            for field, value in facets_from_media(resolved[session]).items():
+                if value and not (row.get(field) or "").strip():
+                    row[field] = value
+                    changed = True
+            if changed:
+                updated.append(row)
+        if updated:
+            self.db.set_details_bulk(updated)
+        return len(updated)
+
+    def stats(self) -> Dict:
+        return {**self.store.stats(), "requests_sent": self.client.requests_sent}
+
+
+# Globale Instanz
+metadata_enricher = MetadataEnricher()
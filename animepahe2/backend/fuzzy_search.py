@@ -0,0 +1,146 @@
+# backend/fuzzy_search.py
+"""
+Tippfehlertolerante Titelsuche ueber einen In-Memory-Trigramm-Index.
+Titel werden mit clean_title bereinigt und normalisiert (Akzente, Romanisierungs-
+Varianten wie 'ou'/'o', Satzzeichen), dann pro Wort in Trigramme zerlegt. Dadurch
+sind Tippfehler, Schreibvarianten und vertauschte Woerter unkritisch.
+"""
+import logging
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .utils import clean_title
+
+logger = logging.getLogger(__name__)
+
+# Haeufige Romanisierungs-Varianten (Hepburn vs. vereinfachte Schreibweise)
+_ROMANIZATION_VARIANTS = (
+    ("ou", "o"),
+    ("oo", "o"),
+    ("uu", "u"),
+    ("aa", "a"),
+    ("ii", "i"),
+    ("dzu", "zu"),
+    ("wo ", "o "),
+)
+
+
+def normalize_title(title: str) -> str:
+    """Normalisiert einen Titel fuer Index und Anfrage (klein, ohne Akzente/Satzzeichen, Varianten vereinheitlicht)."""
+    text = clean_title(title or "")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^a-z0-9]+", " ", text).strip()
+    text = f"{text} "
+    for variant, replacement in _ROMANIZATION_VARIANTS:
+        text = text.replace(variant, replacement)
+    return text.strip()
+
+
+def _trigrams(normalized: str) -> Set[str]:
+    """Trigramme pro Wort (mit Randmarkierung), damit die Wortreihenfolge keine Rolle spielt."""
+    grams = set()
+    for word in normalized.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self, min_score: float = 0.35):
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Set[str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def _remove_locked(self, session: str):
+        for gram in self._grams.pop(session, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(session)
+                if not posting:
+                    del self._postings[gram]
+
+    def upsert(self, session: str, title: str):
+        """Fuegt einen Titel hinzu bzw. ersetzt ihn."""
+        grams = _trigrams(normalize_title(title))
+        with self._lock:
+            self._remove_locked(session)
+            if not grams:
+                return
+            self._grams[session] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(session)
+
+    def build(self, items: Iterable[Tuple[str, str]]):
+        """Baut den Index komplett neu auf (items: (session, title))."""
+        postings: Dict[str, Set[str]] = {}
+        grams_by_session: Dict[str, Set[str]] = {}
+        for session, title in items:
+            grams = _trigrams(normalize_title(title))
+            if not session or not grams:
+                continue
+            grams_by_session[session] = grams
+            for gram in grams:
+                postings.setdefault(gram, set()).add(session)
+        with self._lock:
+            self._postings = postings
+            self._grams = grams_by_session
+            self.ready = True
+        logger.info(f"Trigramm-Index aufgebaut: {len(grams_by_session)} Titel, {len(postings)} Trigramme")
+
+    def load_from_db(self, db):
+        """Baut den Index aus der SQLite-Datenbank auf (db: AnimeCacheDB)."""
+        try:
+            self.build(db.get_titles())
+        except Exception as e:
+            logger.error(f"Trigramm-Index konnte nicht aufgebaut werden: {e}", exc_info=True)
+
+    def on_rows_written(self, rows: List[Dict]):
+        """Write-Listener fuer AnimeCacheDB.set_details_bulk: aktualisiert geaenderte Titel inkrementell."""
+        for row in rows:
+            if row.get("session"):
+                self.upsert(row["session"], row.get("title") or "")
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Liefert die besten Treffer als (session, score), absteigend sortiert.
+        Der Score kombiniert die Abdeckung der Anfrage-Trigramme mit dem Dice-Koeffizienten,
+        damit kurze Anfragen ('shingeki') lange Titel trotzdem finden.
+        """
+        query_grams = _trigrams(normalize_title(query))
+        if not query_grams:
+            return []
+        n_query = len(query_grams)
+        with self._lock:
+            # Prefix-Filter: Ein Treffer braucht mind. `required` gemeinsame Trigramme, muss also in einem
+            # der (n - required + 1) seltensten vorkommen. Die haeufigsten Trigramme werden nicht durchlaufen.
+            required = max(1, math.ceil(self.min_score * n_query))
+            by_rarity = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+            candidates: Set[str] = set()
+            for gram in by_rarity[:n_query - required + 1]:
+                candidates.update(self._postings.get(gram, ()))
+            scored = []
+            for session in candidates:
+                doc_grams = self._grams[session]
+                shared = len(query_grams & doc_grams)
+                coverage = shared / n_query
+                if coverage < self.min_score:
+                    continue
+                dice = 2 * shared / (n_query + len(doc_grams))
+                score = 0.7 * coverage + 0.3 * dice
+                if score >= self.min_score:
+                    scored.append((session, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+
+# Globale Instanz
+title_index = TrigramIndex()
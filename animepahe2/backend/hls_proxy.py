@@ -0,0 +1,451 @@
+# backend/hls_proxy.py
+"""
+Lokaler HLS-Proxy: /api/hls/{anime}/{episode} liefert die Playlist mit auf den Proxy umgeschriebenen
+URIs aus; Segmente (und AES-Keys) werden ueber einen gepoolten HTTP-Client geholt, in einem
+groessenbegrenzten Platten-Cache abgelegt und die naechsten N Segmente vorab geladen.
+Die Ressourcen-IDs in den umgeschriebenen URIs werden aus dem Pfad der Upstream-URL abgeleitet und
+sind damit in jedem Worker gleich: Landet eine Segment-Anfrage bei einem Worker, der die Playlist
+nicht ausgeliefert hat, loest er die Episode selbst auf und baut die Zuordnung nach.
+Laufen die Tokens der CDN-URLs ab (403/410), wird die Episode neu aufgeloest und die URLs des
+Streams werden ersetzt; die IDs, die der Player kennt, bleiben dabei gueltig.
+Der Resolver (Episode -> m3u8-URL) ist austauschbar, damit der Proxy gegen einen lokalen
+Stub-Origin getestet werden kann.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from .config import CONFIG
+from .prefetch import stream_prefetcher
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+_CONTENT_TYPES = {"segment": "video/mp2t", "key": "application/octet-stream", "playlist": PLAYLIST_CONTENT_TYPE}
+_URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+
+# Abgelaufene Tokens: neu aufloesen statt wiederholen
+_EXPIRED_STATUS = (403, 410)
+
+
+def _is_expired(error: BaseException) -> bool:
+    return (isinstance(error, requests.HTTPError) and error.response is not None
+            and error.response.status_code in _EXPIRED_STATUS)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Nur CDN-Aussetzer (Netzwerk, Timeouts, 429, 5xx); andere 4xx liefern beim naechsten Versuch dasselbe."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return not 400 <= status < 500 or status == 429
+    return isinstance(error, requests.RequestException)
+
+
+cdn_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=4),
+    retry=retry_if_exception(_is_retryable),
+    reraise=True
+)
+
+
+class SegmentCache:
+    """Platten-Cache fuer Segmente mit Groessenlimit; verdraengt die am laengsten nicht genutzten Dateien."""
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        with os.scandir(cache_dir) as entries:
+            self.total_bytes = sum(e.stat().st_size for e in entries if e.is_file())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mtime dient als LRU-Zeitstempel
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp_path = None
+        try:
+            # Eigene temporaere Datei: mehrere Worker koennen dasselbe Segment gleichzeitig ablegen
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"HLS-Cache: Segment konnte nicht gespeichert werden: {e}")
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self):
+        """Loescht die aeltesten Dateien, bis der Cache wieder unter 90 % des Limits liegt."""
+        target = self.max_bytes * 0.9
+        with os.scandir(self.cache_dir) as entries:
+            files = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries
+                           if e.is_file() and not e.name.endswith(".tmp"))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+
+def _resource_id(url: str) -> int:
+    """ID einer Ressource aus ihrem Pfad: unabhaengig von Tokens, Worker und Ladereihenfolge."""
+    return int(hashlib.sha1(urlparse(url).path.encode("utf-8")).hexdigest()[:12], 16)
+
+
+class _Stream:
+    """Aufgeloeste Episode: Playlist-URL und alle bisher umgeschriebenen Ressourcen (ID -> URL, Art)."""
+    def __init__(self, playlist_url: str):
+        self.playlist_url = playlist_url
+        self.created_at = time.time()
+        self.resources: Dict[int, Tuple[str, str]] = {}
+        # Reihenfolge, in der Ressourcen in den Playlists auftauchen (fuer das Read-Ahead)
+        self.order: List[int] = []
+        self.position: Dict[int, int] = {}
+        self.loaded_playlists: set = set()
+        self.lock = threading.Lock()
+
+    def add(self, url: str, kind: str) -> int:
+        resource_id = _resource_id(url)
+        with self.lock:
+            if resource_id not in self.resources:
+                self.position[resource_id] = len(self.order)
+                self.order.append(resource_id)
+            # Nach einem erneuten Resolve ersetzt die URL mit den neuen Tokens die alte
+            self.resources[resource_id] = (url, kind)
+            return resource_id
+
+    def following(self, resource_id: int) -> List[Tuple[str, str]]:
+        """Ressourcen, die in der Playlist nach resource_id kommen."""
+        with self.lock:
+            start = self.position.get(resource_id, len(self.order)) + 1
+            return [self.resources[rid] for rid in self.order[start:]]
+
+
+class HlsProxy:
+    def __init__(self, resolver: Callable[[str, str], str],
+                 cache_dir: str = CONFIG.get("HLS_CACHE_DIR", "hls_cache"),
+                 max_cache_bytes: int = CONFIG.get("HLS_CACHE_MAX_BYTES", 2 * 1024 ** 3),
+                 read_ahead: int = CONFIG.get("HLS_READ_AHEAD_SEGMENTS", 3),
+                 workers: int = CONFIG.get("HLS_FETCH_WORKERS", 4),
+                 referer: Optional[str] = CONFIG.get("HLS_UPSTREAM_REFERER"),
+                 stream_ttl_sec: int = CONFIG.get("STREAM_URL_TTL_SEC", 1800),
+                 max_streams: int = CONFIG.get("HLS_MAX_STREAMS", 32),
+                 invalidate: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            resolver: (anime_session, episode_session) -> m3u8-URL, z. B. crawler.get_stream_url.
+            invalidate: Verwirft eine zwischengespeicherte m3u8-URL des Resolvers (bei 403/410).
+        """
+        self.resolver = resolver
+        self.invalidate = invalidate
+        self.read_ahead = read_ahead
+        self.stream_ttl_sec = stream_ttl_sec
+        self.max_streams = max_streams
+        self.cache = SegmentCache(cache_dir, max_cache_bytes)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = CONFIG.get("DEFAULT_USER_AGENT", "Mozilla/5.0")
+        if referer:
+            self.session.headers["Referer"] = referer
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hls-fetch")
+        self._lock = threading.Lock()
+        # Zuletzt genutzte Streams hinten; die aeltesten werden samt Resolve-Lock verdraengt
+        self._streams: "OrderedDict[Tuple[str, str], _Stream]" = OrderedDict()
+        self._resolve_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self.read_ahead_fetches = 0
+        self.reresolves = 0
+
+    # ---------- Streams ----------
+    def register(self, anime_session: str, episode_session: str, playlist_url: str):
+        """Uebernimmt eine bereits aufgeloeste m3u8-URL (spart den erneuten Resolve beim Abspielen)."""
+        with self._lock:
+            current = self._streams.get((anime_session, episode_session))
+            if current is None or current.playlist_url != playlist_url:
+                self._store_stream_locked((anime_session, episode_session), _Stream(playlist_url))
+
+    def _store_stream_locked(self, stream_key: Tuple[str, str], stream: _Stream):
+        self._streams[stream_key] = stream
+        self._streams.move_to_end(stream_key)
+        while len(self._streams) > self.max_streams:
+            evicted, _ = self._streams.popitem(last=False)
+            self._resolve_locks.pop(evicted, None)
+
+    def _stream(self, anime_session: str, episode_session: str, resolve: bool = True) -> Optional[_Stream]:
+        stream_key = (anime_session, episode_session)
+        with self._lock:
+            stream = self._streams.get(stream_key)
+            if stream:
+                self._streams.move_to_end(stream_key)
+            # Ressourcen einer laufenden Wiedergabe bleiben auch nach Ablauf der TTL gueltig
+            if not resolve:
+                return stream
+            if stream and time.time() - stream.created_at < self.stream_ttl_sec:
+                return stream
+            resolve_lock = self._resolve_locks.setdefault(stream_key, threading.Lock())
+        with resolve_lock:
+            with self._lock:
+                stream = self._streams.get(stream_key)
+                if stream and time.time() - stream.created_at < self.stream_ttl_sec:
+                    return stream
+            try:
+                playlist_url = self.resolver(anime_session, episode_session)
+            except BaseException:
+                with self._lock:
+                    if stream_key not in self._streams:
+                        self._resolve_locks.pop(stream_key, None)
+                raise
+            stream = _Stream(playlist_url)
+            with self._lock:
+                self._store_stream_locked(stream_key, stream)
+            return stream
+
+    def _reresolve(self, anime_session: str, episode_session: str, stream: _Stream, stale_url: str):
+        """
+        Die Tokens sind abgelaufen (403/410): Episode neu aufloesen und die URLs des Streams an Ort und
+        Stelle ersetzen. Master- und bereits geladene Unter-Playlists werden neu gelesen; ueber den Pfad
+        behalten alle Ressourcen ihren Index, laufende Wiedergaben koennen also einfach weiterladen.
+        """
+        stream_key = (anime_session, episode_session)
+        with self._lock:
+            resolve_lock = self._resolve_locks.setdefault(stream_key, threading.Lock())
+        with resolve_lock:
+            if stream.playlist_url != stale_url:
+                return  # ein anderer Thread hat bereits neu aufgeloest
+            logger.info(f"HLS-Tokens fuer {anime_session}/{episode_session} abgelaufen, loese neu auf")
+            if self.invalidate:
+                self.invalidate(anime_session, episode_session)
+            playlist_url = self.resolver(anime_session, episode_session)
+            base_path = self._base_path(anime_session, episode_session)
+            self._rewrite(stream, playlist_url, self._download(playlist_url).decode("utf-8", errors="replace"), base_path)
+            for resource_id in list(stream.loaded_playlists):
+                url, _ = stream.resources[resource_id]
+                self._rewrite(stream, url, self._download(url).decode("utf-8", errors="replace"), base_path)
+            stream.playlist_url = playlist_url
+            stream.created_at = time.time()
+            self.reresolves += 1
+
+    # ---------- Playlists ----------
+    def get_playlist(self, anime_session: str, episode_session: str) -> str:
+        """Liefert die (Master- oder Media-)Playlist der Episode mit URIs auf den Proxy."""
+        stream = self._stream(anime_session, episode_session)
+        playlist_url = stream.playlist_url
+        try:
+            data = self._download(playlist_url)
+        except requests.HTTPError as e:
+            if not _is_expired(e):
+                raise
+            self._reresolve(anime_session, episode_session, stream, playlist_url)
+            playlist_url = stream.playlist_url
+            data = self._download(playlist_url)
+        return self._rewrite(stream, playlist_url, data.decode("utf-8", errors="replace"),
+                             self._base_path(anime_session, episode_session))
+
+    def _base_path(self, anime_session: str, episode_session: str) -> str:
+        return f"/api/hls/{anime_session}/{episode_session}"
+
+    def _rewrite(self, stream: _Stream, playlist_url: str, text: str, base_path: str) -> str:
+        """Ersetzt alle Segment-, Playlist- und Key-URIs durch {base_path}/{ID}."""
+        lines = []
+        next_is_playlist = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                if stripped.startswith("#EXT-X-STREAM-INF"):
+                    next_is_playlist = True
+                kind = "key" if stripped.startswith(("#EXT-X-KEY", "#EXT-X-SESSION-KEY")) else "playlist"
+                if stripped.startswith(("#EXT-X-MAP", "#EXT-X-PART")):
+                    kind = "segment"
+                line = _URI_ATTRIBUTE.sub(
+                    lambda m: f'URI="{base_path}/{stream.add(urljoin(playlist_url, m.group(1)), kind)}"', line)
+            elif stripped:
+                absolute = urljoin(playlist_url, stripped)
+                is_playlist = next_is_playlist or urlparse(absolute).path.endswith(".m3u8")
+                line = f"{base_path}/{stream.add(absolute, 'playlist' if is_playlist else 'segment')}"
+                next_is_playlist = False
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    # ---------- Ressourcen ----------
+    def get_resource(self, anime_session: str, episode_session: str, index: int) -> Tuple[bytes, str]:
+        """
+        Liefert Segment, Key oder Unter-Playlist mit der ID `index` als (Bytes, Content-Type).
+        Kennt dieser Worker die ID nicht (Playlist von einem anderen Worker ausgeliefert), wird
+        die Zuordnung aus den Upstream-Playlists nachgebaut.
+        Raises:
+            KeyError: Wenn die ID in keiner Playlist der Episode vorkommt.
+        """
+        stream = self._stream(anime_session, episode_session, resolve=False)
+        if stream is None or index not in stream.resources:
+            stream = self._rebuild(anime_session, episode_session, index)
+        stale_url = stream.playlist_url
+        try:
+            return self._fetch_resource(stream, index, anime_session, episode_session)
+        except requests.HTTPError as e:
+            if not _is_expired(e):
+                raise
+            self._reresolve(anime_session, episode_session, stream, stale_url)
+            return self._fetch_resource(stream, index, anime_session, episode_session)
+
+    def _rebuild(self, anime_session: str, episode_session: str, resource_id: int) -> _Stream:
+        """
+        Sucht eine unbekannte Ressourcen-ID: Master-Playlist laden, dann die noch nicht geladenen
+        Unter-Playlists, bis die ID auftaucht. Die IDs sind pfadbasiert und damit reproduzierbar.
+        """
+        stream = self._stream(anime_session, episode_session)
+        with self._lock:
+            resolve_lock = self._resolve_locks.setdefault((anime_session, episode_session), threading.Lock())
+        with resolve_lock:
+            base_path = self._base_path(anime_session, episode_session)
+            if resource_id not in stream.resources:
+                logger.info(f"HLS-Ressource {resource_id} fuer {anime_session}/{episode_session} unbekannt, "
+                            f"baue Zuordnung aus den Playlists nach")
+                self._rewrite(stream, stream.playlist_url,
+                              self._download(stream.playlist_url).decode("utf-8", errors="replace"), base_path)
+            while resource_id not in stream.resources:
+                pending = [rid for rid in list(stream.order)
+                           if stream.resources[rid][1] == "playlist" and rid not in stream.loaded_playlists]
+                if not pending:
+                    raise KeyError(f"Unbekannte HLS-Ressource {resource_id} fuer {anime_session}/{episode_session}")
+                url, _ = stream.resources[pending[0]]
+                self._rewrite(stream, url, self._download(url).decode("utf-8", errors="replace"), base_path)
+                stream.loaded_playlists.add(pending[0])
+        return stream
+
+    def _fetch_resource(self, stream: _Stream, index: int, anime_session: str, episode_session: str) -> Tuple[bytes, str]:
+        url, kind = stream.resources[index]
+        if kind == "playlist":
+            text = self._download(url).decode("utf-8", errors="replace")
+            rewritten = self._rewrite(stream, url, text, self._base_path(anime_session, episode_session))
+            stream.loaded_playlists.add(index)
+            return rewritten.encode("utf-8"), PLAYLIST_CONTENT_TYPE
+        data = self._load(url)
+        if kind == "segment":
+            self._schedule_read_ahead(stream, index)
+        return data, _CONTENT_TYPES[kind]
+
+    def _cache_key(self, url: str) -> str:
+        # Nur der Pfad: Tokens/Query und CDN-Host wechseln zwischen zwei Resolves derselben Episode
+        return hashlib.sha1(urlparse(url).path.encode("utf-8")).hexdigest()
+
+    def _load(self, url: str) -> bytes:
+        """Aus dem Cache oder per Download; gleichzeitige Anfragen fuer dieselbe URL teilen sich einen Download."""
+        key = self._cache_key(url)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not owner:
+            return future.result()
+        try:
+            data = self._download(url)
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    @cdn_retry
+    def _download(self, url: str) -> bytes:
+        response = self.session.get(url, timeout=20)
+        response.raise_for_status()
+        return response.content
+
+    def _schedule_read_ahead(self, stream: _Stream, index: int):
+        """Laedt die naechsten read_ahead Segmente im Hintergrund vor."""
+        scheduled = 0
+        for url, kind in stream.following(index):
+            if scheduled >= self.read_ahead:
+                break
+            if kind != "segment":
+                continue
+            scheduled += 1
+            key = self._cache_key(url)
+            with self._lock:
+                if key in self._in_flight:
+                    continue
+            if self.cache.contains(key):
+                continue
+            self.read_ahead_fetches += 1
+            self._executor.submit(self._read_ahead_one, url)
+
+    def _read_ahead_one(self, url: str):
+        try:
+            self._load(url)
+        except Exception as e:
+            logger.debug("HLS-Read-Ahead fehlgeschlagen fuer %s: %s", url, e)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "in_flight": len(self._in_flight),
+                "read_ahead_fetches": self.read_ahead_fetches,
+                "reresolves": self.reresolves,
+                "cache": self.cache.stats()
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Globale Instanz: loest Episoden ueber den Crawler auf (vorab aufgeloeste URLs werden wiederverwendet)
+hls_proxy = HlsProxy(resolver=stream_prefetcher.get_stream_url, invalidate=stream_prefetcher.invalidate)
@@ -0,0 +1,190 @@
+# backend/http_cache.py
+"""
+On-Disk-HTTP-Cache fuer Upstream-Seiten (Detailseiten, /anime-Index, m=release-JSON).
+Speichert Bodies zusammen mit ETag/Last-Modified, beantwortet frische Eintraege direkt
+von der Platte und revalidiert aeltere per If-None-Match/If-Modified-Since.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import re
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Header, die zusammen mit dem Body gespeichert werden
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class HttpCache:
+    def __init__(self, cache_dir: str = CONFIG.get("HTTP_CACHE_DIR", "http_cache"),
+                 freshness: Optional[Dict[str, int]] = None):
+        self.cache_dir = cache_dir
+        # Frische pro URL-Klasse in Sekunden; innerhalb dieser Zeit wird Upstream gar nicht gefragt
+        self.freshness = freshness if freshness is not None else CONFIG.get("HTTP_CACHE_FRESHNESS_SEC", {})
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def classify(self, url: str, params: Optional[dict] = None) -> Optional[str]:
+        """
+        Ordnet eine URL einer cachebaren Klasse zu ('detail', 'index', 'release').
+        Returns:
+            str | None: Die Klasse oder None, wenn die URL nicht gecacht werden soll.
+        """
+        path = urlparse(url).path.rstrip("/")
+        if params and params.get("m") == "release":
+            return "release"
+        if path == "/anime":
+            return "index"
+        if path.startswith("/anime/"):
+            return "detail"
+        return None
+
+    def _key(self, url: str, params: Optional[dict]) -> str:
+        full = url if not params else f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha1(full.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load(self, key: str) -> Optional[dict]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                meta["body"] = f.read()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _to_response(self, meta: dict, cache_status: str) -> requests.Response:
+        """Baut aus einem Cache-Eintrag ein requests.Response-Objekt fuer die Aufrufer."""
+        response = requests.Response()
+        response.status_code = 200
+        response._content = meta["body"]
+        response._content_consumed = True
+        response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+        response.url = meta.get("url", "")
+        response.encoding = meta.get("encoding")
+        response.cache_status = cache_status
+        response.cache_digest = meta.get("digest")
+        return response
+
+    def get_fresh(self, url: str, params: Optional[dict], url_class: str) -> Optional[requests.Response]:
+        """Liefert den Eintrag direkt von der Platte, solange er laut freshness noch frisch ist."""
+        max_age = self.freshness.get(url_class, 0)
+        if max_age <= 0:
+            return None
+        meta = self._load(self._key(url, params))
+        if not meta or time.time() - meta.get("validated_at", 0) > max_age:
+            return None
+        self.hits += 1
+        return self._to_response(meta, "fresh")
+
+    def conditional_headers(self, url: str, params: Optional[dict]) -> Dict[str, str]:
+        """If-None-Match/If-Modified-Since fuer einen vorhandenen Eintrag."""
+        meta_path, _ = self._paths(self._key(url, params))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f).get("headers", {})
+        except (OSError, ValueError):
+            return {}
+        headers = {}
+        if stored.get("ETag"):
+            headers["If-None-Match"] = stored["ETag"]
+        if stored.get("Last-Modified"):
+            headers["If-Modified-Since"] = stored["Last-Modified"]
+        return headers
+
+    def revalidate(self, url: str, params: Optional[dict]) -> Optional[requests.Response]:
+        """Behandelt ein 304: Eintrag als frisch markieren und den gespeicherten Body liefern."""
+        key = self._key(url, params)
+        meta = self._load(key)
+        if not meta:
+            return None
+        meta["validated_at"] = time.time()
+        self._write_meta(key, {k: v for k, v in meta.items() if k != "body"})
+        self.revalidated += 1
+        return self._to_response(meta, "revalidated")
+
+    def store(self, url: str, params: Optional[dict], response: requests.Response):
+        """Speichert eine 200-Antwort inkl. Validatoren; Schreibfehler werden nur geloggt."""
+        if response.status_code != 200:
+            return
+        self.misses += 1
+        key = self._key(url, params)
+        meta_path, body_path = self._paths(key)
+        body = response.content
+        meta = {
+            "url": response.url or url,
+            "encoding": response.encoding,
+            "headers": {h: response.headers[h] for h in _STORED_HEADERS if h in response.headers},
+            "digest": hashlib.sha1(body).hexdigest(),
+            "validated_at": time.time()
+        }
+        try:
+            tmp_body = f"{body_path}.tmp"
+            with open(tmp_body, "wb") as f:
+                f.write(body)
+            os.replace(tmp_body, body_path)
+            self._write_meta(key, meta)
+        except OSError as e:
+            logger.warning(f"HTTP-Cache: Konnte Eintrag fuer {url} nicht speichern: {e}")
+            return
+        response.cache_status = None
+        response.cache_digest = meta["digest"]
+
+    def _write_meta(self, key: str, meta: dict):
+        meta_path, _ = self._paths(key)
+        tmp_meta = f"{meta_path}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+    def iter_entries(self, url_class: str) -> Iterator[Tuple[str, dict, bytes]]:
+        """Liefert alle gespeicherten Eintraege einer URL-Klasse als (key, meta, body), z. B. fuer Snapshots."""
+        try:
+            names = sorted(name for name in os.listdir(self.cache_dir) if name.endswith(".json"))
+        except OSError as e:
+            logger.warning(f"HTTP-Cache {self.cache_dir} konnte nicht gelesen werden: {e}")
+            return
+        for name in names:
+            key = name[:-len(".json")]
+            meta = self._load(key)
+            if not meta:
+                continue
+            parsed = urlparse(meta.get("url", ""))
+            if self.classify(parsed._replace(query="").geturl(), dict(parse_qsl(parsed.query))) != url_class:
+                continue
+            body = meta.pop("body")
+            yield key, meta, body
+
+    def import_entry(self, key: str, meta: dict, body: bytes):
+        """Uebernimmt einen Eintrag (aus iter_entries) unveraendert, inkl. validated_at."""
+        if not re.fullmatch(r"[0-9a-f]{40}", key):
+            raise ValueError(f"Ungueltiger HTTP-Cache-Schluessel: {key!r}")
+        _, body_path = self._paths(key)
+        tmp_body = f"{body_path}.tmp"
+        with open(tmp_body, "wb") as f:
+            f.write(body)
+        os.replace(tmp_body, body_path)
+        self._write_meta(key, meta)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+
+# Globale Instanz
+http_cache = HttpCache()
@@ -0,0 +1,155 @@
+# backend/logging_setup.py
+"""
+Logging mit wenig Overhead in den Request-Threads: Die Handler haengen an einem QueueListener,
+Request-Threads legen nur den LogRecord in eine Queue. Formatierung (lazy %-Argumente) und
+Schreiben passieren im Listener-Thread. Sich wiederholende Meldungen werden pro Aufrufstelle
+gedrosselt, Debug-Artefakte (gerenderte Seiten o. Ae.) nur mit CONFIG["DEBUG_DUMPS"] geschrieben.
+"""
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .config import CONFIG
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+# Argumente dieser Typen koennen sich aendern, bevor der Listener-Thread formatiert
+_MUTABLE_ARGS = (dict, list, set, bytearray)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, der die Nachricht nicht im aufrufenden Thread formatiert.
+    Die Standard-Implementierung von prepare() ruft format() auf und wuerde damit genau die
+    Arbeit im Request-Thread erledigen, die wir auslagern wollen. Ausnahme: Veraenderliche
+    Argumente (dict, list, ...) werden sofort eingesetzt, sonst zeigte die Meldung den Stand
+    zum Zeitpunkt der Formatierung statt zum Zeitpunkt des Aufrufs.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        args = record.args
+        if args and (isinstance(args, _MUTABLE_ARGS) or any(isinstance(arg, _MUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Laesst pro Aufrufstelle (Logger, Datei, Zeile) hoechstens `burst` Meldungen je `window_sec`
+    durch. Warnungen ab `min_level_exempt` (Standard: ERROR) werden nie verworfen. Sobald das
+    Fenster einer gedrosselten Stelle ablaeuft, wird die Anzahl unterdrueckter Meldungen an die
+    naechste durchgelassene Meldung angehaengt.
+    """
+
+    def __init__(self, burst: int = 20, window_sec: float = 60, min_level_exempt: int = logging.ERROR):
+        super().__init__()
+        self.burst = burst
+        self.window_sec = window_sec
+        self.min_level_exempt = min_level_exempt
+        self._lock = threading.Lock()
+        # Schluessel -> [Fensterbeginn, Anzahl im Fenster, unterdrueckt]
+        self._sites: Dict[Tuple[str, str, int], list] = {}
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.min_level_exempt or self.burst <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window_sec:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if len(self._sites) > 5000:
+                    self._prune(now)
+            elif site[1] < self.burst:
+                site[1] += 1
+                return True
+            else:
+                site[2] += 1
+                self.suppressed_total += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} gleichartige Meldungen unterdrueckt]"
+        return True
+
+    def _prune(self, now: float):
+        self._sites = {k: v for k, v in self._sites.items() if now - v[0] < self.window_sec}
+
+
+sampling_filter = SamplingFilter(burst=CONFIG.get("LOG_SAMPLE_BURST", 20),
+                                 window_sec=CONFIG.get("LOG_SAMPLE_WINDOW_SEC", 60))
+
+
+def setup_logging(level: str = CONFIG["LOGGING_LEVEL"], log_file: Optional[str] = CONFIG.get("LOG_FILE")):
+    """
+    Richtet den Root-Logger mit Queue-Handler ein und startet den Listener-Thread.
+    Mehrfacher Aufruf ist unschaedlich (z. B. bei Reload im Entwicklungsserver).
+    """
+    global _listener
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024,
+                                                             backupCount=3, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Leert die Queue und beendet den Listener-Thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debug_dumps_enabled() -> bool:
+    return bool(CONFIG.get("DEBUG_DUMPS", False))
+
+
+def write_debug_artifact(filename: str, content: str) -> Optional[str]:
+    """
+    Schreibt ein Debug-Artefakt nach CONFIG["DEBUG_DUMP_DIR"], aber nur wenn CONFIG["DEBUG_DUMPS"]
+    gesetzt ist. Returns: Pfad der Datei oder None.
+    """
+    if not debug_dumps_enabled():
+        return None
+    dump_dir = CONFIG.get("DEBUG_DUMP_DIR", "debug_dumps")
+    path = os.path.join(dump_dir, filename)
+    try:
+        os.makedirs(dump_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    except OSError as e:
+        logging.getLogger(__name__).debug("Debug-Artefakt %s konnte nicht geschrieben werden: %s", path, e)
+        return None
+    return path
+
+
+def stats() -> Dict:
+    return {"suppressed": sampling_filter.suppressed_total, "queued": _listener.queue.qsize() if _listener else 0}
@@ -1,251 +1,648 @@
-# backend/main.py
-import logging
-from fastapi import FastAPI, HTTPException, Query, WebSocket
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from typing import List, Optional
-from .cache_builder import cache_builder
-import os
-import subprocess
-from .config import CONFIG
-from .crawler import crawler
-from .database import anime_cache_db
-from .api_models import SearchQuery, AnimeListItem, AnimeDetails, Episode, FilterOptions, StreamUrlsRequest, StreamUrlResponse
-
-logging.basicConfig(level=getattr(logging, CONFIG["LOGGING_LEVEL"]))
-logger = logging.getLogger(__name__)
-
-app = FastAPI(title="AnimePahe Streamer API - Schritt 4e")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# WebSocket clients for cache builder status
-connected_clients = set()
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Backend-Server startet...")
-    try:
-        crawler.get_site_cookies()
-        logger.info("Crawler initialisiert.")
-    except Exception as e:
-        logger.error(f"Fehler bei der Initialisierung des Crawlers: {e}", exc_info=True)
-    cache_builder.start()
-    logger.info("CacheBuilder gestartet.")
-    logger.info("Backend-Server bereit.")
-
-@app.get("/api/filters", response_model=FilterOptions)
-async def get_filters():
-    logger.info("Abrufen der Filteroptionen.")
-    try:
-        filters = anime_cache_db.get_unique_filters()
-        logger.debug("Filteroptionen erfolgreich abgerufen.")
-        return FilterOptions(**filters)
-    except Exception as e:
-        logger.error(f"Fehler beim Abrufen der Filter: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/search", response_model=List[AnimeListItem])
-async def search_anime(
-    q: str = Query(default="", description="Suchbegriff"),
-    type: str = Query(default="All", description="Filter nach Typ"),
-    genre: str = Query(default="All", description="Filter nach Genre"),
-    studio: str = Query(default="All", description="Filter nach Studio"),
-    year: str = Query(default="All", description="Filter nach Jahr")
-):
-    logger.info(f"Suche angefordert: q='{q}', type='{type}', genre='{genre}', studio='{studio}', year='{year}'")
-    try:
-        # 1) Zuerst: lokale DB abfragen (Cache-first)
-        logger.debug("Starte lokale Cache-Suche...")
-        db_results = anime_cache_db.search_cached_anime(q, type, genre, studio, year)
-        logger.debug(f"Cache-Suche ergab {len(db_results)} Ergebnisse")
-
-        # Wenn DB Treffer vorhanden, liefere diese sofort (Cache-first Verhalten)
-        if db_results:
-            logger.info(f"Returniere {len(db_results)} Ergebnisse aus lokalem Cache für q='{q}'")
-            return db_results
-
-        # 2) Wenn keine DB-Treffer und ein Query vorhanden ist, versuche Remote-Crawler
-        api_results = []
-        if q:
-            logger.debug("Keine lokalen Treffer — versuche Crawler-Remote-Suche...")
-            try:
-                api_results = crawler.search_anime(q) or []
-                logger.debug(f"Crawler lieferte {len(api_results)} Ergebnisse")
-            except Exception as e:
-                # Crawler-Fehler dürfen nicht zu 500 im Frontend führen — loggen und fallbacken
-                logger.error(f"Crawler-Fehler bei Suche '{q}': {e}", exc_info=True)
-                api_results = []
-
-        # 3) Falls Remote Ergebnisse da sind, persistiere minimal in Cache und liefere DB-Ergebnisse zurück
-        if api_results:
-            # Normalisiere remote Ergebnisse in das minimale DB-Format
-            normalized = []
-            for r in api_results:
-                session = r.get("session") or r.get("id") or r.get("identifier") or r.get("slug")
-                title = r.get("title") or r.get("name") or "Unknown"
-                normalized.append({
-                    "session": session,
-                    "title": title,
-                    "thumbnail": r.get("thumbnail") or r.get("image"),
-                    "type": r.get("type"),
-                    "genre": r.get("genre") if isinstance(r.get("genre"), str) else (", ".join(r.get("genre")) if isinstance(r.get("genre"), (list, tuple)) else r.get("genre")),
-                    "studio": r.get("studio"),
-                    "year": r.get("year"),
-                    "synopsis": r.get("synopsis") or r.get("info"),
-                    "identifier": session,
-                    "source": "pahe"
-                })
-            try:
-                anime_cache_db.set_details_bulk(normalized)
-            except Exception as e:
-                logger.exception("Fehler beim Speichern der remote Ergebnisse in der DB (upsert), fahre trotzdem fort.")
-
-            # Frage erneut aus DB (damit Format & thumbnails konsistent sind)
-            try:
-                db_results = anime_cache_db.search_cached_anime(q, type, genre, studio, year)
-                logger.debug(f"Nach Persistierung: Cache-Suche ergab {len(db_results)} Ergebnisse")
-                return db_results
-            except Exception as e:
-                logger.exception("Fehler beim erneuten Lesen der DB nach Persistierung, gebe remote results direkt zurück")
-                # Fallback: entferne evtl. None/invalid Einträge und return
-                return [ { "session": r.get("session"), "title": r.get("title") } for r in api_results ]
-
-        # 4) Kein DB- und kein Remote-Result => leere Liste
-        logger.info("Keine Ergebnisse gefunden (lokal und remote).")
-        return []
-
-    except Exception as e:
-        # Sicherheitsnetz: sollte selten eintreten
-        logger.error(f"Fehler bei der Suche: {e}", exc_info=True)
-        # Liefere sauber 502 statt 500 mit Nachricht
-        raise HTTPException(status_code=502, detail="Fehler bei der Suche (Upstream/Cache) — siehe Server-Logs")
-
-@app.get("/api/anime/all")
-async def get_all_cached_anime(page: int = Query(default=1, ge=1, description="Seite der Ergebnisse"), limit: int = Query(default=20, ge=1, le=100, description="Anzahl der Ergebnisse pro Seite")):
-    """
-    Liefert alle gecachten Animes (paginiert).
-    Frontend nutzt das, wenn keine Suche / alle Filter = All sind.
-    """
-    try:
-        # Verwende die DB-Suchfunktion ohne Filter, um alle Einträge zu erhalten
-        all_results = anime_cache_db.search_cached_anime(query="", type_filter="All", genre_filter="All", studio_filter="All", year_filter="All")
-        total = len(all_results)  # Gesamtzahl der Anime
-        start = max(0, (page - 1) * limit)
-        end = start + limit
-        paged_results = all_results[start:end]
-        logger.info(f"Returniere {len(paged_results)} gecachte Animes (page={page}, limit={limit}, total={total})")
-        return {"results": paged_results, "total": total}
-    except Exception as e:
-        logger.exception(f"Fehler beim Abrufen aller gecachten Animes: {e}")
-        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen der Anime: {str(e)}")
-
-@app.get("/api/anime/{session}", response_model=AnimeDetails)
-async def get_anime_details(session: str):
-    logger.info(f"Abrufen der Details für Anime mit Session: {session}")
-    try:
-        anime = {"source": "pahe", "session": session}
-        details = crawler.get_details(anime)
-        if not details:
-            raise HTTPException(status_code=404, detail="Anime not found")
-        logger.info(f"Details für '{details['title']}' erfolgreich abgerufen.")
-        details["source"] = "pahe"
-        details["identifier"] = session
-        return AnimeDetails(**details)
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Fehler beim Abrufen der Details für Session {session}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/anime/{session}/episodes", response_model=List[Episode])
-async def get_anime_episodes(session: str):
-    logger.info(f"Abrufen der Episoden für Anime mit Session: {session}")
-    try:
-        anime = {"source": "pahe", "session": session}
-        episodes = crawler.fetch_episodes(anime)
-        if episodes is None:
-            logger.info(f"Keine Episoden für Anime mit Session {session} gefunden.")
-            episodes = []
-        logger.info(f"Erfolgreich {len(episodes)} Episoden für Session {session} abgerufen.")
-        
-        corrected_episodes = []
-        for ep in episodes:
-            ep["source"] = "pahe"
-            if "episode" in ep and not isinstance(ep["episode"], str):
-                ep["episode"] = str(ep["episode"])
-            corrected_episodes.append(ep)
-            
-        return [Episode(**ep) for ep in corrected_episodes]
-    except Exception as e:
-        logger.error(f"Fehler beim Abrufen der Episoden für Session {session}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/api/stream_urls", response_model=List[StreamUrlResponse])
-async def get_stream_urls(request: StreamUrlsRequest):
-    logger.info(f"Abrufen der Stream-URLs für {len(request.episodes)} Episoden")
-    try:
-        results = []
-        for ep in request.episodes:
-            m3u8_url = crawler.get_stream_url(ep.session, ep.episode_session)
-            results.append({"title": f"Episode {ep.episode_session}", "m3u8_url": m3u8_url})
-        return results
-    except Exception as e:
-        logger.error(f"Fehler beim Abrufen der Stream-URLs: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/api/play_external")
-async def play_external(request: StreamUrlsRequest):
-    logger.info(f"Starte externen Player für {len(request.episodes)} Episoden")
-    try:
-        for ep in request.episodes:
-            m3u8_url = crawler.get_stream_url(ep.session, ep.episode_session)
-            player_cmd = CONFIG["PLAYER_COMMAND"] + [m3u8_url]
-            subprocess.run(player_cmd, check=True)
-        return {"status": "success"}
-    except Exception as e:
-        logger.error(f"Fehler beim Starten des externen Players: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.websocket("/ws/cache_status")
-async def cache_status_websocket(websocket: WebSocket):
-    await websocket.accept()
-    connected_clients.add(websocket)
-    try:
-        while True:
-            await websocket.receive_text()  # Keep connection alive
-    except Exception:
-        connected_clients.remove(websocket)
-        await websocket.close()
-
-async def broadcast_cache_status(status: str):
-    for client in connected_clients:
-        try:
-            await client.send_text(status)
-        except Exception:
-            connected_clients.remove(client)
-
-cache_dir = CONFIG["IMAGE_CACHE_DIR"]
-if os.path.exists(cache_dir):
-    app.mount("/cached_images", StaticFiles(directory=cache_dir), name="cached_images")
-    logger.info(f"Cache-Verzeichnis '{cache_dir}' für statische Dateien gemountet unter /cached_images")
-else:
-    logger.warning(f"Cache-Verzeichnis '{cache_dir}' existiert nicht. Bilder können nicht serviert werden.")
-
-frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-if os.path.exists(frontend_dir):
-    app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="frontend")
-    logger.info(f"Frontend bereitgestellt von: {frontend_dir}")
-else:
-    logger.warning(f"Frontend-Verzeichnis nicht gefunden unter {frontend_dir}. Statische Dateien werden nicht serviert.")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    cache_builder.stop()
-    logger.info("CacheBuilder gestoppt.")
\ No newline at end of file
+# backend/main.py
+import asyncio
+import logging
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
+from fastapi.responses import Response, StreamingResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from typing import List, Optional
+from .cache_builder import cache_builder
+import os
+import tempfile
+import time
+from .config import CONFIG
+from .crawler import anilist_rate_limiter, animepahe_rate_limiter, crawler, jikan_rate_limiter
+from .database import ShadowInUseError, anime_cache_db
+from .singleflight import crawler_flights
+from .http_cache import http_cache
+from .fuzzy_search import title_index
+from .catalog_index import catalog_index
+from .coordination import SharedRateLimiter, leader_elector, raise_signal, signal_raised_at
+from .snapshot import SnapshotError, export_snapshot, import_snapshot
+from .hls_proxy import PLAYLIST_CONTENT_TYPE, hls_proxy
+from .prefetch import stream_prefetcher
+from .player import player_manager
+from .logging_setup import setup_logging, shutdown_logging, stats as logging_stats
+from .adaptive import upstream_limits
+from .circuit_breaker import CircuitOpenError, upstream_breakers
+from .negative_cache import negative_cache
+from .enrichment import metadata_enricher
+from .parse_pool import parse_pool
+from .cancellation import CancelToken, CancelledByClient, run_with
+import threading
+from .api_models import SearchQuery, AnimeListItem, AnimeDetails, Episode, FilterOptions, StreamUrlsRequest, StreamUrlResponse, AnimeBatchRequest, AnimeBatchResponse, FacetCounts
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="AnimePahe Streamer API - Schritt 4e")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# WebSocket clients for cache builder status
+connected_clients = set()
+
+# Zustand des Leader-Ticks: zuletzt bearbeitete Clearance-/Neuaufbau-Anfrage und zuletzt gesehene Katalog-Generation
+_worker_state = {"clearance_request_seen": 0.0, "rebuild_request_seen": 0.0, "catalog_generation": None}
+
+def _on_elected():
+    # Cookies werden im Hintergrund geholt (bzw. aus dem Cookie-Jar geladen),
+    # damit der gecachte Katalog sofort ausgeliefert werden kann.
+    crawler.clearance_owner = True
+    # Ein neuer Leader beginnt wieder mit den konfigurierten Raten; AIMD senkt sie bei Bedarf erneut
+    for limiter in (jikan_rate_limiter, animepahe_rate_limiter, anilist_rate_limiter):
+        if isinstance(limiter, SharedRateLimiter):
+            limiter.reset_rate()
+    crawler.start_cookie_refresh()
+    cache_builder.start()
+    logger.info("CacheBuilder gestartet.")
+
+def _on_demoted():
+    crawler.clearance_owner = False
+    cache_builder.stop()
+
+def _on_leader_tick(is_leader: bool):
+    if is_leader:
+        # Follower, die ein 403 bekommen, fordern ueber die Koordinations-DB neue Cookies an
+        requested_at = signal_raised_at("clearance_refresh")
+        if requested_at > _worker_state["clearance_request_seen"]:
+            _worker_state["clearance_request_seen"] = requested_at
+            threading.Thread(target=crawler.handle_clearance_request, args=(requested_at,),
+                             name="clearance-request", daemon=True).start()
+        # Neuaufbau, den ein Follower ueber /api/settings/clear_cache angefordert hat
+        rebuild_requested_at = signal_raised_at("catalog_rebuild")
+        if rebuild_requested_at > _worker_state["rebuild_request_seen"]:
+            _worker_state["rebuild_request_seen"] = rebuild_requested_at
+            cache_builder.request_rebuild()
+        return
+    # Follower schreiben nicht: neue Cookies und Katalogaenderungen des Leaders uebernehmen
+    crawler.load_cookie_jar(only_if_newer=True)
+    generation = anime_cache_db.get_generation()
+    if generation != _worker_state["catalog_generation"]:
+        _worker_state["catalog_generation"] = generation
+        title_index.load_from_db(anime_cache_db)
+        catalog_index.load_from_db(anime_cache_db)
+
+@app.on_event("startup")
+async def startup_event():
+    logger.info("Backend-Server startet...")
+    # Bei mehreren Workern (uvicorn --workers N) betreibt nur der Lease-Inhaber CacheBuilder und
+    # Cookie-Refresh; alle anderen beantworten nur Lesezugriffe.
+    crawler.clearance_owner = False
+    # Trigramm-Index fuer die Fuzzy-Suche: im Hintergrund aus SQLite aufbauen, danach inkrementell pflegen
+    anime_cache_db.add_write_listener(title_index.on_rows_written)
+    anime_cache_db.add_reload_listener(lambda: title_index.load_from_db(anime_cache_db))
+    # Spalten-Katalog fuer Filter und Facetten: ebenso im Hintergrund aufbauen und inkrementell pflegen
+    anime_cache_db.add_write_listener(catalog_index.on_rows_written)
+    anime_cache_db.add_reload_listener(lambda: catalog_index.load_from_db(anime_cache_db))
+    _worker_state["catalog_generation"] = anime_cache_db.get_generation()
+    # Anfragen aus frueheren Laeufen nicht erneut ausfuehren
+    _worker_state["rebuild_request_seen"] = signal_raised_at("catalog_rebuild")
+    threading.Thread(target=title_index.load_from_db, args=(anime_cache_db,), name="title-index", daemon=True).start()
+    threading.Thread(target=catalog_index.load_from_db, args=(anime_cache_db,), name="catalog-index", daemon=True).start()
+    leader_elector.start(on_elected=_on_elected, on_demoted=_on_demoted, on_tick=_on_leader_tick)
+    logger.info("Backend-Server bereit.")
+
+@app.get("/api/filters", response_model=FilterOptions)
+async def get_filters():
+    logger.info("Abrufen der Filteroptionen.")
+    try:
+        filters = catalog_index.filter_options() if catalog_index.ready else anime_cache_db.get_unique_filters()
+        logger.debug("Filteroptionen erfolgreich abgerufen.")
+        return FilterOptions(**filters)
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Filter: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/search", response_model=List[AnimeListItem])
+async def search_anime(
+    q: str = Query(default="", description="Suchbegriff"),
+    type: str = Query(default="All", description="Filter nach Typ"),
+    genre: str = Query(default="All", description="Filter nach Genre"),
+    studio: str = Query(default="All", description="Filter nach Studio"),
+    year: str = Query(default="All", description="Filter nach Jahr"),
+    sort: str = Query(default="title", pattern="^(title|year|recent)$", description="Sortierung: title, year oder recent"),
+    year_from: Optional[int] = Query(default=None, ge=1900, le=2100, description="Jahresbereich ab (inklusive)"),
+    year_to: Optional[int] = Query(default=None, ge=1900, le=2100, description="Jahresbereich bis (inklusive)")
+):
+    logger.info(f"Suche angefordert: q='{q}', type='{type}', genre='{genre}', studio='{studio}', year='{year}', sort='{sort}', years={year_from}-{year_to}")
+    try:
+        # 1) Zuerst: lokale DB abfragen (Cache-first)
+        logger.debug("Starte lokale Cache-Suche...")
+        db_results = _search_cached(q, type, genre, studio, year, sort=sort, year_from=year_from, year_to=year_to)
+        logger.debug(f"Cache-Suche ergab {len(db_results)} Ergebnisse")
+
+        # Wenn DB Treffer vorhanden, liefere diese sofort (Cache-first Verhalten)
+        if db_results:
+            logger.info(f"Returniere {len(db_results)} Ergebnisse aus lokalem Cache für q='{q}'")
+            return db_results
+
+        # 1b) Kein Substring-Treffer: tippfehlertolerante Suche ueber den Trigramm-Index,
+        #     bevor eine (rate-limitierte) Remote-Suche noetig wird
+        if q:
+            fuzzy_results = _fuzzy_search_cached(q, type, genre, studio, year, year_from, year_to)
+            if fuzzy_results:
+                logger.info(f"Returniere {len(fuzzy_results)} Fuzzy-Treffer aus lokalem Cache für q='{q}'")
+                return fuzzy_results
+
+        # 2) Wenn keine DB-Treffer und ein Query vorhanden ist, versuche Remote-Crawler
+        api_results = []
+        if q:
+            logger.debug("Keine lokalen Treffer — versuche Crawler-Remote-Suche...")
+            try:
+                api_results = await asyncio.to_thread(crawler.search_anime, q) or []
+                logger.debug(f"Crawler lieferte {len(api_results)} Ergebnisse")
+            except Exception as e:
+                # Crawler-Fehler dürfen nicht zu 500 im Frontend führen — loggen und fallbacken
+                logger.error(f"Crawler-Fehler bei Suche '{q}': {e}", exc_info=True)
+                api_results = []
+
+        # 3) Falls Remote Ergebnisse da sind, persistiere minimal in Cache und liefere DB-Ergebnisse zurück
+        if api_results:
+            # Normalisiere remote Ergebnisse in das minimale DB-Format
+            normalized = []
+            for r in api_results:
+                session = r.get("session") or r.get("id") or r.get("identifier") or r.get("slug")
+                title = r.get("title") or r.get("name") or "Unknown"
+                normalized.append({
+                    "session": session,
+                    "title": title,
+                    "thumbnail": r.get("thumbnail") or r.get("image"),
+                    "type": r.get("type"),
+                    "genre": r.get("genre") if isinstance(r.get("genre"), str) else (", ".join(r.get("genre")) if isinstance(r.get("genre"), (list, tuple)) else r.get("genre")),
+                    "studio": r.get("studio"),
+                    "year": r.get("year"),
+                    "synopsis": r.get("synopsis") or r.get("info"),
+                    "identifier": session,
+                    "source": "pahe"
+                })
+            if not leader_elector.is_leader:
+                # Follower beantworten nur Lesezugriffe; den Katalog schreibt allein der Leader
+                logger.debug(f"Follower: {len(normalized)} Remote-Ergebnisse werden nicht gespeichert")
+                return [
+                    {**{k: r.get(k) for k in ("session", "title", "thumbnail", "genre", "type", "studio", "source")},
+                     "year": str(r["year"]) if r.get("year") else None}
+                    for r in normalized if r.get("session")
+                ]
+            try:
+                anime_cache_db.set_details_bulk(normalized)
+            except Exception as e:
+                logger.exception("Fehler beim Speichern der remote Ergebnisse in der DB (upsert), fahre trotzdem fort.")
+
+            # Frage erneut aus DB (damit Format & thumbnails konsistent sind)
+            try:
+                db_results = _search_cached(q, type, genre, studio, year, sort=sort, year_from=year_from, year_to=year_to)
+                logger.debug(f"Nach Persistierung: Cache-Suche ergab {len(db_results)} Ergebnisse")
+                return db_results
+            except Exception as e:
+                logger.exception("Fehler beim erneuten Lesen der DB nach Persistierung, gebe remote results direkt zurück")
+                # Fallback: entferne evtl. None/invalid Einträge und return
+                return [ { "session": r.get("session"), "title": r.get("title") } for r in api_results ]
+
+        # 4) Kein DB- und kein Remote-Result => leere Liste
+        logger.info("Keine Ergebnisse gefunden (lokal und remote).")
+        return []
+
+    except Exception as e:
+        # Sicherheitsnetz: sollte selten eintreten
+        logger.error(f"Fehler bei der Suche: {e}", exc_info=True)
+        # Liefere sauber 502 statt 500 mit Nachricht
+        raise HTTPException(status_code=502, detail="Fehler bei der Suche (Upstream/Cache) — siehe Server-Logs")
+
+def _search_cached(q: str, type: str = "All", genre: str = "All", studio: str = "All", year: str = "All",
+                   sort: str = "title", year_from: Optional[int] = None, year_to: Optional[int] = None,
+                   sessions: Optional[List[str]] = None) -> List[dict]:
+    """Cache-Suche ueber den Spalten-Katalog im Speicher; solange er noch aufgebaut wird, ueber SQLite."""
+    if catalog_index.ready:
+        results, _total = catalog_index.search(q, type, genre, studio, year, sort=sort, year_from=year_from,
+                                               year_to=year_to, sessions=sessions)
+        return results
+    return anime_cache_db.search_cached_anime(q, type, genre, studio, year, sort=sort, year_from=year_from,
+                                              year_to=year_to, sessions=sessions)
+
+def _fuzzy_search_cached(q: str, type: str = "All", genre: str = "All", studio: str = "All", year: str = "All",
+                         year_from: Optional[int] = None, year_to: Optional[int] = None, limit: int = 50) -> List[dict]:
+    """Fuzzy-Treffer aus dem Trigramm-Index, mit den DB-Filtern angewendet und nach Score sortiert."""
+    matches = title_index.search(q, limit=limit)
+    if not matches:
+        return []
+    rank = {session: i for i, (session, _score) in enumerate(matches)}
+    rows = _search_cached("", type, genre, studio, year, year_from=year_from, year_to=year_to, sessions=list(rank))
+    return sorted(rows, key=lambda row: rank[row["session"]])
+
+@app.get("/api/facets", response_model=FacetCounts)
+async def get_facet_counts(
+    q: str = Query(default="", description="Suchbegriff"),
+    type: str = Query(default="All"),
+    genre: str = Query(default="All"),
+    studio: str = Query(default="All"),
+    year: str = Query(default="All"),
+    year_from: Optional[int] = Query(default=None, ge=1900, le=2100),
+    year_to: Optional[int] = Query(default=None, ge=1900, le=2100)
+):
+    """Trefferzahlen pro Typ/Genre/Studio/Jahr fuer die aktuelle Suche (aus dem Spalten-Katalog)."""
+    if not catalog_index.ready:
+        raise HTTPException(status_code=503, detail="Katalog wird noch geladen.")
+    return catalog_index.facet_counts(q, type, genre, studio, year, year_from=year_from, year_to=year_to)
+
+@app.get("/api/suggestions", response_model=List[AnimeListItem])
+async def get_suggestions(
+    q: str = Query(default="", description="Suchbegriff"),
+    limit: int = Query(default=5, ge=1, le=20, description="Maximale Anzahl Vorschläge")
+):
+    """Schnelle Vorschläge für die Live-Suche — nur aus dem lokalen Cache, nie upstream."""
+    if not q.strip():
+        return []
+    try:
+        return _fuzzy_search_cached(q.strip(), limit=limit)
+    except Exception as e:
+        logger.error(f"Fehler bei den Suchvorschlägen für '{q}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/anime/all")
+async def get_all_cached_anime(page: int = Query(default=1, ge=1, description="Seite der Ergebnisse"), limit: int = Query(default=20, ge=1, le=100, description="Anzahl der Ergebnisse pro Seite")):
+    """
+    Liefert alle gecachten Animes (paginiert).
+    Frontend nutzt das, wenn keine Suche / alle Filter = All sind.
+    """
+    try:
+        start = max(0, (page - 1) * limit)
+        if catalog_index.ready:
+            paged_results, total = catalog_index.search(limit=limit, offset=start)
+        else:
+            # Paginierung direkt in SQL (LIMIT/OFFSET ueber den Titel-Index) statt alle Zeilen zu laden
+            total = anime_cache_db.count_cached_anime()
+            paged_results = anime_cache_db.search_cached_anime(query="", type_filter="All", genre_filter="All", studio_filter="All",
+                                                               year_filter="All", limit=limit, offset=start)
+        logger.info(f"Returniere {len(paged_results)} gecachte Animes (page={page}, limit={limit}, total={total})")
+        return {"results": paged_results, "total": total}
+    except Exception as e:
+        logger.exception(f"Fehler beim Abrufen aller gecachten Animes: {e}")
+        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen der Anime: {str(e)}")
+
+@app.post("/api/anime/batch", response_model=AnimeBatchResponse)
+async def get_anime_details_batch(request: AnimeBatchRequest):
+    """
+    Details fuer mehrere Anime in einer Antwort (z. B. Favoriten). Gecachte kommen mit einer einzigen
+    IN-Abfrage aus SQLite, nur die fehlenden werden upstream geholt (begrenzt parallel) und gespeichert.
+    """
+    sessions = list(dict.fromkeys(s for s in request.sessions if s))
+    logger.info(f"Batch-Details angefordert für {len(sessions)} Anime")
+    try:
+        found = anime_cache_db.get_details_by_sessions(sessions)
+    except Exception as e:
+        logger.error(f"Fehler beim Batch-Lesen aus dem Cache: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    misses = [s for s in sessions if s not in found]
+    if misses:
+        semaphore = asyncio.Semaphore(CONFIG.get("BATCH_DETAILS_CONCURRENCY", 4))
+
+        async def _fetch(session):
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(crawler.get_details, {"source": "pahe", "session": session})
+                except Exception as e:
+                    logger.warning(f"Details für Session {session} nicht abrufbar: {e}")
+                    return None
+
+        fetched = [d for d in await asyncio.gather(*(_fetch(s) for s in misses)) if d]
+        # Nur der Leader schreibt in den Katalog; Follower liefern das Ergebnis nur aus
+        if fetched and leader_elector.is_leader:
+            try:
+                await asyncio.to_thread(anime_cache_db.set_details_bulk, fetched)
+            except Exception as e:
+                logger.error(f"Fehler beim Speichern der Batch-Details: {e}", exc_info=True)
+        found.update({d["session"]: d for d in fetched})
+
+    results, not_found = [], []
+    for session in sessions:
+        details = found.get(session)
+        if not details:
+            not_found.append(session)
+            continue
+        results.append(AnimeDetails(
+            source=details.get("source") or "pahe",
+            identifier=session,
+            title=details.get("title") or "Unknown",
+            synopsis=details.get("synopsis") or "",
+            info=details.get("info") or "",
+            relations=details.get("relations") or "",
+            recommendations=details.get("recommendations") or "",
+            thumbnail=details.get("thumbnail"),
+            genre=details.get("genre"),
+            type=details.get("type"),
+            studio=details.get("studio"),
+            season=details.get("season"),
+            year=details.get("year")
+        ))
+    logger.info(f"Batch-Details: {len(sessions) - len(misses)} aus dem Cache, {len(misses)} upstream, {len(not_found)} nicht gefunden")
+    return AnimeBatchResponse(results=results, not_found=not_found)
+
+def _consume_result(task: asyncio.Future):
+    # Ergebnis eines abgekoppelten Aufrufs abholen, damit asyncio keine "never retrieved"-Warnung loggt
+    if not task.cancelled():
+        task.exception()
+
+async def _run_for_client(http_request: Request, fn, *args):
+    """
+    Wie asyncio.to_thread(fn, *args), bricht die Upstream-Arbeit aber ab, sobald der Client die
+    Verbindung trennt: Rate-Limit-Wartezeiten, HTTP-Aufrufe und Browser-Renderings im Crawler
+    enden dann mit CancelledByClient (siehe cancellation.py).
+    Raises:
+        HTTPException: 499, wenn der Client getrennt hat (die Antwort liest niemand mehr).
+    """
+    token = CancelToken()
+    task = asyncio.ensure_future(asyncio.to_thread(run_with, token, fn, *args))
+    poll_sec = CONFIG.get("CLIENT_DISCONNECT_POLL_SEC", 0.5)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_sec)
+        if done:
+            try:
+                return task.result()
+            except CancelledByClient:
+                raise HTTPException(status_code=499, detail="Client getrennt")
+        if await http_request.is_disconnected():
+            logger.info(f"Client getrennt, breche {getattr(fn, '__name__', fn)} ab")
+            # Callbacks (z. B. Browser beenden) blockieren, daher nicht im Event-Loop
+            await asyncio.to_thread(token.cancel)
+            task.add_done_callback(_consume_result)
+            raise HTTPException(status_code=499, detail="Client getrennt")
+
+@app.get("/api/anime/{session}", response_model=AnimeDetails)
+async def get_anime_details(session: str, http_request: Request):
+    logger.info(f"Abrufen der Details für Anime mit Session: {session}")
+    try:
+        anime = {"source": "pahe", "session": session}
+        details = await _run_for_client(http_request, crawler.get_details, anime)
+        if not details:
+            raise HTTPException(status_code=404, detail="Anime not found")
+        logger.info(f"Details für '{details['title']}' erfolgreich abgerufen.")
+        details["source"] = "pahe"
+        details["identifier"] = session
+        return AnimeDetails(**details)
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Details für Session {session}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/anime/{session}/episodes", response_model=List[Episode])
+async def get_anime_episodes(session: str, http_request: Request):
+    logger.info(f"Abrufen der Episoden für Anime mit Session: {session}")
+    try:
+        anime = {"source": "pahe", "session": session}
+        episodes = await _run_for_client(http_request, crawler.fetch_episodes, anime)
+        if episodes is None:
+            logger.info(f"Keine Episoden für Anime mit Session {session} gefunden.")
+            episodes = []
+        logger.info(f"Erfolgreich {len(episodes)} Episoden für Session {session} abgerufen.")
+        # Die ersten Episoden schon im Hintergrund aufloesen, damit der Klick auf "Play" sofort reagiert
+        stream_prefetcher.schedule(session)
+        
+        corrected_episodes = []
+        for ep in episodes:
+            ep["source"] = "pahe"
+            if "episode" in ep and not isinstance(ep["episode"], str):
+                ep["episode"] = str(ep["episode"])
+            corrected_episodes.append(ep)
+            
+        return [Episode(**ep) for ep in corrected_episodes]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Episoden für Session {session}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/stream_urls", response_model=List[StreamUrlResponse])
+async def get_stream_urls(request: StreamUrlsRequest, http_request: Request):
+    logger.info(f"Abrufen der Stream-URLs für {len(request.episodes)} Episoden")
+    try:
+        results = []
+        for ep in request.episodes:
+            m3u8_url = await _run_for_client(http_request, stream_prefetcher.get_stream_url, ep.session, ep.episode_session)
+            hls_proxy.register(ep.session, ep.episode_session, m3u8_url)
+            results.append({
+                "title": f"Episode {ep.episode_session}",
+                "m3u8_url": m3u8_url,
+                "proxy_url": f"/api/hls/{ep.session}/{ep.episode_session}"
+            })
+        if request.episodes:
+            last = request.episodes[-1]
+            stream_prefetcher.schedule(last.session, after_episode=last.episode_session)
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Stream-URLs: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/prefetch/{anime_session}")
+async def cancel_prefetch(anime_session: str):
+    """Bricht das Vorab-Aufloesen fuer einen Anime ab (der Nutzer hat die Detailansicht verlassen)."""
+    await asyncio.to_thread(stream_prefetcher.cancel, anime_session)
+    return {"status": "cancelled"}
+
+@app.get("/api/hls/{anime_session}/{episode_session}")
+async def get_hls_playlist(anime_session: str, episode_session: str):
+    """Playlist der Episode, deren Segmente ueber den lokalen Proxy (mit Cache und Read-Ahead) laufen."""
+    try:
+        playlist = await asyncio.to_thread(hls_proxy.get_playlist, anime_session, episode_session)
+    except Exception as e:
+        logger.error(f"Fehler beim Laden der HLS-Playlist fuer {anime_session}/{episode_session}: {e}", exc_info=True)
+        raise HTTPException(status_code=502, detail=str(e))
+    return Response(content=playlist, media_type=PLAYLIST_CONTENT_TYPE, headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/hls/{anime_session}/{episode_session}/{index}")
+async def get_hls_resource(anime_session: str, episode_session: str, index: int):
+    """Segment, Key oder Unter-Playlist aus einer zuvor ueber den Proxy geladenen Playlist."""
+    try:
+        data, content_type = await asyncio.to_thread(hls_proxy.get_resource, anime_session, episode_session, index)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Fehler beim Laden der HLS-Ressource {index} fuer {anime_session}/{episode_session}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    cache_control = "no-cache" if content_type == PLAYLIST_CONTENT_TYPE else "public, max-age=86400"
+    return Response(content=data, media_type=content_type, headers={"Cache-Control": cache_control})
+
+@app.post("/api/play_external")
+async def play_external(request: StreamUrlsRequest, http_request: Request):
+    """
+    Loest alle Episoden parallel auf, schreibt eine M3U-Playlist und startet PLAYER_COMMAND einmal.
+    Kehrt sofort zurueck; ueber das Handle laesst sich der Player abfragen und beenden.
+    """
+    logger.info(f"Starte externen Player für {len(request.episodes)} Episoden")
+    semaphore = asyncio.Semaphore(CONFIG.get("PLAYER_RESOLVE_CONCURRENCY", 3))
+
+    async def _resolve(ep):
+        async with semaphore:
+            if CONFIG.get("PLAYER_USE_HLS_PROXY", False):
+                # Der Player laedt ueber den lokalen Proxy (Segment-Cache, Read-Ahead)
+                m3u8_url = await asyncio.to_thread(stream_prefetcher.get_stream_url, ep.session, ep.episode_session)
+                hls_proxy.register(ep.session, ep.episode_session, m3u8_url)
+                return str(http_request.base_url).rstrip("/") + f"/api/hls/{ep.session}/{ep.episode_session}"
+            return await asyncio.to_thread(stream_prefetcher.get_stream_url, ep.session, ep.episode_session)
+
+    results = await asyncio.gather(*(_resolve(ep) for ep in request.episodes), return_exceptions=True)
+    entries, failed = [], []
+    for ep, result in zip(request.episodes, results):
+        if isinstance(result, Exception):
+            logger.error(f"Stream-URL für Episode {ep.episode_session} nicht auflösbar: {result}")
+            failed.append(ep.episode_session)
+        else:
+            entries.append((ep.title or f"Episode {ep.episode_session}", result))
+    if not entries:
+        raise HTTPException(status_code=502, detail="Keine der Episoden konnte aufgelöst werden.")
+    # Wie bei /api/stream_urls: die Episoden nach der letzten abgespielten vorab aufloesen
+    last = request.episodes[-1]
+    stream_prefetcher.schedule(last.session, after_episode=last.episode_session)
+    try:
+        handle = await asyncio.to_thread(player_manager.launch, entries)
+    except OSError as e:
+        logger.error(f"Fehler beim Starten des externen Players: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "started", "handle": handle, "episodes": len(entries), "failed": failed}
+
+@app.get("/api/player/{handle}")
+async def get_player_status(handle: str):
+    status = await asyncio.to_thread(player_manager.status, handle)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unbekanntes Player-Handle")
+    return status
+
+@app.delete("/api/player/{handle}")
+async def stop_player(handle: str):
+    status = await asyncio.to_thread(player_manager.stop, handle)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unbekanntes Player-Handle")
+    return status
+
+@app.post("/api/settings/clear_cache")
+async def clear_cache():
+    """
+    Baut den Katalog neu auf, ohne ihn vorher zu leeren: der CacheBuilder befuellt eine
+    Schatten-Datenbank und tauscht sie danach atomar gegen die Live-Datenbank.
+    Bis dahin liefert die bisherige Datenbank weiter aus.
+    """
+    if cache_builder.rebuild_in_progress:
+        return {"status": "rebuild_in_progress"}
+    if leader_elector.is_leader:
+        cache_builder.request_rebuild()
+    else:
+        # Nur der Leader betreibt den CacheBuilder; die Anfrage wird ueber die Koordinations-DB weitergereicht
+        await asyncio.to_thread(raise_signal, "catalog_rebuild")
+    return {"status": "rebuild_started"}
+
+@app.get("/api/snapshot/export")
+async def export_catalog_snapshot(
+    episodes: bool = Query(default=False, description="Gecachte Episodenlisten einschliessen"),
+    thumbnails: bool = Query(default=False, description="Bild-Cache einschliessen")
+):
+    """Streamt den Katalog als gzip-komprimierten Snapshot (siehe backend/snapshot.py)."""
+    filename = f"animepahe2-catalog-{time.strftime('%Y%m%d-%H%M%S')}.snap.gz"
+    return StreamingResponse(
+        export_snapshot(include_episodes=episodes, include_thumbnails=thumbnails),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/snapshot/import")
+async def import_catalog_snapshot(request: Request, merge: bool = Query(default=False, description="Mit bestehendem Katalog zusammenfuehren")):
+    """Laedt einen Snapshot aus dem Request-Body (roh, application/gzip)."""
+    # Neuaufbau und Import teilen sich die Schatten-Datenbank; parallel laufen darf nur einer
+    if not leader_elector.is_leader:
+        raise HTTPException(status_code=409, detail="Snapshot-Import nur ueber den Leader-Worker (Katalog wird nur dort geschrieben)")
+    if cache_builder.rebuild_in_progress or anime_cache_db.shadow_active:
+        raise HTTPException(status_code=409, detail="Neuaufbau oder Import des Katalogs laeuft bereits")
+    # Body erst auf die Platte streamen: gzip braucht einen lesbaren Datei-Stream, der Import laeuft im Thread
+    with tempfile.TemporaryFile() as tmp:
+        async for chunk in request.stream():
+            tmp.write(chunk)
+        tmp.seek(0)
+        try:
+            counts = await asyncio.to_thread(import_snapshot, tmp, not merge)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ShadowInUseError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            logger.error(f"Fehler beim Snapshot-Import: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "ok", "imported": counts}
+
+@app.get("/api/catalog/generation")
+async def get_catalog_generation(response: Response):
+    """Aktuelle Katalog-Generation; der Service Worker des Frontends verwirft bei Aenderung seinen API-Cache."""
+    response.headers["Cache-Control"] = "no-store"
+    try:
+        return {"generation": await asyncio.to_thread(anime_cache_db.get_generation)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Interne Kennzahlen, z. B. wie viele Upstream-Aufrufe zusammengefasst wurden."""
+    return {
+        "singleflight": crawler_flights.stats(),
+        "http_cache": http_cache.stats(),
+        "hls": hls_proxy.stats(),
+        "prefetch": stream_prefetcher.stats(),
+        "logging": logging_stats(),
+        "upstream": upstream_limits.stats(),
+        "circuit_breakers": upstream_breakers.stats(),
+        "negative_cache": negative_cache.stats(),
+        "parse_pool": parse_pool.stats(),
+        "kwik_resolver": crawler.kwik_stats(),
+        "enrichment": metadata_enricher.stats(),
+        "worker": {"id": leader_elector.holder_id, "leader": leader_elector.is_leader}
+    }
+
+@app.websocket("/ws/cache_status")
+async def cache_status_websocket(websocket: WebSocket):
+    await websocket.accept()
+    connected_clients.add(websocket)
+    try:
+        while True:
+            await websocket.receive_text()  # Keep connection alive
+    except Exception:
+        connected_clients.remove(websocket)
+        await websocket.close()
+
+async def broadcast_cache_status(status: str):
+    for client in connected_clients:
+        try:
+            await client.send_text(status)
+        except Exception:
+            connected_clients.remove(client)
+
+cache_dir = CONFIG["IMAGE_CACHE_DIR"]
+if os.path.exists(cache_dir):
+    app.mount("/cached_images", StaticFiles(directory=cache_dir), name="cached_images")
+    logger.info(f"Cache-Verzeichnis '{cache_dir}' für statische Dateien gemountet unter /cached_images")
+else:
+    logger.warning(f"Cache-Verzeichnis '{cache_dir}' existiert nicht. Bilder können nicht serviert werden.")
+
+frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
+if os.path.exists(frontend_dir):
+    app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="frontend")
+    logger.info(f"Frontend bereitgestellt von: {frontend_dir}")
+else:
+    logger.warning(f"Frontend-Verzeichnis nicht gefunden unter {frontend_dir}. Statische Dateien werden nicht serviert.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    leader_elector.stop()
+    hls_proxy.shutdown()
+    cache_builder.stop()
+    logger.info("CacheBuilder gestoppt.")
+    parse_pool.shutdown()
+    shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,91 @@
+# backend/negative_cache.py
+"""
+Persistenter Negativ-Cache fuer Upstream-Ziele, die wiederholt scheitern (Detailseite 404,
+nicht parsebar, leer). Jeder weitere Fehlschlag verdoppelt die Wartezeit bis zum naechsten
+Versuch (NEGATIVE_CACHE_BASE_SEC bis NEGATIVE_CACHE_MAX_SEC). Der CacheBuilder filtert damit
+seine Arbeitsliste, statt dieselben Sessions in jedem Zyklus erneut zu versuchen.
+"""
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterable, List
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# SQLite erlaubt standardmaessig max. 999 Parameter pro Statement
+_SQL_VARIABLE_CHUNK = 900
+
+
+class NegativeCache:
+    def __init__(self, db_path: str = CONFIG.get("NEGATIVE_CACHE_DB_PATH", "negative_cache.db"),
+                 base_sec: float = CONFIG.get("NEGATIVE_CACHE_BASE_SEC", 3600),
+                 max_sec: float = CONFIG.get("NEGATIVE_CACHE_MAX_SEC", 7 * 24 * 3600)):
+        self.db_path = db_path
+        self.base_sec = base_sec
+        self.max_sec = max_sec
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS failed_targets (
+                    key TEXT PRIMARY KEY,
+                    failures INTEGER NOT NULL,
+                    last_error TEXT,
+                    last_failed_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_failed_next_attempt ON failed_targets (next_attempt_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def record_failure(self, key: str, error: str) -> float:
+        """
+        Vermerkt einen Fehlschlag und gibt zurueck, wie lange das Ziel nun gesperrt ist (Sekunden).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT failures FROM failed_targets WHERE key = ?", (key,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            backoff = min(self.max_sec, self.base_sec * 2 ** (failures - 1))
+            conn.execute("""
+                INSERT INTO failed_targets (key, failures, last_error, last_failed_at, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET failures = excluded.failures, last_error = excluded.last_error,
+                    last_failed_at = excluded.last_failed_at, next_attempt_at = excluded.next_attempt_at
+            """, (key, failures, error[:500], now, now + backoff))
+        logger.info("%s im Negativ-Cache (%d. Fehlschlag), naechster Versuch in %.0fs: %s", key, failures, backoff, error)
+        return backoff
+
+    def forget(self, keys: Iterable[str]):
+        """Entfernt Ziele, die wieder erfolgreich geladen wurden."""
+        keys = list(keys)
+        with self._connect() as conn:
+            for i in range(0, len(keys), _SQL_VARIABLE_CHUNK):
+                chunk = keys[i:i + _SQL_VARIABLE_CHUNK]
+                conn.execute(f"DELETE FROM failed_targets WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+    def blocked_keys(self) -> set:
+        """Alle Ziele, deren Wartezeit noch nicht abgelaufen ist."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT key FROM failed_targets WHERE next_attempt_at > ?", (time.time(),)).fetchall()
+        return {row[0] for row in rows}
+
+    def filter_due(self, keys: List[str]) -> List[str]:
+        """Gibt `keys` ohne die aktuell gesperrten Ziele zurueck (Reihenfolge bleibt erhalten)."""
+        blocked = self.blocked_keys()
+        return [k for k in keys if k not in blocked] if blocked else list(keys)
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            total, blocked = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_attempt_at > ?), 0) FROM failed_targets", (time.time(),)
+            ).fetchone()
+        return {"entries": total, "blocked": blocked}
+
+
+# Globale Instanz
+negative_cache = NegativeCache()
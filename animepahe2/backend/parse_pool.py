@@ -0,0 +1,91 @@
+# backend/parse_pool.py
+"""
+Prozess-Pool fuer das HTML-Parsen. BeautifulSoup ist reines Python und haelt den GIL; laufen
+CacheBuilder und API-Anfragen gleichzeitig, teilen sie sich sonst einen Kern. Die Parser aus
+parsers.py laufen hier in eigenen Prozessen und geben einfache dicts zurueck.
+Mit PARSE_POOL_WORKERS = 0 (oder wenn der Pool nicht startet) wird im aufrufenden Thread geparst.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _default_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class ParsePool:
+    def __init__(self, workers: Optional[int] = CONFIG.get("PARSE_POOL_WORKERS")):
+        self.workers = _default_workers() if workers is None else workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.inline = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # spawn statt fork: der Server-Prozess hat bereits Threads (uvicorn, CacheBuilder, Logging)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+                logger.info("Parse-Pool gestartet (%d Prozesse)", self.workers)
+            return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Fuehrt fn(*args) im Pool aus; ohne Pool sofort im aufrufenden Thread (erledigtes Future)."""
+        executor = self._get_executor()
+        if executor is not None:
+            try:
+                future = executor.submit(fn, *args)
+                self.submitted += 1
+                return future
+            except (BrokenProcessPool, RuntimeError) as e:
+                logger.warning("Parse-Pool nicht verfuegbar, parse im Thread: %s", e)
+                self._reset()
+        future = Future()
+        self.inline += 1
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, fn: Callable, *args):
+        """Wie submit, wartet aber auf das Ergebnis. Ein abgestuerzter Pool wird ersetzt und inline geparst."""
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            logger.warning("Parse-Prozess abgestuerzt, parse im Thread: %s", e)
+            self._reset()
+            self.inline += 1
+            return fn(*args)
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "running": self._executor is not None,
+                "submitted": self.submitted, "inline": self.inline}
+
+
+# Globale Instanz
+parse_pool = ParsePool()
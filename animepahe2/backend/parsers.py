@@ -0,0 +1,225 @@
+# backend/parsers.py
+"""
+HTML-Parser fuer AnimePahe-Seiten als Funktionen auf Modulebene. Sie bekommen rohes HTML
+(bytes oder str) und liefern einfache dicts/Listen, damit sie sich im Prozess-Pool
+(parse_pool.py) ausfuehren lassen: Funktionen und Ergebnisse sind picklebar, der Crawler-
+Zustand wird nicht gebraucht.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from .utils import clean_title
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+
+def make_soup(html) -> BeautifulSoup:
+    """Parst HTML mit BeautifulSoup; bs4 wird erst hier importiert. Bei bytes erkennt bs4 die Kodierung selbst."""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser')
+
+
+def parse_details(html) -> dict:
+    """Alle Felder einer Anime-Detailseite; das Thumbnail bleibt die Original-URL (thumbnail_url)."""
+    soup = make_soup(html)
+    anime_type, studio, season, year = parse_info(soup)
+    return {
+        "title": parse_title(soup),
+        "synopsis": parse_synopsis(soup),
+        "relations": parse_relations(soup),
+        "recommendations": parse_recommendations(soup),
+        "genre": parse_genre(soup),
+        "thumbnail_url": parse_thumbnail(soup),
+        "type": anime_type,
+        "studio": studio,
+        "season": season,
+        "year": year
+    }
+
+
+def parse_title(soup: BeautifulSoup) -> str:
+    title_tag = soup.find("h1")
+    return clean_title(title_tag.get_text(strip=True)) if title_tag else "Unknown"
+
+
+def parse_synopsis(soup: BeautifulSoup) -> str:
+    summary_div = soup.find("div", class_="tab-content anime-detail") or soup.find("div", class_="anime-info")
+    return summary_div.decode_contents() if summary_div else "No summary available."
+
+
+def parse_relations(soup: BeautifulSoup) -> str:
+    relations_div = soup.find(lambda tag: tag.name == "div" and tag.get("class") and "anime-relation" in " ".join(tag.get("class")))
+    return relations_div.decode_contents() if relations_div else "No relations found."
+
+
+def parse_recommendations(soup: BeautifulSoup) -> str:
+    recommendations_div = soup.find(lambda tag: tag.name == "div" and tag.get("class") and "anime-recommendation" in " ".join(tag.get("class")))
+    return recommendations_div.decode_contents() if recommendations_div else "No recommendations found."
+
+
+def parse_genre(soup: BeautifulSoup) -> str:
+    genre_div = soup.find("div", class_="anime-genre")
+    if not genre_div:
+        return "N/A"
+    parts = [li.get_text(strip=True) for li in genre_div.find_all("li")]
+    return ", ".join(parts) if parts else "N/A"
+
+
+def parse_thumbnail(soup: BeautifulSoup) -> str | None:
+    poster_div = soup.find("div", class_="anime-poster")
+    if poster_div and poster_div.find("img"):
+        return poster_div.find("img").get("src") or poster_div.find("img").get("data-src")
+    return None
+
+
+def parse_info(soup: BeautifulSoup) -> tuple[str | None, str | None, str | None, str | None]:
+    """
+    Robusteres Parsen der Info-Box auf AnimePahe-Detailseiten.
+    Liefert: (type, studio, season, year) - oder None wenn nicht gefunden.
+    """
+    anime_type = None
+    studio = None
+    season = None
+    year = None
+
+    info_div = soup.find("div", class_="anime-info")
+    if not info_div:
+        # Fallback: suche allgemein nach Abschnitten die 'Studio' enthalten
+        possible = soup.find_all(text=lambda t: t and "studio" in t.lower())
+        for t in possible:
+            parent = t.parent
+            if parent and parent.get_text(strip=True):
+                txt = parent.get_text(" ", strip=True)
+                m = re.search(r'Studios?:\s*(.+)', txt, re.IGNORECASE)
+                if m:
+                    studio_candidate = m.group(1).split("|")[0].split(",")[0].strip()
+                    if studio_candidate and studio_candidate.lower() not in ("n/a","unknown"):
+                        studio = studio_candidate
+                        break
+        return anime_type, studio, season, year
+
+    # Durchlaufe <p>-Elemente in der Info-Box
+    for p in info_div.find_all(["p", "div"]):
+        text = p.get_text(" ", strip=True)
+        lowered = text.lower()
+
+        # TYPE
+        if "type:" in lowered and not anime_type:
+            a = p.find("a")
+            if a and a.get_text(strip=True):
+                anime_type = a.get_text(strip=True)
+            else:
+                m = re.search(r'Type:\s*(.+)', text, re.IGNORECASE)
+                if m:
+                    anime_type = m.group(1).split("|")[0].strip()
+
+        # STUDIO / STUDIOS / Studio(s)
+        if "studio" in lowered and not studio:
+            # 1) Wenn <a> Tags vorhanden, nimm deren Texte (häufig)
+            anchors = [a.get_text(strip=True) for a in p.find_all("a") if a.get_text(strip=True)]
+            if anchors:
+                studio = ", ".join(anchors)
+            else:
+                # 2) Fallback: versuche Text nach Label zu extrahieren
+                m = re.search(r'Studios?:\s*(.+)', text, re.IGNORECASE)
+                if m:
+                    val = m.group(1).strip()
+                    # Entferne nachfolgende Labels oder Separatoren
+                    val = re.split(r'\s*\||\n', val)[0].strip()
+                    # Falls mehrere durch Komma getrennt, nimm alle
+                    parts = [x.strip() for x in val.split(",") if x.strip()]
+                    if parts:
+                        studio = ", ".join(parts)
+
+        # AIRED -> Jahr & Saison
+        if "aired:" in lowered and (not year or not season):
+            m = re.search(r'\b(\d{4})\b', text)
+            if m:
+                year = m.group(1)
+            m_month = re.search(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', text, re.IGNORECASE)
+            if m_month:
+                month = m_month.group(1).lower()
+                season = {"dec": "Winter", "jan": "Winter", "feb": "Winter",
+                          "mar": "Spring", "apr": "Spring", "may": "Spring",
+                          "jun": "Summer", "jul": "Summer", "aug": "Summer",
+                          "sep": "Fall", "oct": "Fall", "nov": "Fall"}.get(month[:3], None)
+
+    # Normalize: keep None if empty/placeholder
+    if isinstance(studio, str) and studio.strip().lower() in ("n/a","unknown",""):
+        studio = None
+
+    return anime_type or None, studio or None, season or None, year or None
+
+
+def parse_anime_index(html) -> list[dict]:
+    """Alle Anime (Titel, Session) aus der /anime-Indexseite."""
+    soup = make_soup(html)
+    anime_list = []
+    nav_container = soup.find("div", class_="scrollable-ul")
+    if nav_container:
+        nav_links = nav_container.find_all("a")
+        for link in nav_links:
+            tab_id = link.get("href")
+            if not tab_id:
+                continue
+            tab_id = tab_id.lstrip("#")
+            tab_pane = soup.find("div", id=tab_id)
+            if tab_pane:
+                anime_links = tab_pane.find_all("a", href=True)
+                for a in anime_links:
+                    href = a.get("href")
+                    title = a.get("title") or a.get_text(strip=True)
+                    if not href or not title:
+                        continue
+                    parsed = urlparse(href)
+                    path = parsed.path or href
+                    if path.startswith("/anime/"):
+                        session = path.rstrip("/").split("/")[-1]
+                        if not session:
+                            logger.warning(f"Leerer Session-Slug von href={href}, title={title}")
+                            continue
+                        anime_list.append({"title": clean_title(title), 'session': session, 'source': 'pahe'})
+    else:
+        logger.debug("Kein nav_container mit class 'scrollable-ul' gefunden beim Parsen von /anime")
+    return anime_list
+
+
+def parse_kwik_links(html) -> dict:
+    """Kwik-Links (Aufloesung -> {kwik, audio}) aus der gerenderten Episodenseite."""
+    soup = make_soup(html)
+    links = {}
+    selectors = [
+        'div.episode-menu a[href*="kwik"]',
+        'div#resolutionMenu a[href*="kwik"]',
+        'div#resolutionMenu button[data-src*="kwik"]',
+        'a[href*="kwik"]',
+        'button[data-src*="kwik"]'
+    ]
+    for selector in selectors:
+        elements = soup.select(selector)
+        logger.debug("Gefundene Elemente für Selektor '%s': %d", selector, len(elements))
+        for elem in elements:
+            kwik_url = elem.get('href') or elem.get('data-src')
+            resolution = elem.get('data-resolution') or (elem.get_text(strip=True) if elem.get_text() else 'unknown')
+            audio = elem.get('data-audio', 'unknown')
+            if kwik_url:
+                links[resolution] = {'kwik': kwik_url, 'audio': audio}
+                logger.debug("Link hinzugefügt: Resolution=%s, Kwik=%s, Audio=%s", resolution, kwik_url, audio)
+    if not links:
+        logger.warning("Keine Kwik-Links in HTML gefunden, versuche JavaScript-Fallback")
+        script_tags = soup.find_all('script')
+        for script in script_tags:
+            text = script.string or ""
+            if 'kwik' in text.lower():
+                matches = re.findall(r'https?://kwik\.[a-z]+/[^\s\'"]+', text)
+                for kwik_url in matches:
+                    links[f"unknown_{len(links)+1}"] = {'kwik': kwik_url, 'audio': 'unknown'}
+                    logger.debug("JavaScript-Link hinzugefügt: Kwik=%s", kwik_url)
+    return links
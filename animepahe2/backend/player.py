@@ -0,0 +1,211 @@
+# backend/player.py
+"""
+Start des externen Players (CONFIG["PLAYER_COMMAND"], z. B. mpv) ohne den Event-Loop zu blockieren.
+Alle Episoden landen in einer M3U-Playlist, der Player wird einmal per Popen gestartet und
+ueber ein Handle abgefragt bzw. beendet.
+Den Prozess kennt nur der startende Worker. Er traegt Handle, PID und Zustand in die
+Koordinations-DB ein und fuehrt dort angeforderte Stopps aus; andere Worker beantworten
+Status- und Stopp-Anfragen ueber diese Eintraege.
+"""
+import logging
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from .config import CONFIG
+from .coordination import PlayerRegistry, leader_elector
+
+logger = logging.getLogger(__name__)
+
+
+class _PlayerProcess:
+    def __init__(self, process: subprocess.Popen, playlist_path: str, titles: List[str]):
+        self.process = process
+        self.playlist_path = playlist_path
+        self.titles = titles
+        self.started_at = time.time()
+        self.exit_published = False
+
+
+class PlayerManager:
+    def __init__(self, playlist_dir: str = CONFIG.get("PLAYER_PLAYLIST_DIR", "playlists"),
+                 registry: Optional[PlayerRegistry] = None, worker_id: str = leader_elector.holder_id,
+                 poll_sec: float = CONFIG.get("PLAYER_STATUS_POLL_SEC", 0.5)):
+        self.playlist_dir = playlist_dir
+        self.registry = registry or PlayerRegistry()
+        self.worker_id = worker_id
+        self.poll_sec = poll_sec
+        self._lock = threading.Lock()
+        self._players: Dict[str, _PlayerProcess] = {}
+        self._watcher: Optional[threading.Thread] = None
+
+    def write_playlist(self, entries: List[Tuple[str, str]]) -> str:
+        """Schreibt eine M3U-Playlist aus (Titel, URL)-Paaren und gibt den Pfad zurueck."""
+        os.makedirs(self.playlist_dir, exist_ok=True)
+        path = os.path.abspath(os.path.join(self.playlist_dir, f"{uuid.uuid4().hex}.m3u"))
+        lines = ["#EXTM3U"]
+        for title, url in entries:
+            lines.append(f"#EXTINF:-1,{title}")
+            lines.append(url)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def launch(self, entries: List[Tuple[str, str]]) -> str:
+        """
+        Startet den Player einmal mit allen Eintraegen und kehrt sofort zurueck.
+        Returns:
+            str: Handle fuer status() und stop().
+        Raises:
+            OSError: Wenn der Player nicht gestartet werden kann (z. B. nicht installiert).
+        """
+        self._reap()
+        playlist_path = self.write_playlist(entries)
+        command = CONFIG["PLAYER_COMMAND"] + [playlist_path]
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL)
+        except OSError:
+            self._remove_playlist(playlist_path)
+            raise
+        handle = uuid.uuid4().hex
+        player = _PlayerProcess(process, playlist_path, [title for title, _ in entries])
+        with self._lock:
+            self._players[handle] = player
+        try:
+            self.registry.publish(handle, self.worker_id, process.pid, playlist_path, player.titles, player.started_at)
+        except sqlite3.Error as e:
+            logger.warning(f"Player {handle} nicht in der Koordinations-DB eingetragen, nur hier abfragbar: {e}")
+        self._start_watcher()
+        logger.info(f"Player gestartet (PID {process.pid}, {len(entries)} Episoden, Handle {handle})")
+        return handle
+
+    def status(self, handle: str) -> Optional[Dict]:
+        """Zustand eines gestarteten Players (auch von einem anderen Worker) oder None bei unbekanntem Handle."""
+        with self._lock:
+            player = self._players.get(handle)
+        if player is None:
+            return self._remote_status(handle)
+        returncode = player.process.poll()
+        return {
+            "handle": handle,
+            "running": returncode is None,
+            "returncode": returncode,
+            "pid": player.process.pid,
+            "episodes": player.titles,
+            "started_at": player.started_at
+        }
+
+    def stop(self, handle: str, timeout: float = 5) -> Optional[Dict]:
+        """Beendet den Player (erst terminate, nach `timeout` Sekunden kill)."""
+        with self._lock:
+            player = self._players.get(handle)
+        if player is None:
+            return self._remote_stop(handle, timeout)
+        if player.process.poll() is None:
+            player.process.terminate()
+            try:
+                player.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                player.process.kill()
+                player.process.wait()
+            logger.info(f"Player {handle} beendet.")
+        self._remove_playlist(player.playlist_path)
+        self._publish_state(handle, player)
+        return self.status(handle)
+
+    # ---------- Player anderer Worker ----------
+    def _remote_status(self, handle: str) -> Optional[Dict]:
+        try:
+            row = self.registry.get(handle)
+        except sqlite3.Error as e:
+            logger.warning(f"Player-Status {handle} nicht lesbar: {e}")
+            return None
+        if row is None:
+            return None
+        return {key: row[key] for key in ("handle", "running", "returncode", "pid", "episodes", "started_at")}
+
+    def _remote_stop(self, handle: str, timeout: float) -> Optional[Dict]:
+        """Bittet den startenden Worker um den Stopp und wartet, bis er ihn eingetragen hat."""
+        status = self._remote_status(handle)
+        if status is None or not status["running"]:
+            return status
+        self.registry.request_stop(handle)
+        deadline = time.time() + timeout + 2 * self.poll_sec
+        while status and status["running"] and time.time() < deadline:
+            time.sleep(self.poll_sec)
+            status = self._remote_status(handle)
+        return status
+
+    def _publish_state(self, handle: str, player: _PlayerProcess):
+        returncode = player.process.poll()
+        try:
+            self.registry.update(handle, returncode is None, returncode)
+        except sqlite3.Error as e:
+            logger.debug("Player-Status %s nicht gespeichert: %s", handle, e)
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name="player-watch", daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        """Traegt Prozessende ein und fuehrt Stopp-Anfragen aus, solange hier Player laufen."""
+        while True:
+            with self._lock:
+                players = list(self._players.items())
+            running = set()
+            for handle, player in players:
+                if player.process.poll() is None:
+                    running.add(handle)
+                elif not player.exit_published:
+                    self._publish_state(handle, player)
+                    player.exit_published = True
+            if not running:
+                with self._lock:
+                    # launch() kann inzwischen einen neuen Player eingetragen haben
+                    if all(player.process.poll() is not None for player in self._players.values()):
+                        self._watcher = None
+                        return
+                continue
+            try:
+                for handle in self.registry.stop_requests(self.worker_id):
+                    if handle in running:
+                        self.stop(handle)
+            except sqlite3.Error as e:
+                logger.debug("Stopp-Anfragen fuer Player nicht lesbar: %s", e)
+            time.sleep(self.poll_sec)
+
+    def _reap(self, keep_finished_sec: float = 3600):
+        """Entfernt Playlists beendeter Player und vergisst sie nach einer Weile."""
+        now = time.time()
+        with self._lock:
+            players = list(self._players.items())
+        for handle, player in players:
+            if player.process.poll() is None:
+                continue
+            self._remove_playlist(player.playlist_path)
+            if now - player.started_at > keep_finished_sec:
+                with self._lock:
+                    self._players.pop(handle, None)
+                try:
+                    self.registry.remove(handle)
+                except sqlite3.Error:
+                    pass
+
+    def _remove_playlist(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug("Playlist %s konnte nicht geloescht werden: %s", path, e)
+
+
+# Globale Instanz
+player_manager = PlayerManager()
@@ -0,0 +1,225 @@
+# backend/prefetch.py
+"""
+Vorausschauendes Aufloesen von Stream-URLs: Wird eine Episodenliste geoeffnet oder Episode N
+abgespielt, loest ein niedrig priorisierter Hintergrund-Thread die naechsten Episoden ueber
+crawler.get_stream_url auf. Der Klick auf die naechste Episode ist dann sofort beantwortet.
+Der Thread arbeitet nur, wenn das Rate-Limit frei ist und hoechstens wenige Vordergrund-Aufrufe
+laufen, hat ein eigenes Budget pro Minute und bricht ab, sobald der Nutzer die Detailansicht
+verlaesst: Jeder Plan laeuft unter einem CancelToken, das auch ein laufendes Aufloesen beendet.
+Der Abbruch kommt oft bei einem anderen Worker an als der Plan; er wird deshalb zusaetzlich als
+Signal pro Anime in die Koordinations-DB geschrieben, das der Worker mit dem Plan abfragt.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cancellation import CancelledByClient, CancelToken, run_with
+from .config import CONFIG
+from .coordination import raise_signal, signal_raised_at
+from .crawler import animepahe_rate_limiter, crawler
+from .singleflight import crawler_flights
+
+logger = logging.getLogger(__name__)
+
+
+class StreamPrefetcher:
+    def __init__(self, resolver: Callable[[str, str], str] = crawler.get_stream_url,
+                 episode_lister: Callable[[dict], List[dict]] = crawler.fetch_episodes,
+                 lookahead: int = CONFIG.get("PREFETCH_EPISODES", 2),
+                 ttl_sec: int = CONFIG.get("STREAM_URL_TTL_SEC", 1800),
+                 max_per_minute: int = CONFIG.get("PREFETCH_MAX_PER_MINUTE", 4),
+                 max_foreground_flights: int = CONFIG.get("PREFETCH_MAX_FOREGROUND_FLIGHTS", 2),
+                 cancel_poll_sec: float = CONFIG.get("PREFETCH_CANCEL_POLL_SEC", 0.5),
+                 limiter=animepahe_rate_limiter):
+        self.resolver = resolver
+        self.episode_lister = episode_lister
+        self.lookahead = lookahead
+        self.ttl_sec = ttl_sec
+        self.max_per_minute = max_per_minute
+        self.max_foreground_flights = max_foreground_flights
+        self.cancel_poll_sec = cancel_poll_sec
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._resolved: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        # Offener Plan pro Anime; das Token bricht ihn ab, auch mitten im Aufloesen
+        self._plans: Dict[str, CancelToken] = {}
+        self._jobs: "queue.Queue[Tuple[str, Optional[str], CancelToken, float]]" = queue.Queue()
+        self._recent_resolves: deque = deque()
+        self._worker: Optional[threading.Thread] = None
+        self.hits = 0
+        self.prefetched = 0
+        self.cancelled = 0
+
+    # ---------- Vordergrund ----------
+    def get_stream_url(self, anime_session: str, episode_session: str) -> str:
+        """Wie crawler.get_stream_url, beantwortet aber vorab aufgeloeste Episoden sofort."""
+        cached = self.peek(anime_session, episode_session)
+        if cached:
+            self.hits += 1
+            return cached
+        m3u8_url = self.resolver(anime_session, episode_session)
+        self._store(anime_session, episode_session, m3u8_url)
+        return m3u8_url
+
+    def peek(self, anime_session: str, episode_session: str) -> Optional[str]:
+        with self._lock:
+            entry = self._resolved.get((anime_session, episode_session))
+            if entry and time.time() - entry[1] < self.ttl_sec:
+                return entry[0]
+            return None
+
+    def invalidate(self, anime_session: str, episode_session: str):
+        """Verwirft eine vorab aufgeloeste URL, deren Tokens upstream bereits abgelaufen sind."""
+        with self._lock:
+            self._resolved.pop((anime_session, episode_session), None)
+
+    def _store(self, anime_session: str, episode_session: str, m3u8_url: str):
+        with self._lock:
+            now = time.time()
+            self._resolved[(anime_session, episode_session)] = (m3u8_url, now)
+            # Abgelaufene Eintraege gelegentlich aufraeumen
+            if len(self._resolved) > 500:
+                self._resolved = {k: v for k, v in self._resolved.items() if now - v[1] < self.ttl_sec}
+
+    # ---------- Planung ----------
+    def schedule(self, anime_session: str, after_episode: Optional[str] = None):
+        """
+        Plant das Aufloesen der naechsten `lookahead` Episoden nach `after_episode`
+        (ohne after_episode: die ersten Episoden der Liste). Ein offener Plan fuer denselben
+        Anime wird dabei ersetzt.
+        """
+        if self.lookahead <= 0:
+            return
+        token = CancelToken()
+        with self._lock:
+            previous = self._plans.get(anime_session)
+            self._plans[anime_session] = token
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="stream-prefetch", daemon=True)
+                self._worker.start()
+        if previous:
+            previous.cancel()
+        self._jobs.put((anime_session, after_episode, token, time.time()))
+
+    def cancel(self, anime_session: str):
+        """
+        Bricht den Plan fuer einen Anime ab (Nutzer hat die Detailansicht verlassen), auch wenn
+        ihn ein anderer Worker ausfuehrt.
+        """
+        self._cancel_local(anime_session)
+        try:
+            raise_signal(_cancel_signal(anime_session))
+        except sqlite3.Error as e:
+            logger.warning(f"Prefetch-Abbruch fuer {anime_session} nicht an andere Worker gemeldet: {e}")
+
+    def _cancel_local(self, anime_session: str):
+        with self._lock:
+            token = self._plans.pop(anime_session, None)
+        if token and not token.cancelled:
+            token.cancel()
+            self.cancelled += 1
+            logger.debug("Prefetch fuer %s abgebrochen", anime_session)
+
+    # ---------- Hintergrund ----------
+    def _run(self):
+        while True:
+            anime_session, after_episode, token, planned_at = self._jobs.get()
+            if token.cancelled:
+                continue
+            finished = threading.Event()
+            threading.Thread(target=self._watch_remote_cancel, args=(anime_session, token, planned_at, finished),
+                             name="stream-prefetch-cancel", daemon=True).start()
+            try:
+                self._run_plan(anime_session, after_episode, token)
+            except CancelledByClient:
+                logger.debug("Prefetch fuer %s waehrend des Aufloesens abgebrochen", anime_session)
+            except Exception as e:
+                logger.warning(f"Prefetch fuer {anime_session} fehlgeschlagen: {e}")
+            finally:
+                finished.set()
+                with self._lock:
+                    if self._plans.get(anime_session) is token:
+                        del self._plans[anime_session]
+
+    def _watch_remote_cancel(self, anime_session: str, token: CancelToken, planned_at: float,
+                             finished: threading.Event):
+        """Bricht den laufenden Plan ab, sobald ein Worker nach planned_at den Abbruch signalisiert hat."""
+        while True:
+            try:
+                if signal_raised_at(_cancel_signal(anime_session)) >= planned_at:
+                    with self._lock:
+                        if self._plans.get(anime_session) is token:
+                            del self._plans[anime_session]
+                    if not token.cancelled:
+                        token.cancel()
+                        self.cancelled += 1
+                        logger.debug("Prefetch fuer %s von einem anderen Worker abgebrochen", anime_session)
+                    return
+            except sqlite3.Error as e:
+                logger.debug("Prefetch-Abbruchsignal nicht lesbar: %s", e)
+            if finished.wait(self.cancel_poll_sec):
+                return
+
+    def _run_plan(self, anime_session: str, after_episode: Optional[str], token: CancelToken):
+        # Auch die Episodenliste kann mehrere Upstream-Seiten kosten
+        if not self._wait_for_budget(token, consume=False):
+            return
+        episodes = run_with(token, self.episode_lister, {"source": "pahe", "session": anime_session})
+        sessions = [ep.get("session") for ep in episodes if ep.get("session")]
+        start = sessions.index(after_episode) + 1 if after_episode in sessions else 0
+        for episode_session in sessions[start:start + self.lookahead]:
+            if self.peek(anime_session, episode_session):
+                continue
+            if not self._wait_for_budget(token):
+                return
+            m3u8_url = run_with(token, self.resolver, anime_session, episode_session)
+            self._store(anime_session, episode_session, m3u8_url)
+            self.prefetched += 1
+            logger.info(f"Stream-URL vorab aufgeloest: {anime_session}/{episode_session}")
+
+    def _wait_for_budget(self, token: CancelToken, max_wait_sec: float = 60, consume: bool = True) -> bool:
+        """
+        Wartet, bis das eigene Budget (max_per_minute) und das Upstream-Rate-Limit Luft haben
+        und weniger als max_foreground_flights Crawler-Aufrufe laufen.
+        Args:
+            consume: Ob ein Aufloesen vom Minuten-Budget abgezogen wird.
+        Returns:
+            bool: False, wenn der Plan abgebrochen wurde oder die Wartezeit ablief.
+        """
+        deadline = time.time() + max_wait_sec
+        while not token.cancelled:
+            now = time.time()
+            while self._recent_resolves and now - self._recent_resolves[0] > 60:
+                self._recent_resolves.popleft()
+            if (len(self._recent_resolves) < self.max_per_minute and self.limiter.idle()
+                    and crawler_flights.stats()["in_flight"] < self.max_foreground_flights):
+                if consume:
+                    self._recent_resolves.append(now)
+                return True
+            if now > deadline:
+                logger.debug("Prefetch uebersprungen: kein Budget frei")
+                return False
+            token.wait(0.5)
+        return False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "resolved": len(self._resolved),
+                "hits": self.hits,
+                "prefetched": self.prefetched,
+                "cancelled": self.cancelled,
+                "pending_plans": len(self._plans)
+            }
+
+
+def _cancel_signal(anime_session: str) -> str:
+    return f"prefetch_cancel:{anime_session}"
+
+
+# Globale Instanz
+stream_prefetcher = StreamPrefetcher()
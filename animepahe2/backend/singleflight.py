@@ -0,0 +1,142 @@
+# backend/singleflight.py
+"""
+Single-Flight-Schicht fuer Upstream-Aufrufe des Crawlers.
+Gleichzeitige, identische Aufrufe (gleiche Operation + gleiche Argumente) teilen sich
+einen einzigen laufenden Aufruf und dessen Ergebnis bzw. Exception.
+Der gemeinsame Aufruf laeuft mit einem eigenen Abbruch-Token: er wird erst abgebrochen, wenn
+alle wartenden Aufrufer abgebrochen haben (ein Aufrufer ohne Token wartet immer auf das Ergebnis).
+Ein abgebrochener Aufruf wird sofort aus der Tabelle genommen; wer danach kommt, startet neu.
+"""
+import copy
+import functools
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .cancellation import CancelToken, CancelledByClient, current_token, run_with
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(value: Any) -> Hashable:
+    """Wandelt Argumente (dicts, Listen) rekursiv in einen hashbaren Schluessel um."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class _Call:
+    """Ein laufender Aufruf, auf den weitere Aufrufer warten koennen."""
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.token = CancelToken()
+        self.waiters = 0            # Aufrufer mit eigenem Abbruch-Token, die noch warten
+        self.cancellable = True     # False, sobald ein Aufrufer ohne Token dabei ist
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.coalesced_by_op: Dict[str, int] = {}
+        self.cancelled = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """
+        Fuehrt fn aus oder schliesst sich einem bereits laufenden Aufruf mit demselben Schluessel an.
+        Jeder Aufrufer bekommt eine eigene Kopie des Ergebnisses, da Aufrufer die
+        zurueckgegebenen dicts/Listen haeufig veraendern.
+        Raises:
+            CancelledByClient: Wenn der eigene Aufrufer abgebrochen wurde.
+        """
+        own_token = current_token()
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(key)
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+                op = key[0] if isinstance(key, tuple) and key else str(key)
+                self.coalesced_by_op[op] = self.coalesced_by_op.get(op, 0) + 1
+            if own_token is None:
+                call.cancellable = False
+            else:
+                call.waiters += 1
+        unregister = own_token.on_cancel(lambda: self._leave(call)) if own_token else None
+
+        try:
+            if not leader:
+                logger.debug("Single-Flight: schliesse mich laufendem Aufruf an: %s", key)
+                while not call.done.wait(0.25):
+                    if own_token is not None and own_token.cancelled:
+                        raise CancelledByClient("Client getrennt, Warten auf laufenden Aufruf abgebrochen")
+            else:
+                try:
+                    call.result = run_with(call.token, fn, *args, **kwargs)
+                except BaseException as e:
+                    call.error = e
+                finally:
+                    with self._lock:
+                        # Nach einem Abbruch kann unter dem Schluessel bereits ein neuer Aufruf laufen
+                        if self._calls.get(key) is call:
+                            del self._calls[key]
+                    call.done.set()
+        finally:
+            if unregister:
+                unregister()
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def _leave(self, call: _Call):
+        """Ein Aufrufer wurde abgebrochen; war er der letzte, wird auch der gemeinsame Aufruf abgebrochen."""
+        with self._lock:
+            call.waiters -= 1
+            cancel = call.cancellable and call.waiters == 0 and not call.done.is_set()
+            if cancel:
+                self.cancelled += 1
+                # Neue Aufrufer duerfen sich dem abgebrochenen Aufruf nicht mehr anschliessen
+                if self._calls.get(call.key) is call:
+                    del self._calls[call.key]
+        if cancel:
+            call.token.cancel()
+
+    def stats(self) -> Dict:
+        """Liefert Zaehler fuer Metriken (Aufrufe, zusammengefasste Aufrufe, aktuell laufende)."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "coalesced_by_op": dict(self.coalesced_by_op),
+                "cancelled": self.cancelled,
+                "in_flight": len(self._calls)
+            }
+
+
+# Globale Instanz fuer alle Crawler-Methoden
+crawler_flights = SingleFlight()
+
+
+def coalesced(op: str):
+    """
+    Dekorator fuer Crawler-Methoden: gleichzeitige Aufrufe mit gleichen Argumenten
+    werden ueber crawler_flights zusammengefasst. Der Schluessel ist (op, Argumente).
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key = (op, _freeze(args), _freeze(kwargs))
+            return crawler_flights.do(key, fn, self, *args, **kwargs)
+        return wrapper
+    return decorator
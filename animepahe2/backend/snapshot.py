@@ -0,0 +1,232 @@
+# backend/snapshot.py
+"""
+Export/Import des Katalogs als komprimierter, versionierter Snapshot fuer schnelle Warmstarts.
+Format: gzip-komprimierte JSON-Lines. Die erste Zeile ist ein Header (Format, Version, Inhalt),
+danach folgen Datensaetze ('anime', optional 'http_cache' fuer Episodenlisten und 'thumbnail'),
+zuletzt ein Footer mit den Anzahlen. Fehlt der Footer, gilt der Snapshot als unvollstaendig.
+
+CLI (im Verzeichnis animepahe2 ausfuehren):
+    python -m backend.snapshot export catalog.snap.gz [--episodes] [--thumbnails]
+    python -m backend.snapshot import catalog.snap.gz [--merge]
+"""
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterator
+
+from .config import CONFIG
+from .database import anime_cache_db, AnimeCacheDB, ShadowInUseError
+from .http_cache import HttpCache, http_cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "animepahe2-catalog"
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(ValueError):
+    """Snapshot ist beschaedigt, unvollstaendig oder hat ein unbekanntes Format/eine neuere Version."""
+
+
+def _records(db: AnimeCacheDB, include_episodes: bool, include_thumbnails: bool) -> Iterator[Dict]:
+    yield {
+        "kind": "header",
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "includes": {"episodes": include_episodes, "thumbnails": include_thumbnails}
+    }
+    counts = {"anime": 0, "http_cache": 0, "thumbnail": 0}
+    for row in db.iter_rows():
+        counts["anime"] += 1
+        yield {"kind": "anime", "row": row}
+    if include_episodes:
+        # Episodenlisten liegen nicht in SQLite, sondern als m=release-Antworten im HTTP-Cache
+        for key, meta, body in http_cache.iter_entries("release"):
+            counts["http_cache"] += 1
+            yield {"kind": "http_cache", "key": key, "meta": meta, "body": base64.b64encode(body).decode("ascii")}
+    if include_thumbnails:
+        cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+        with os.scandir(cache_dir) as entries:
+            for entry in sorted((e for e in entries if e.is_file()), key=lambda e: e.name):
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+                counts["thumbnail"] += 1
+                yield {"kind": "thumbnail", "name": entry.name, "data": base64.b64encode(data).decode("ascii")}
+    yield {"kind": "footer", "counts": counts}
+
+
+def export_snapshot(include_episodes: bool = False, include_thumbnails: bool = False,
+                    db: AnimeCacheDB = anime_cache_db, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    """
+    Erzeugt den Snapshot als Strom gzip-komprimierter Bytes (fuer Dateien und StreamingResponse).
+    Es wird nie der ganze Katalog im Speicher gehalten.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip-Container
+    pending = []
+    pending_size = 0
+    for record in _records(db, include_episodes, include_thumbnails):
+        data = compressor.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= chunk_size:
+            yield b"".join(pending)
+            pending, pending_size = [], 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+
+def _read_records(fileobj: BinaryIO) -> Iterator[Dict]:
+    """Liest die Datensaetze eines Snapshots und prueft Header-Format und Version."""
+    try:
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as stream:
+            for line_no, line in enumerate(stream, start=1):
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise SnapshotError(f"Snapshot beschaedigt: Zeile {line_no} ist kein Datensatz.")
+                if line_no == 1:
+                    if record.get("kind") != "header" or record.get("format") != SNAPSHOT_FORMAT:
+                        raise SnapshotError("Kein Katalog-Snapshot (Header fehlt).")
+                    if record.get("version", 0) > SNAPSHOT_VERSION:
+                        raise SnapshotError(f"Snapshot-Version {record.get('version')} wird nicht unterstuetzt "
+                                            f"(maximal {SNAPSHOT_VERSION}).")
+                yield record
+    except (OSError, EOFError, ValueError) as e:
+        if isinstance(e, SnapshotError):
+            raise
+        raise SnapshotError(f"Snapshot beschaedigt: {e}") from e
+
+
+def _publish(staged_dir: str, target_dir: str):
+    """Verschiebt alle bereitgelegten Dateien in das Zielverzeichnis (vorhandene werden ersetzt)."""
+    os.makedirs(target_dir, exist_ok=True)
+    # Sortiert: beim HTTP-Cache landet der Body (.body) vor den Metadaten (.json), die den Eintrag gueltig machen
+    for name in sorted(os.listdir(staged_dir)):
+        source, target = os.path.join(staged_dir, name), os.path.join(target_dir, name)
+        try:
+            os.replace(source, target)
+        except OSError:
+            shutil.copyfile(source, target)  # Staging-Verzeichnis auf einem anderen Dateisystem
+
+
+def import_snapshot(fileobj: BinaryIO, replace: bool = True, db: AnimeCacheDB = anime_cache_db) -> Dict[str, int]:
+    """
+    Laedt einen Snapshot per AnimeCacheDB.bulk_load (eine Transaktion, Indizes danach).
+    Beim Ersetzen wird in eine Schatten-Datenbank geladen und diese danach atomar uebernommen,
+    die Live-Datenbank liefert bis dahin unveraendert aus.
+    Episodenlisten und Thumbnails werden in einem temporaeren Verzeichnis bereitgelegt und erst
+    nach erfolgreichem Laden des Katalogs in HTTP-Cache bzw. Bild-Cache verschoben.
+    Args:
+        replace (bool): True ersetzt den Katalog, False fuehrt mit dem bestehenden zusammen.
+    Returns:
+        Dict[str, int]: Anzahl importierter 'anime', 'http_cache' und 'thumbnail' Datensaetze.
+    Raises:
+        SnapshotError: Bei ungueltigem oder unvollstaendigem Snapshot (der Katalog bleibt dann unveraendert).
+        ShadowInUseError: Wenn gerade ein Neuaufbau oder ein anderer Import laeuft.
+    """
+    if not replace and db.shadow_active:
+        # Zusammengefuehrte Zeilen gingen beim Austausch der Schatten-Datenbank verloren
+        raise ShadowInUseError("Neuaufbau oder Snapshot-Import laeuft bereits")
+    counts = {"anime": 0, "http_cache": 0, "thumbnail": 0}
+    cache_dir = CONFIG.get("IMAGE_CACHE_DIR", "cached_images")
+    # Neben den Zielverzeichnissen anlegen, damit os.replace beim Uebernehmen nur umbenennt
+    staging_dir = tempfile.mkdtemp(prefix=".snapshot-import-", dir=os.path.dirname(os.path.abspath(cache_dir)))
+    staged_thumbnails = os.path.join(staging_dir, "thumbnails")
+    staged_http_cache = HttpCache(cache_dir=os.path.join(staging_dir, "http_cache"), freshness={})
+    os.makedirs(staged_thumbnails)
+
+    def _stage(kind: str, record: Dict):
+        if kind == "http_cache":
+            staged_http_cache.import_entry(record["key"], record["meta"], base64.b64decode(record["body"]))
+            counts["http_cache"] += 1
+        elif kind == "thumbnail":
+            name = os.path.basename(record["name"])
+            if name != record["name"] or name.startswith("."):
+                raise SnapshotError(f"Ungueltiger Thumbnail-Name: {record['name']!r}")
+            with open(os.path.join(staged_thumbnails, name), "wb") as f:
+                f.write(base64.b64decode(record["data"]))
+            counts["thumbnail"] += 1
+
+    def _anime_rows():
+        footer = None
+        for record in _read_records(fileobj):
+            kind = record.get("kind")
+            try:
+                if kind == "anime":
+                    row = record["row"]
+                    if not isinstance(row, dict):
+                        raise SnapshotError("Anime-Datensatz ohne Zeile.")
+                    counts["anime"] += 1
+                    yield row
+                elif kind in ("http_cache", "thumbnail"):
+                    _stage(kind, record)
+                elif kind == "footer":
+                    footer = record
+            except SnapshotError:
+                raise
+            except (KeyError, ValueError, TypeError) as e:
+                # Fehlende Felder, ungueltiges Base64 oder ungueltige Cache-Schluessel
+                raise SnapshotError(f"Ungueltiger '{kind}'-Datensatz: {e!r}") from e
+        if footer is None:
+            raise SnapshotError("Snapshot unvollstaendig (Footer fehlt).")
+        if footer.get("counts", {}).get("anime") != counts["anime"]:
+            raise SnapshotError(f"Snapshot unvollstaendig ({counts['anime']} von "
+                                f"{footer.get('counts', {}).get('anime')} Anime-Datensaetzen).")
+
+    try:
+        if replace:
+            shadow = db.create_shadow()
+            try:
+                shadow.bulk_load(_anime_rows())
+                db.swap_in(shadow, keep_cached_at=False)
+            except BaseException:
+                db.discard_shadow()
+                raise
+        else:
+            db.bulk_load(_anime_rows(), replace=False)
+        # Erst jetzt ist der Snapshot vollstaendig geprueft und der Katalog uebernommen
+        _publish(staged_http_cache.cache_dir, http_cache.cache_dir)
+        _publish(staged_thumbnails, cache_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    logger.info(f"Snapshot importiert: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Katalog-Snapshot exportieren oder importieren")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Snapshot schreiben")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--episodes", action="store_true", help="Gecachte Episodenlisten einschliessen")
+    export_parser.add_argument("--thumbnails", action="store_true", help="Bild-Cache einschliessen")
+    import_parser = subparsers.add_parser("import", help="Snapshot laden")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--merge", action="store_true", help="Mit dem bestehenden Katalog zusammenfuehren")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, CONFIG["LOGGING_LEVEL"]))
+    started = time.time()
+    if args.command == "export":
+        tmp_path = f"{args.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in export_snapshot(args.episodes, args.thumbnails):
+                f.write(chunk)
+        os.replace(tmp_path, args.path)
+        logger.info(f"Snapshot geschrieben: {args.path} ({os.path.getsize(args.path)} Bytes, {time.time() - started:.1f}s)")
+    else:
+        with open(args.path, "rb") as f:
+            counts = import_snapshot(f, replace=not args.merge)
+        logger.info(f"Import von {args.path} fertig in {time.time() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
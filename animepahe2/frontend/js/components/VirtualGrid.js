@@ -0,0 +1,180 @@
+// js/components/VirtualGrid.js
+// Virtualisiertes Karten-Raster: Es werden nur die sichtbaren Zeilen (plus etwas Vorlauf) als
+// DOM-Knoten gerendert. Karten sind dem Index ihres Eintrags zugeordnet: Beim Scrollen werden nur
+// Karten, die den Bereich verlassen, fuer neu sichtbare Eintraege wiederverwendet; Karten, die
+// sichtbar bleiben, werden nicht neu belegt und behalten ihr Bild.
+// Das CSS-Grid des Containers bleibt fuer das Layout zustaendig; Zeilen oberhalb/unterhalb
+// des sichtbaren Bereichs werden durch Padding ersetzt.
+
+export class VirtualGrid {
+    /**
+     * @param {HTMLElement} container  Element mit display: grid (z. B. #anime-grid)
+     * @param {HTMLElement} scrollElement  Scrollendes Element (z. B. #content-area)
+     * @param {Function} createCard  () => HTMLElement, erzeugt eine leere Karte
+     * @param {Function} bindCard  (card, item) => void, belegt eine Karte mit Daten
+     * @param {number} overscanRows  Zusaetzlich gerenderte Zeilen ober- und unterhalb
+     */
+    constructor({ container, scrollElement, createCard, bindCard, overscanRows = 2 }) {
+        this.container = container;
+        this.scrollElement = scrollElement;
+        this.createCard = createCard;
+        this.bindCard = bindCard;
+        this.overscanRows = overscanRows;
+        this.items = [];
+        this.active = new Map();   // Index des Eintrags -> gerenderte Karte
+        this.spare = [];           // freie, wiederverwendbare Karten-Knoten
+        this.columns = 1;
+        this.rowHeight = 0;
+        this.range = { start: 0, end: 0 };
+        this.framePending = false;
+
+        this.onScroll = () => this.scheduleRender();
+        this.scrollElement.addEventListener('scroll', this.onScroll, { passive: true });
+        if (typeof ResizeObserver !== 'undefined') {
+            // Spaltenzahl und Zeilenhoehe haengen von der Breite ab
+            this.resizeObserver = new ResizeObserver(() => {
+                this.rowHeight = 0;
+                this.scheduleRender();
+            });
+            this.resizeObserver.observe(this.scrollElement);
+            // Auch das Raster selbst: wird die Ansicht wieder eingeblendet, aendert sich seine Groesse
+            this.resizeObserver.observe(this.container);
+        }
+    }
+
+    setItems(items) {
+        this.items = Array.isArray(items) ? items : [];
+        // Andere Inhalte (Platzhalter, Fehlermeldungen) entfernen; die Karten bleiben ihrem Index
+        // zugeordnet und werden nur neu belegt, wenn sich der Eintrag dort geaendert hat
+        this.container.replaceChildren();
+        this.range = { start: 0, end: 0 };
+        this.render(true);
+    }
+
+    scheduleRender() {
+        if (this.framePending) return;
+        this.framePending = true;
+        requestAnimationFrame(() => {
+            this.framePending = false;
+            this.render(false);
+        });
+    }
+
+    measure() {
+        const style = window.getComputedStyle(this.container);
+        const columns = style.gridTemplateColumns.split(' ').filter(Boolean).length;
+        this.columns = Math.max(1, columns);
+        const first = this.container.firstElementChild;
+        if (first && first.offsetHeight > 0) {
+            this.rowHeight = first.offsetHeight + (parseFloat(style.rowGap) || 0);
+        }
+    }
+
+    visibleRange() {
+        const total = this.items.length;
+        if (!this.rowHeight) {
+            // Noch nicht gemessen (z. B. Ansicht verborgen): die ersten Zeilen rendern
+            return { start: 0, end: Math.min(total, this.columns * (4 + this.overscanRows)) };
+        }
+        const containerTop = this.container.getBoundingClientRect().top
+            - this.scrollElement.getBoundingClientRect().top + this.scrollElement.scrollTop;
+        const viewTop = this.scrollElement.scrollTop - containerTop;
+        const viewBottom = viewTop + this.scrollElement.clientHeight;
+        const firstRow = Math.max(0, Math.floor(viewTop / this.rowHeight) - this.overscanRows);
+        const lastRow = Math.ceil(viewBottom / this.rowHeight) + this.overscanRows;
+        return {
+            start: Math.min(total, firstRow * this.columns),
+            end: Math.min(total, Math.max(0, lastRow) * this.columns)
+        };
+    }
+
+    render(force) {
+        if (!this.container.getClientRects().length) {
+            // Ansicht verborgen: nichts messen, beim naechsten Einblenden vollstaendig rendern
+            this.range = { start: -1, end: -1 };
+            return;
+        }
+        if (!this.rowHeight || force) this.measure();
+        const { start, end } = this.visibleRange();
+        if (!force && start === this.range.start && end === this.range.end) return;
+        this.range = { start, end };
+
+        // Karten, deren Eintrag den Bereich verlassen hat, aus dem DOM nehmen und freigeben
+        for (const [index, card] of this.active) {
+            if (index < start || index >= end) {
+                if (card.parentNode === this.container) card.remove();
+                this.active.delete(index);
+                this.spare.push(card);
+            }
+        }
+        for (let index = start; index < end; index++) {
+            let card = this.active.get(index);
+            if (!card) {
+                card = this.spare.pop() || this.createCard();
+                this.active.set(index, card);
+            }
+            const item = this.items[index];
+            if (card._item !== item) {
+                this.bindCard(card, item);
+                card._item = item;
+            }
+            const position = index - start;
+            if (this.container.children[position] !== card) {
+                this.container.insertBefore(card, this.container.children[position] || null);
+            }
+        }
+
+        const totalRows = Math.ceil(this.items.length / this.columns);
+        const startRow = Math.floor(start / this.columns);
+        const endRow = Math.ceil(end / this.columns);
+        this.container.style.paddingTop = `${startRow * this.rowHeight}px`;
+        this.container.style.paddingBottom = `${Math.max(0, totalRows - endRow) * this.rowHeight}px`;
+
+        // Erste Messung nach dem ersten Rendern nachholen
+        if (!this.rowHeight && end > start) {
+            this.measure();
+            if (this.rowHeight) this.scheduleRender();
+        }
+    }
+
+    clear() {
+        // Der Aufrufer ersetzt den Inhalt des Containers; alle Karten werden frei
+        this.active.forEach(card => this.spare.push(card));
+        this.active.clear();
+        this.items = [];
+        this.range = { start: 0, end: 0 };
+        this.container.style.paddingTop = '';
+        this.container.style.paddingBottom = '';
+    }
+}
+
+// Laedt Thumbnails erst, wenn ihre Karte in die Naehe des sichtbaren Bereichs kommt.
+// Sichtbare Karten laden mit hoher Prioritaet, der Vorlauf mit niedriger.
+export class LazyImageLoader {
+    constructor(root, rootMargin = '300px 0px') {
+        this.root = root;
+        this.observer = new IntersectionObserver(entries => this.onIntersect(entries), { root, rootMargin });
+    }
+
+    // Setzt das Bild auf den Platzhalter und merkt sich die eigentliche Quelle
+    load(img, src, placeholder) {
+        if (img.dataset.src === src && img.src) return;
+        img.dataset.src = src || '';
+        img.src = placeholder;
+        this.observer.unobserve(img);
+        if (src) this.observer.observe(img);
+    }
+
+    onIntersect(entries) {
+        const rootRect = this.root ? this.root.getBoundingClientRect() : null;
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            const img = entry.target;
+            this.observer.unobserve(img);
+            const rect = entry.boundingClientRect;
+            const visible = !rootRect || (rect.bottom > rootRect.top && rect.top < rootRect.bottom);
+            img.fetchPriority = visible ? 'high' : 'low';
+            if (img.dataset.src) img.src = img.dataset.src;
+        });
+    }
+}
@@ -0,0 +1,158 @@
+// Service Worker: lokaler Cache fuer Thumbnails und API-Lesezugriffe.
+// - Thumbnails (/cached_images/...): cache-first, die Dateinamen aendern sich nie
+// - API-GETs (Katalog, Suche, Filter, Details): stale-while-revalidate; innerhalb von
+//   API_FRESH_MS ganz ohne Server-Anfrage
+// - Invalidierung ueber die Katalog-Generation des Backends (/api/catalog/generation):
+//   aendert sie sich, wird der API-Cache verworfen
+// Cache-Namen sind versioniert; alte Versionen werden beim Aktivieren geloescht.
+
+const CACHE_VERSION = 'v1';
+const CACHE_PREFIX = 'animepahe-';
+const IMAGE_CACHE = `${CACHE_PREFIX}images-${CACHE_VERSION}`;
+const API_CACHE = `${CACHE_PREFIX}api-${CACHE_VERSION}`;
+const META_CACHE = `${CACHE_PREFIX}meta-${CACHE_VERSION}`;
+
+const IMAGE_CACHE_MAX_ENTRIES = 1500;
+const API_CACHE_MAX_ENTRIES = 300;
+const API_FRESH_MS = 60 * 1000;               // So lange gilt eine API-Antwort ohne Revalidierung
+const GENERATION_CHECK_MS = 30 * 1000;        // Mindestabstand zwischen zwei Generations-Abfragen
+
+const GENERATION_URL = '/api/catalog/generation';
+const GENERATION_KEY = '/__sw/generation';
+const CACHED_AT_HEADER = 'sw-cached-at';
+
+// Nur diese Lesezugriffe werden gecacht (keine Streams, Player, Metriken, Einstellungen)
+const CACHEABLE_API = [
+    /^\/api\/filters$/,
+    /^\/api\/facets$/,
+    /^\/api\/search$/,
+    /^\/api\/suggestions$/,
+    /^\/api\/anime\/all$/,
+    /^\/api\/anime\/(?!batch$)[^/]+$/,
+    /^\/api\/anime\/[^/]+\/episodes$/
+];
+
+let lastGenerationCheck = 0;
+let generationCheck = null;
+
+self.addEventListener('install', () => {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        const current = new Set([IMAGE_CACHE, API_CACHE, META_CACHE]);
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith(CACHE_PREFIX) && !current.has(name))
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+        await checkGeneration(true);
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (url.pathname.startsWith('/cached_images/')) {
+        event.respondWith(cacheFirst(request));
+    } else if (CACHEABLE_API.some(pattern => pattern.test(url.pathname))) {
+        event.respondWith(staleWhileRevalidate(event, request));
+    }
+});
+
+// Die Seite kann eine Pruefung anstossen (z. B. nach "Cache leeren")
+self.addEventListener('message', (event) => {
+    if (event.data && event.data.type === 'check-generation') {
+        event.waitUntil(checkGeneration(true));
+    }
+});
+
+async function cacheFirst(request) {
+    const cache = await caches.open(IMAGE_CACHE);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+        trimCache(IMAGE_CACHE, IMAGE_CACHE_MAX_ENTRIES);
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event, request) {
+    // Generationspruefung laeuft im Hintergrund (gedrosselt); ein veralteter Stand wird so
+    // hoechstens einmal ausgeliefert und danach verworfen
+    event.waitUntil(checkGeneration(false));
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(request);
+
+    if (cached) {
+        const cachedAt = Number(cached.headers.get(CACHED_AT_HEADER) || 0);
+        if (Date.now() - cachedAt > API_FRESH_MS) {
+            event.waitUntil(revalidate(cache, request).catch(() => null));
+        }
+        return cached;
+    }
+    try {
+        return await revalidate(cache, request);
+    } catch (error) {
+        return new Response(JSON.stringify({ detail: 'Offline und nicht im Cache' }), {
+            status: 503,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+async function revalidate(cache, request) {
+    const response = await fetch(request);
+    if (response.ok) {
+        // Zeitstempel als Header mitspeichern, um die Frische zu pruefen
+        const headers = new Headers(response.headers);
+        headers.set(CACHED_AT_HEADER, String(Date.now()));
+        const body = await response.clone().blob();
+        await cache.put(request, new Response(body, { status: response.status, statusText: response.statusText, headers }));
+        trimCache(API_CACHE, API_CACHE_MAX_ENTRIES);
+    }
+    return response;
+}
+
+// Vergleicht die Katalog-Generation des Backends mit der gespeicherten und verwirft bei
+// Abweichung den API-Cache. Gleichzeitige Aufrufer teilen sich eine Anfrage.
+function checkGeneration(force) {
+    if (generationCheck) return generationCheck;
+    if (!force && Date.now() - lastGenerationCheck < GENERATION_CHECK_MS) return Promise.resolve();
+    lastGenerationCheck = Date.now();
+    generationCheck = (async () => {
+        try {
+            const response = await fetch(GENERATION_URL, { cache: 'no-store' });
+            if (!response.ok) return;
+            const { generation } = await response.json();
+            const meta = await caches.open(META_CACHE);
+            const stored = await meta.match(GENERATION_KEY);
+            const previous = stored ? (await stored.json()).generation : null;
+            if (previous !== generation) {
+                await caches.delete(API_CACHE);
+                await meta.put(GENERATION_KEY, new Response(JSON.stringify({ generation })));
+            }
+        } catch (error) {
+            // Offline: vorhandenen Cache weiter verwenden
+        } finally {
+            generationCheck = null;
+        }
+    })();
+    return generationCheck;
+}
+
+// Haelt den Cache unter maxEntries; die aeltesten Eintraege (Einfuegereihenfolge) fliegen zuerst
+async function trimCache(name, maxEntries) {
+    const cache = await caches.open(name);
+    const keys = await cache.keys();
+    const excess = keys.length - maxEntries;
+    for (let i = 0; i < excess; i++) {
+        await cache.delete(keys[i]);
+    }
+}
@@ -0,0 +1,11 @@
+# loadtest/__init__.py
+"""
+Lasttest-Harness fuer das Backend, ohne die echte AnimePahe-Seite zu belasten.
+- recordings.py: aufgezeichnete (oder synthetische) Upstream-Antworten
+- stub_upstream.py: lokaler Stub-Server, der sie mit einstellbarer Latenz und Fehlerquote abspielt
+- serve_backend.py: startet das Backend gegen den Stub in einem eigenen Arbeitsverzeichnis
+- workloads.py: skriptierte Nutzerablaeufe (stoebern, suchen, Details, Streams)
+- run.py: fuehrt alles zusammen und vergleicht p50/p95/p99, Durchsatz und Fehlerquote mit baselines.json
+
+Aufruf aus dem Verzeichnis animepahe2:  python -m loadtest.run --help
+"""
@@ -0,0 +1,257 @@
+# loadtest/recordings.py
+"""
+Aufgezeichnete Upstream-Antworten fuer den Stub. Eine Aufzeichnung ist eine JSON-Lines-Datei,
+eine Antwort pro Zeile:
+    {"key": "/anime/abc", "status": 200, "content_type": "text/html", "body_b64": "..."}
+Der Schluessel ist der Pfad, bei /api zusaetzlich die sortierten Query-Parameter (siehe
+request_key); kwik-Seiten liegen unter /kwik/..., HLS-Playlists und Segmente des Stream-CDNs
+unter /cdn/... Absolute URLs von AnimePahe, kwik und dem
+Bild-Host und CDN werden beim Abspielen auf den Stub umgeschrieben (UPSTREAM_HOSTS), damit der Crawler
+alle Folgeaufrufe ebenfalls an den Stub schickt. AniList-Treffer liegen als Media-Objekt (JSON)
+unter anilist_key(Titel); der Stub beantwortet daraus die gebuendelten GraphQL-Suchen.
+
+Aufzeichnungen entstehen entweder mit `record` (echte Seite, ueber den Crawler mit Cookies) oder
+synthetisch mit `synthesize` (reproduzierbar, Standard fuer CI).
+"""
+import base64
+import json
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Upstream-Origin -> Pfad-Praefix im Stub. kwik behaelt "kwik" im Pfad, sonst findet
+# parsers.parse_kwik_links die Links nicht mehr.
+UPSTREAM_HOSTS = {
+    "https://animepahe.ru": "",
+    "https://animepahe.com": "",
+    "https://i.animepahe.ru": "",
+    "https://kwik.si": "/kwik",
+    "https://kwik.cx": "/kwik",
+    "https://cdn.example.invalid": "/cdn",
+}
+# Query-Parameter, die fuer den Schluessel keine Rolle spielen
+_IGNORED_PARAMS = {"sort"}
+
+Response = Tuple[int, str, bytes]
+
+
+def request_key(path: str, query: str = "") -> str:
+    """Schluessel einer Anfrage: Pfad, bei /api mit sortierten Query-Parametern."""
+    path = path.rstrip("/") or "/"
+    if path != "/api":
+        return path
+    params = sorted((k, v.lower() if k == "q" else v) for k, v in parse_qsl(query) if k not in _IGNORED_PARAMS)
+    return f"{path}?{urlencode(params)}"
+
+
+def anilist_key(title: str) -> str:
+    """Schluessel des AniList-Treffers fuer einen Suchtitel."""
+    return "/anilist/" + " ".join(title.lower().split())
+
+
+def local_key(url: str) -> str:
+    """Schluessel einer absoluten Upstream-URL, so wie der Stub sie nach dem Umschreiben sieht."""
+    parsed = urlparse(url)
+    prefix = UPSTREAM_HOSTS.get(f"{parsed.scheme}://{parsed.netloc}", "")
+    return request_key(prefix + parsed.path, parsed.query)
+
+
+class Recording:
+    def __init__(self, responses: Optional[Dict[str, Response]] = None):
+        self.responses: Dict[str, Response] = responses or {}
+
+    def add(self, key: str, status: int, content_type: str, body):
+        self.responses[key] = (status, content_type, body.encode("utf-8") if isinstance(body, str) else body)
+
+    def get(self, key: str) -> Optional[Response]:
+        return self.responses.get(key)
+
+    def sessions(self) -> List[str]:
+        """Alle Anime-Sessions mit aufgezeichneter Detailseite."""
+        return sorted(k.split("/")[2] for k in self.responses if k.startswith("/anime/") and k.count("/") == 2)
+
+    def episodes(self, session: str) -> List[str]:
+        """Episoden-Sessions eines Anime aus der aufgezeichneten Release-Liste (erste Seite)."""
+        response = self.get(request_key("/api", urlencode({"m": "release", "id": session, "page": 1})))
+        if not response:
+            return []
+        return [ep["session"] for ep in json.loads(response[2]).get("data", [])]
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for key, (status, content_type, body) in sorted(self.responses.items()):
+                f.write(json.dumps({"key": key, "status": status, "content_type": content_type,
+                                    "body_b64": base64.b64encode(body).decode("ascii")}) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        recording = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recording.add(entry["key"], entry["status"], entry["content_type"], base64.b64decode(entry["body_b64"]))
+        return recording
+
+
+# ---------- Synthetische Aufzeichnung ----------
+_TYPES = ["TV", "TV", "TV", "Movie", "OVA", "ONA", "Special"]
+_GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance",
+           "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller"]
+_STUDIOS = ["Madhouse", "Bones", "MAPPA", "Sunrise", "Kyoto Animation", "Production I.G", "Wit Studio",
+            "Toei Animation", "A-1 Pictures", "Trigger"]
+_WORDS = ["Sword", "Star", "Blue", "Night", "Spirit", "Academy", "Dragon", "Moon", "Steel", "Garden",
+          "Ghost", "Summer", "Hero", "Light", "Shadow", "Ocean", "Crown", "Winter", "Signal", "Bloom"]
+_MONTHS = ["Jan", "Apr", "Jul", "Oct"]
+_TYPE_TO_FORMAT = {"TV": "TV", "Movie": "MOVIE", "OVA": "OVA", "ONA": "ONA", "Special": "SPECIAL"}
+HLS_SEGMENTS = 6
+HLS_SEGMENT_BYTES = 188 * 64                    # MPEG-TS-Pakete zu 188 Bytes
+HLS_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+
+
+def _poster_jpeg() -> bytes:
+    """Kleines gueltiges JPEG (cache_image oeffnet die Bilder mit PIL)."""
+    from io import BytesIO
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("RGB", (40, 60), (90, 120, 160)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _detail_page(title: str, anime_type: str, studio: str, year: int, month: str, genres: Iterable[str],
+                 poster: str) -> str:
+    genre_items = "".join(f"<li><a href=\"/anime/genre/{g.lower()}\">{g}</a></li>" for g in genres)
+    return f"""<!DOCTYPE html><html><head><title>{title} :: animepahe</title></head><body>
+<section class="main"><div class="anime-poster"><a href="{poster}"><img src="{poster}" alt="{title}"></a></div>
+<h1><span>{title}</span></h1>
+<div class="anime-synopsis">{title} ist eine synthetische Serie fuer den Lasttest.</div>
+<div class="anime-info">
+<p><strong>Type:</strong> <a href="/anime/type/{anime_type.lower()}">{anime_type}</a></p>
+<p><strong>Episodes:</strong> 12</p>
+<p><strong>Aired:</strong> {month} 1, {year} to ?</p>
+<p><strong>Studio:</strong> <a href="/anime/studio/{studio.lower()}">{studio}</a></p>
+</div>
+<div class="anime-genre"><ul>{genre_items}</ul></div>
+<div class="anime-relation"><p>Keine</p></div>
+<div class="anime-recommendation"><p>Keine</p></div>
+</section></body></html>"""
+
+
+def _add_hls_stream(recording: Recording, stream_path: str, segment: bytes):
+    """Master-Playlist mit einer Variante, deren Media-Playlist (relative URIs) und die Segmente."""
+    recording.add(f"{stream_path}/uwu.m3u8", 200, HLS_CONTENT_TYPE,
+                  "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1280x720\n720/index.m3u8\n")
+    entries = "".join(f"#EXTINF:4.000,\nseg-{n}.ts\n" for n in range(HLS_SEGMENTS))
+    recording.add(f"{stream_path}/720/index.m3u8", 200, HLS_CONTENT_TYPE,
+                  f"#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:4\n#EXT-X-MEDIA-SEQUENCE:0\n"
+                  f"{entries}#EXT-X-ENDLIST\n")
+    for n in range(HLS_SEGMENTS):
+        recording.add(f"{stream_path}/720/seg-{n}.ts", 200, "video/mp2t", segment)
+
+
+def _anilist_media(index: int, title: str, anime_type: str, studio: str, year: int, genres: Iterable[str]) -> Dict:
+    return {"id": 100000 + index, "idMal": 50000 + index, "format": _TYPE_TO_FORMAT[anime_type],
+            "season": "SPRING", "seasonYear": year, "genres": list(genres), "synonyms": [],
+            "title": {"romaji": title, "english": title, "native": None},
+            "studios": {"nodes": [{"name": studio}]}}
+
+
+def synthesize(count: int = 300, episodes: int = 12, seed: int = 7) -> Recording:
+    """
+    Reproduzierbarer Katalog mit `count` Anime inkl. Index, Suche, Episoden, Play-, kwik- und
+    Bildantworten, HLS-Streams sowie AniList-Treffern (jeder fuenfte Titel ohne Treffer).
+    Alle Segmente teilen sich denselben Inhalt, damit grosse Kataloge klein bleiben.
+    """
+    rng = random.Random(seed)
+    recording = Recording()
+    host = "https://animepahe.ru"
+    poster_bytes = _poster_jpeg()
+    segment_bytes = b"\x47" + bytes(HLS_SEGMENT_BYTES - 1)
+    index_links = []
+    catalog = []
+    for i in range(count):
+        session = f"{rng.getrandbits(64):016x}-{i}"
+        title = f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {i}"
+        anime_type = rng.choice(_TYPES)
+        studio = rng.choice(_STUDIOS)
+        year = rng.randint(1995, 2025)
+        genres = rng.sample(_GENRES, rng.randint(1, 3))
+        poster = f"https://i.animepahe.ru/posters/{session}.jpg"
+        catalog.append({"session": session, "title": title, "type": anime_type, "year": year,
+                        "status": "Finished Airing", "poster": poster, "episodes": episodes})
+        index_links.append(f"<a href=\"/anime/{session}\" title=\"{title}\">{title}</a>")
+        recording.add(f"/anime/{session}", 200, "text/html; charset=UTF-8",
+                      _detail_page(title, anime_type, studio, year, rng.choice(_MONTHS), genres, poster))
+        recording.add(f"/posters/{session}.jpg", 200, "image/jpeg", poster_bytes)
+        if i % 5 != 4:
+            recording.add(anilist_key(title), 200, "application/json",
+                          json.dumps(_anilist_media(i, title, anime_type, studio, year, genres)))
+
+        release = []
+        for number in range(1, episodes + 1):
+            episode_session = f"{session[:8]}{number:04d}{rng.getrandbits(32):08x}"
+            release.append({"id": i * 1000 + number, "anime_id": i, "episode": number, "title": "",
+                            "snapshot": f"https://i.animepahe.ru/snapshots/{episode_session}.jpg",
+                            "session": episode_session, "created_at": f"{year}-01-01 00:00:00"})
+            kwik_id = f"{rng.getrandbits(48):012x}"
+            recording.add(f"/play/{session}/{episode_session}", 200, "text/html; charset=UTF-8",
+                          f"<html><body><div class=\"theatre-info\"><h1>{title}</h1></div>"
+                          f"<div id=\"resolutionMenu\">"
+                          f"<button data-src=\"https://kwik.si/e/{kwik_id}\" data-resolution=\"1080\" data-audio=\"jpn\">1080p</button>"
+                          f"<button data-src=\"https://kwik.si/e/{kwik_id}7\" data-resolution=\"720\" data-audio=\"jpn\">720p</button>"
+                          f"</div></body></html>")
+            m3u8 = f"https://cdn.example.invalid/stream/{kwik_id}/uwu.m3u8"
+            _add_hls_stream(recording, f"/cdn/stream/{kwik_id}", segment_bytes)
+            for kwik_key in (f"/kwik/e/{kwik_id}", f"/kwik/e/{kwik_id}7"):
+                recording.add(kwik_key, 200, "text/html; charset=UTF-8",
+                              f"<html><body><script>var player;eval(function(){{var source='{m3u8}';"
+                              f"return source}}())</script></body></html>")
+        recording.add(request_key("/api", urlencode({"m": "release", "id": session, "page": 1})), 200,
+                      "application/json", json.dumps({"total": episodes, "per_page": 30, "current_page": 1,
+                                                      "last_page": 1, "data": release}))
+
+    recording.add("/anime", 200, "text/html; charset=UTF-8",
+                  "<html><body><div class=\"scrollable-ul\"><a href=\"#all\">All</a></div>"
+                  f"<div class=\"tab-content\"><div id=\"all\" class=\"tab-pane\">{''.join(index_links)}</div></div>"
+                  "</body></html>")
+    # Suche: ein Treffer-Set pro Wort
+    for word in _WORDS:
+        hits = [a for a in catalog if word.lower() in a["title"].lower()][:8]
+        recording.add(request_key("/api", urlencode({"m": "search", "q": word.lower()})), 200, "application/json",
+                      json.dumps({"total": len(hits), "data": hits}))
+    recording.add("/", 200, "text/html; charset=UTF-8", f"<html><body><a href=\"{host}/anime\">AnimePahe</a></body></html>")
+    return recording
+
+
+# ---------- Aufzeichnen von der echten Seite ----------
+def record(sessions: int = 20, episodes_per_anime: int = 2) -> Recording:
+    """
+    Zeichnet Index, `sessions` Detailseiten samt Poster, Episodenlisten, Play- und kwik-Seiten der
+    echten Seite auf. Braucht gueltige Cookies (Cookie-Jar) wie der Crawler selbst; Play-Seiten
+    werden ohne Browser geladen und enthalten daher nur die serverseitig gerenderten Links.
+    """
+    from backend.crawler import crawler
+    from backend.parsers import parse_details, parse_kwik_links
+
+    recording = Recording()
+
+    def _keep(url: str, params: Optional[dict] = None, **kwargs):
+        response = crawler.fetch(url, params=params, timeout=15, **kwargs)
+        recording.add(local_key(response.url), response.status_code,
+                      response.headers.get("Content-Type", "text/html"), response.content)
+        return response
+
+    _keep(f"{crawler.base_url}/anime")
+    for anime in crawler.get_all_anime()[:sessions]:
+        session = anime["session"]
+        page = _keep(f"{crawler.base_url}/anime/{session}")
+        poster = parse_details(page.content).get("thumbnail_url")
+        if poster:
+            _keep(poster, limiter=None)
+        release = _keep(crawler.api_url, params={"m": "release", "id": session, "sort": "episode_asc", "page": 1}).json()
+        for episode in release.get("data", [])[:episodes_per_anime]:
+            play = _keep(f"{crawler.base_url}/play/{session}/{episode['session']}")
+            for link in parse_kwik_links(play.content).values():
+                _keep(link["kwik"], headers={"Referer": crawler.base_url}, limiter=None, refresh_on_challenge=False)
+        _keep(crawler.api_url, params={"m": "search", "q": anime["title"].split()[0].lower()})
+    return recording
@@ -0,0 +1,245 @@
+# loadtest/run.py
+"""
+Lasttest: startet Stub-Upstream und Backend, laesst virtuelle Nutzer die Workloads abarbeiten und
+berichtet pro Route p50/p95/p99, Durchsatz und Fehlerquote. Mit gespeicherter Baseline
+(baselines.json) endet der Lauf mit Exit-Code 1, wenn eine Route schlechter ist als erlaubt.
+
+    cd animepahe2
+    python -m loadtest.run --users 16 --duration 30 --profile healthy
+    python -m loadtest.run --profile flaky --update-baseline
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from .recordings import Recording, synthesize
+from .stub_upstream import PROFILES, StubUpstream
+from .workloads import WORKLOADS, Recorder, Sample, VirtualUser
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Kleinere Abweichungen (in ms) gelten unabhaengig von der Toleranz nicht als Regression
+_MIN_LATENCY_DELTA_MS = 25.0
+_MAX_ERROR_RATE_DELTA = 0.01
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-Rank-Perzentil einer aufsteigend sortierten Liste."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Sample], duration: float) -> Dict:
+    """Kennzahlen pro Route und gesamt (Latenzen in ms, Durchsatz in Anfragen/s)."""
+    def _stats(group: List[Sample]) -> Dict:
+        latencies = sorted(s.latency * 1000 for s in group)
+        errors = sum(1 for s in group if not s.ok)
+        return {
+            "count": len(group),
+            "rps": round(len(group) / duration, 2) if duration else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+        }
+
+    routes: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        routes.setdefault(sample.route, []).append(sample)
+    return {"routes": {route: _stats(group) for route, group in sorted(routes.items())}, "total": _stats(samples)}
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Liste der Regressionen gegenueber der Baseline (leer = bestanden)."""
+    problems = []
+    for route, base in baseline.get("routes", {}).items():
+        current = result["routes"].get(route)
+        if current is None:
+            problems.append(f"{route}: keine Messwerte (Baseline hat {base['count']})")
+            continue
+        # p99 beruht auf wenigen Messwerten und streut staerker: doppelte Toleranz
+        for metric, factor in (("p95_ms", 1), ("p99_ms", 2)):
+            allowed = base[metric] * (1 + tolerance * factor)
+            if current[metric] > allowed and current[metric] - base[metric] > _MIN_LATENCY_DELTA_MS:
+                problems.append(f"{route}: {metric} {current[metric]} > {allowed:.1f} (Baseline {base[metric]})")
+        if current["error_rate"] > base["error_rate"] + _MAX_ERROR_RATE_DELTA:
+            problems.append(f"{route}: Fehlerquote {current['error_rate']:.2%} (Baseline {base['error_rate']:.2%})")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{route}: Durchsatz {current['rps']}/s < {base['rps'] * (1 - tolerance):.2f}/s "
+                            f"(Baseline {base['rps']}/s)")
+    return problems
+
+
+def print_report(name: str, result: Dict, baseline: Optional[Dict]):
+    header = f"{'Route':<32} {'n':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'Fehler':>7}"
+    print(f"\nLasttest {name}\n{header}\n{'-' * len(header)}")
+    rows = list(result["routes"].items()) + [("GESAMT", result["total"])]
+    for route, stats in rows:
+        line = (f"{route:<32} {stats['count']:>6} {stats['rps']:>7.2f} {stats['p50_ms']:>8.1f} "
+                f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>7.2%}")
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base:
+            line += f"   (Baseline p95 {base['p95_ms']:.1f}, p99 {base['p99_ms']:.1f})"
+        print(line)
+
+
+class BackendProcess:
+    """Backend als Unterprozess (serve_backend.py) in einem temporaeren Arbeitsverzeichnis."""
+
+    def __init__(self, upstream: str, overrides: List[str], keep_workdir: bool = False):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.workdir = tempfile.mkdtemp(prefix="animepahe-loadtest-")
+        self.keep_workdir = keep_workdir
+        command = [sys.executable, "-m", "loadtest.serve_backend", "--upstream", upstream,
+                   "--port", str(self.port), "--workdir", self.workdir]
+        for override in overrides:
+            command += ["--set", override]
+        self._log = open(os.path.join(self.workdir, "backend.log"), "w", encoding="utf-8")
+        self.process = subprocess.Popen(command, cwd=_PROJECT_DIR, stdout=self._log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout: float = 180):
+        """Wartet, bis die API antwortet und der Spalten-Katalog geladen ist (/api/facets liefert 200)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                self.keep_workdir = True
+                raise RuntimeError(f"Backend beendet (Code {self.process.returncode}), siehe {self._log.name}")
+            try:
+                if requests.get(f"{self.base_url}/api/facets", timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.keep_workdir = True
+        raise TimeoutError(f"Backend nach {timeout}s nicht bereit, siehe {self._log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+        if not self.keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def run_load(base_url: str, recording: Recording, workloads: List[str], users: int, duration: float,
+             warmup: float, think_time: float, seed: int) -> Dict:
+    """Laesst `users` virtuelle Nutzer die Workloads reihum ausfuehren; die Aufwaermphase zaehlt nicht mit."""
+    recorder = Recorder()
+    sessions = recording.sessions()
+    rng = random.Random(seed)
+    rng.shuffle(sessions)
+    episodes = {s: recording.episodes(s) for s in sessions}
+    stop_at = time.time() + warmup + duration
+    measure_from = time.perf_counter() + warmup
+
+    def _user(index: int):
+        user = VirtualUser(base_url, recorder, sessions, episodes, random.Random(seed + index), think_time)
+        names = workloads[index % len(workloads):] + workloads[:index % len(workloads)]
+        while time.time() < stop_at:
+            for name in names:
+                if time.time() >= stop_at:
+                    break
+                WORKLOADS[name](user)
+
+    threads = [threading.Thread(target=_user, args=(i,), name=f"vu-{i}", daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Nur Anfragen, die nach der Aufwaermphase begonnen haben
+    return summarize([s for s in recorder.samples if s.started >= measure_from], duration)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Lasttest gegen einen Stub-Upstream")
+    parser.add_argument("--workloads", default="browse,search,details",
+                        help=f"Kommagetrennt, verfuegbar: {', '.join(WORKLOADS)}")
+    parser.add_argument("--users", type=int, default=16, help="Gleichzeitige virtuelle Nutzer")
+    parser.add_argument("--duration", type=float, default=30, help="Messdauer in Sekunden")
+    parser.add_argument("--warmup", type=float, default=5, help="Aufwaermphase in Sekunden (nicht gemessen)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mittlere Pause zwischen Anfragen (s)")
+    parser.add_argument("--profile", default="healthy", choices=sorted(PROFILES), help="Latenz-/Fehlerprofil des Stubs")
+    parser.add_argument("--recording", help="JSON-Lines-Aufzeichnung (sonst synthetischer Katalog)")
+    parser.add_argument("--synthetic", type=int, default=300, help="Groesse des synthetischen Katalogs")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=JSON", help="CONFIG-Werte fuers Backend")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES)
+    parser.add_argument("--name", help="Name der Baseline (Standard: <profile>/<workloads>/<users>u)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Erlaubte relative Verschlechterung")
+    parser.add_argument("--update-baseline", action="store_true", help="Ergebnis als neue Baseline speichern")
+    parser.add_argument("--keep-workdir", action="store_true", help="Arbeitsverzeichnis des Backends behalten")
+    args = parser.parse_args()
+
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unbekannte Workloads: {', '.join(unknown)}")
+    name = args.name or f"{args.profile}/{'+'.join(workloads)}/{args.users}u"
+
+    recording = Recording.load(args.recording) if args.recording else synthesize(args.synthetic, seed=args.seed)
+    stub = StubUpstream(recording, PROFILES[args.profile], seed=args.seed).start()
+    backend = BackendProcess(stub.base_url, args.set, keep_workdir=args.keep_workdir)
+    try:
+        backend.wait_ready()
+        result = run_load(backend.base_url, recording, workloads, args.users, args.duration, args.warmup,
+                          args.think_time, args.seed)
+        result["upstream"] = dict(stub.counts)
+    finally:
+        backend.stop()
+        stub.stop()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    baseline = baselines.get(name)
+    print_report(name, result, baseline)
+    print(f"Upstream-Stub: {result['upstream']}")
+
+    if args.update_baseline:
+        baselines[name] = {"recorded_at": time.strftime("%Y-%m-%d"), "users": args.users,
+                           "duration_sec": args.duration, **result}
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline '{name}' gespeichert in {args.baselines}")
+        return 0
+    if baseline is None:
+        print(f"Keine Baseline '{name}' vorhanden (mit --update-baseline anlegen).")
+        return 0
+    problems = compare(result, baseline, args.tolerance)
+    if problems:
+        print("\nREGRESSION gegenueber der Baseline:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\nKeine Regression gegenueber der Baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# loadtest/serve_backend.py
+"""
+Startet das Backend gegen den Stub-Upstream. Laeuft als eigener Prozess im Arbeitsverzeichnis
+des Lasttests, damit Datenbanken, Caches und Cookie-Jar dort landen und nicht im Projekt.
+CONFIG wird vor dem Import der uebrigen Backend-Module angepasst (die Module lesen ihre
+Voreinstellungen beim Import). Der Katalog wird direkt aus dem Stub vorbefuellt, damit die
+Messung nicht auf den rate-limitierten CacheBuilder wartet.
+
+    python -m loadtest.serve_backend --upstream http://127.0.0.1:8765 --port 8000 --set PREFETCH_EPISODES=2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_override(text: str):
+    key, _, raw = text.partition("=")
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def _write_cookie_jar(path: str):
+    # Gueltiger Jar: der Crawler startet dann keinen Browser fuer Cloudflare-Cookies
+    now = time.time()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": now, "expires_at": now + 7 * 24 * 3600,
+                   "cookies": [{"name": "cf_clearance", "value": "loadtest", "domain": "127.0.0.1", "path": "/"}]}, f)
+
+
+def _get(url: str, attempts: int = 5):
+    """GET mit einfachen Wiederholungen; das Fehlerprofil des Stubs gilt auch beim Vorbefuellen."""
+    import requests
+    for attempt in range(attempts):
+        try:
+            response = requests.get(url, timeout=30)
+            if response.status_code < 400:
+                return response
+        except requests.RequestException:
+            pass
+        time.sleep(0.2 * (attempt + 1))
+    return None
+
+
+def _seed_catalog(upstream: str, workers: int = 8) -> int:
+    from backend.database import anime_cache_db
+    from backend.parsers import parse_anime_index, parse_details
+
+    index_response = _get(f"{upstream}/anime")
+    if index_response is None:
+        raise RuntimeError(f"Index {upstream}/anime nicht abrufbar")
+    index = parse_anime_index(index_response.content)
+
+    def _details(anime: dict):
+        response = _get(f"{upstream}/anime/{anime['session']}")
+        if response is None:
+            return None
+        parsed = parse_details(response.content)
+        return {
+            "title": parsed["title"], "synopsis": parsed["synopsis"], "info": parsed["synopsis"],
+            "relations": parsed["relations"], "recommendations": parsed["recommendations"],
+            "thumbnail": parsed["thumbnail_url"], "genre": parsed["genre"], "type": parsed["type"],
+            "studio": parsed["studio"], "season": parsed["season"], "year": parsed["year"],
+            "source": "pahe", "identifier": anime["session"], "session": anime["session"]
+        }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = [row for row in pool.map(_details, index) if row]
+    anime_cache_db.set_details_bulk(rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend gegen den Stub-Upstream starten")
+    parser.add_argument("--upstream", required=True, help="Basis-URL des Stub-Upstreams")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workdir", default=".", help="Arbeitsverzeichnis fuer Datenbanken und Caches")
+    parser.add_argument("--no-seed", action="store_true", help="Katalog nicht vorbefuellen (CacheBuilder fuellt ihn)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=JSON", help="Weitere CONFIG-Werte")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    sys.path.insert(0, _PROJECT_DIR)
+
+    from backend.config import CONFIG
+    CONFIG.update({
+        "ANIMEPAHE_BASE_URL": args.upstream.rstrip("/"),
+        "ANILIST_API_URL": f"{args.upstream.rstrip('/')}/graphql",
+        "ENRICHMENT_ENABLED": False,      # Stub beantwortet /graphql; mit --set ENRICHMENT_ENABLED=true messbar
+        "PREFETCH_EPISODES": 0,           # Hintergrund-Aufloesen verfaelscht die Messung der Episoden-Route
+        "LOGGING_LEVEL": "WARNING",
+    })
+    CONFIG.update(dict(_parse_override(item) for item in args.set))
+    os.makedirs(CONFIG["IMAGE_CACHE_DIR"], exist_ok=True)
+    _write_cookie_jar(CONFIG.get("COOKIE_JAR_PATH", "cookie_jar.json"))
+
+    if not args.no_seed:
+        started = time.time()
+        count = _seed_catalog(CONFIG["ANIMEPAHE_BASE_URL"])
+        print(f"Katalog vorbefuellt: {count} Anime in {time.time() - started:.1f}s", flush=True)
+
+    import uvicorn
+    from backend.main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# loadtest/stub_upstream.py
+"""
+Lokaler Stub fuer AnimePahe, kwik, den Bild-Host, das Stream-CDN (HLS-Playlists und Segmente)
+und die AniList-GraphQL-API (POST /graphql). Spielt eine Aufzeichnung (recordings.py) ab und
+injiziert dabei Latenz und Fehler nach einem FaultProfile. Unbekannte Pfade liefern 404.
+
+Eigenstaendig starten (z. B. um das Backend von Hand dagegen laufen zu lassen):
+    python -m loadtest.stub_upstream --port 8765 --synthetic 300 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from .recordings import UPSTREAM_HOSTS, Recording, anilist_key, request_key, synthesize
+
+logger = logging.getLogger(__name__)
+
+_TEXT_TYPES = ("text/", "application/json", "application/javascript")
+# Aliasierte Suche aus AniListClient.build_query: "q0: Media(search: $t0, ...)"
+_GRAPHQL_ALIAS = re.compile(r"(\w+)\s*:\s*Media\s*\(\s*search\s*:\s*\$(\w+)")
+
+
+@dataclass
+class FaultProfile:
+    """Latenz und Fehler, die der Stub einspielt; `routes` ueberschreibt beides pro Pfad-Praefix."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after_sec: Optional[int] = None       # bei 429/503 als Retry-After mitsenden
+    routes: Dict[str, "FaultProfile"] = field(default_factory=dict)
+
+    def for_path(self, path: str) -> "FaultProfile":
+        best = ""
+        for prefix in self.routes:
+            if path.startswith(prefix) and len(prefix) > len(best):
+                best = prefix
+        return self.routes[best] if best else self
+
+
+# Vordefinierte Profile fuer run.py (--profile)
+PROFILES = {
+    "healthy": FaultProfile(latency_ms=40, jitter_ms=20),
+    "slow": FaultProfile(latency_ms=300, jitter_ms=200),
+    "flaky": FaultProfile(latency_ms=60, jitter_ms=40, error_rate=0.05, error_status=503,
+                          routes={"/api": FaultProfile(latency_ms=60, jitter_ms=40, error_rate=0.05,
+                                                       error_status=429, retry_after_sec=1)}),
+}
+
+
+class StubUpstream:
+    def __init__(self, recording: Recording, profile: FaultProfile = FaultProfile(),
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 1):
+        self.recording = recording
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.counts = {"requests": 0, "injected_errors": 0, "not_found": 0, "graphql": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubUpstream":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        logger.info("Stub-Upstream laeuft auf %s (%d Antworten)", self.base_url, len(self.recording.responses))
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.counts[name] += 1
+
+    def _draw(self, profile: FaultProfile):
+        """(Verzoegerung in Sekunden, Fehler ja/nein) fuer eine Anfrage."""
+        with self._rng_lock:
+            delay = max(0.0, profile.latency_ms + self._rng.uniform(-1, 1) * profile.jitter_ms) / 1000
+            failed = self._rng.random() < profile.error_rate
+        return delay, failed
+
+    def _graphql(self, payload: dict) -> dict:
+        """
+        Beantwortet eine gebuendelte AniList-Suche: jeder Alias bekommt das aufgezeichnete
+        Media-Objekt seines Suchtitels oder null. Wie bei AniList fuehren fehlende Treffer zu
+        einem Eintrag in "errors" neben den Teilergebnissen.
+        """
+        variables = payload.get("variables") or {}
+        data, errors = {}, []
+        for alias, variable in _GRAPHQL_ALIAS.findall(payload.get("query") or ""):
+            response = self.recording.get(anilist_key(str(variables.get(variable) or "")))
+            data[alias] = json.loads(response[2]) if response and response[0] == 200 else None
+            if data[alias] is None:
+                errors.append({"message": "Not Found.", "status": 404, "path": [alias]})
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def _rewrite(self, body: bytes) -> bytes:
+        for origin, prefix in UPSTREAM_HOSTS.items():
+            body = body.replace(origin.encode(), (self.base_url + prefix).encode())
+        return body
+
+    def _handler_class(self):
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if self._inject_fault(parts.path):
+                    return
+                response = stub.recording.get(request_key(parts.path, parts.query))
+                if response is None:
+                    stub._count("not_found")
+                    return self._send(404, "text/plain", b"not recorded")
+                status, content_type, body = response
+                if content_type.startswith(_TEXT_TYPES):
+                    body = stub._rewrite(body)
+                self._send(status, content_type, body)
+
+            def do_POST(self):
+                parts = urlsplit(self.path)
+                payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self._inject_fault(parts.path):
+                    return
+                if parts.path.rstrip("/") != "/graphql":
+                    stub._count("not_found")
+                    return self._send(404, "text/plain", b"not recorded")
+                stub._count("graphql")
+                try:
+                    answer = stub._graphql(json.loads(payload or b"{}"))
+                except ValueError:
+                    return self._send(400, "application/json", b'{"errors": [{"message": "Invalid JSON"}]}')
+                self._send(404 if answer.get("errors") else 200, "application/json", json.dumps(answer).encode())
+
+            def _inject_fault(self, path: str) -> bool:
+                """Zaehlt die Anfrage, wartet die Latenz ab und sendet ggf. einen Fehler (dann True)."""
+                stub._count("requests")
+                profile = stub.profile.for_path(path)
+                delay, failed = stub._draw(profile)
+                if delay:
+                    time.sleep(delay)
+                if not failed:
+                    return False
+                stub._count("injected_errors")
+                headers = {"Retry-After": str(profile.retry_after_sec)} if profile.retry_after_sec else {}
+                self._send(profile.error_status, "text/plain", b"injected error", headers)
+                return True
+
+            def _send(self, status: int, content_type: str, body: bytes, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub-Upstream fuer Lasttests")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recording", help="JSON-Lines-Aufzeichnung (sonst synthetisch)")
+    parser.add_argument("--synthetic", type=int, default=300, help="Anzahl synthetischer Anime")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    recording = Recording.load(args.recording) if args.recording else synthesize(args.synthetic)
+    profile = FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    stub = StubUpstream(recording, profile, port=args.port).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
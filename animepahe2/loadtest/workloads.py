@@ -0,0 +1,108 @@
+# loadtest/workloads.py
+"""
+Skriptierte Nutzerablaeufe. Ein Workload ist eine Funktion, die einen Durchlauf eines virtuellen
+Nutzers ausfuehrt; jede Anfrage wird unter einem Routen-Label (Pfad mit Platzhaltern) gemessen.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+_SEARCH_WORDS = ["sword", "star", "blue", "night", "dragon", "moon", "ghost", "hero", "shadow", "winter"]
+_GENRES = ["Action", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi"]
+
+
+@dataclass
+class Sample:
+    route: str
+    started: float       # time.perf_counter() beim Absenden
+    latency: float       # Sekunden
+    ok: bool
+    status: int
+
+
+class Recorder:
+    """Sammelt die Messwerte aller virtuellen Nutzer (thread-sicher)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Sample] = []
+
+    def add(self, sample: Sample):
+        with self._lock:
+            self.samples.append(sample)
+
+
+@dataclass
+class VirtualUser:
+    base_url: str
+    recorder: Recorder
+    sessions: List[str]
+    episodes: Dict[str, List[str]]
+    rng: random.Random
+    think_time: float = 0.0
+    timeout: float = 60.0
+    client: requests.Session = field(default_factory=requests.Session)
+
+    def call(self, method: str, route: str, path: str, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(Sample(route, started, time.perf_counter() - started, False, 0))
+            return None
+        self.recorder.add(Sample(route, started, time.perf_counter() - started, response.status_code < 400,
+                                   response.status_code))
+        if self.think_time:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+        return response
+
+    def pick_session(self) -> str:
+        # Wenige beliebte Titel bekommen den Grossteil der Aufrufe (wie auf der echten Seite)
+        hot = self.sessions[:max(1, len(self.sessions) // 10)]
+        return self.rng.choice(hot if self.rng.random() < 0.7 else self.sessions)
+
+
+def browse(user: VirtualUser):
+    """Startseite: Katalogseiten, Filteroptionen und Facetten fuer ein Genre."""
+    user.call("GET", "/api/anime/all", "/api/anime/all", params={"page": user.rng.randint(1, 10), "limit": 20})
+    user.call("GET", "/api/filters", "/api/filters")
+    user.call("GET", "/api/facets", "/api/facets", params={"genre": user.rng.choice(_GENRES)})
+
+
+def search(user: VirtualUser):
+    """Live-Suche: Vorschlaege beim Tippen, dann Suche mit und ohne Filter."""
+    word = user.rng.choice(_SEARCH_WORDS)
+    for length in (2, 4):
+        user.call("GET", "/api/suggestions", "/api/suggestions", params={"q": word[:length]})
+    user.call("GET", "/api/search", "/api/search", params={"q": word})
+    user.call("GET", "/api/search", "/api/search", params={"q": "", "genre": user.rng.choice(_GENRES), "sort": "year"})
+
+
+def details(user: VirtualUser):
+    """Detailansicht eines Anime samt Episodenliste."""
+    session = user.pick_session()
+    user.call("GET", "/api/anime/{session}", f"/api/anime/{session}")
+    user.call("GET", "/api/anime/{session}/episodes", f"/api/anime/{session}/episodes")
+
+
+def streams(user: VirtualUser):
+    """Episodenliste oeffnen und die Stream-URL der ersten Episoden aufloesen."""
+    session = user.pick_session()
+    user.call("GET", "/api/anime/{session}/episodes", f"/api/anime/{session}/episodes")
+    episode_sessions = user.episodes.get(session) or []
+    if episode_sessions:
+        episode = user.rng.choice(episode_sessions[:3])
+        user.call("POST", "/api/stream_urls", "/api/stream_urls",
+                  json={"episodes": [{"session": session, "episode_session": episode}]})
+
+
+WORKLOADS: Dict[str, Callable[[VirtualUser], None]] = {
+    "browse": browse,
+    "search": search,
+    "details": details,
+    "streams": streams,
+}
@@ -0,0 +1,16 @@
+# tests/conftest.py
+"""
+Backend-Module legen beim Import Datenbanken und Cache-Verzeichnisse im Arbeitsverzeichnis an
+(globale Instanzen). Die Tests laufen deshalb in einem temporaeren Verzeichnis statt im Projekt.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_WORKDIR = tempfile.mkdtemp(prefix="animepahe2-tests-")
+os.chdir(_WORKDIR)
+atexit.register(shutil.rmtree, _WORKDIR, ignore_errors=True)
@@ -0,0 +1,67 @@
+# tests/test_enrichment.py
+"""Tests fuer backend.enrichment gegen den GraphQL-Endpunkt des Stub-Upstreams."""
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import AnimeCacheDB  # noqa: E402
+from backend.enrichment import AniListClient, EnrichmentStore, MetadataEnricher, facets_from_media  # noqa: E402
+from backend.parsers import parse_details  # noqa: E402
+from loadtest.recordings import anilist_key, synthesize  # noqa: E402
+from loadtest.stub_upstream import StubUpstream  # noqa: E402
+
+_BATCH_SIZE = 4
+_SCRAPED_STUDIO = "Gescraptes Studio"
+
+
+def _catalog_rows(recording):
+    """Katalogzeilen ohne Facetten; jede dritte behaelt ein gescraptes Studio."""
+    rows = []
+    for i, session in enumerate(recording.sessions()):
+        title = parse_details(recording.get(f"/anime/{session}")[2])["title"]
+        rows.append({"session": session, "title": title, "type": None, "genre": "", "year": None,
+                     "studio": _SCRAPED_STUDIO if i % 3 == 0 else None, "source": "pahe", "identifier": session})
+    return rows
+
+
+def test_enrich_missing_batches_fills_empty_fields_and_caches(tmp_path):
+    recording = synthesize(count=11, episodes=1)
+    stub = StubUpstream(recording).start()
+    try:
+        db = AnimeCacheDB(str(tmp_path / "anime_cache.db"))
+        rows = _catalog_rows(recording)
+        db.set_details_bulk(rows)
+        store = EnrichmentStore(str(tmp_path / "enrichment.db"))
+        client = AniListClient(api_url=f"{stub.base_url}/graphql", limiter=None)
+        enricher = MetadataEnricher(db, store, client, batch_size=_BATCH_SIZE)
+
+        counts = enricher.enrich_missing(max_lookups=100)
+        assert counts["looked_up"] == len(rows)
+        assert client.requests_sent == math.ceil(len(rows) / _BATCH_SIZE)
+        assert stub.counts["graphql"] == client.requests_sent
+
+        stored = db.get_details_by_sessions([row["session"] for row in rows])
+        for row in rows:
+            response = recording.get(anilist_key(row["title"]))
+            current = stored[row["session"]]
+            if response is None:
+                assert not current["type"] and not current["genre"]
+                continue
+            facets = facets_from_media(json.loads(response[2]))
+            assert current["type"] == facets["type"]
+            assert current["genre"] == facets["genre"]
+            assert str(current["year"]) == facets["year"]
+            # Vorhandene Werte haben Vorrang vor AniList
+            assert current["studio"] == (row["studio"] or facets["studio"])
+
+        # Zweiter Lauf: Treffer und "kein Treffer" kommen aus dem EnrichmentStore
+        second_client = AniListClient(api_url=f"{stub.base_url}/graphql", limiter=None)
+        second = MetadataEnricher(db, store, second_client, batch_size=_BATCH_SIZE).enrich_missing(max_lookups=100)
+        assert second["looked_up"] == 0
+        assert second_client.requests_sent == 0
+        assert stub.counts["graphql"] == client.requests_sent
+    finally:
+        stub.stop()
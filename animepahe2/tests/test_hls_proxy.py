@@ -0,0 +1,98 @@
+# tests/test_hls_proxy.py
+"""Tests fuer backend.hls_proxy gegen die HLS-Streams des Stub-Upstreams."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.hls_proxy import PLAYLIST_CONTENT_TYPE, HlsProxy  # noqa: E402
+from loadtest.recordings import HLS_SEGMENT_BYTES, HLS_SEGMENTS, synthesize  # noqa: E402
+from loadtest.stub_upstream import StubUpstream  # noqa: E402
+
+_BASE_PATH = "/api/hls/anime/episode"
+
+
+def _start_stub():
+    recording = synthesize(count=1, episodes=1)
+    stub = StubUpstream(recording).start()
+    master = next(key for key in recording.responses if key.startswith("/cdn/") and key.endswith("/uwu.m3u8"))
+    return stub, recording, stub.base_url + master
+
+
+def _proxy(tmp_path, playlist_url: str, max_cache_bytes: int = 10 * HLS_SEGMENT_BYTES, name: str = "hls") -> HlsProxy:
+    return HlsProxy(resolver=lambda anime, episode: playlist_url, cache_dir=str(tmp_path / name),
+                    max_cache_bytes=max_cache_bytes, read_ahead=0, workers=2, referer=None)
+
+
+def _ids(playlist: str):
+    """Ressourcen-IDs aller URI-Zeilen; jede muss auf den Proxy zeigen."""
+    lines = [line for line in playlist.splitlines() if line and not line.startswith("#")]
+    assert all(line.startswith(_BASE_PATH + "/") for line in lines), playlist
+    return [int(line.rsplit("/", 1)[1]) for line in lines]
+
+
+def _segment_ids(proxy: HlsProxy):
+    variant = _ids(proxy.get_playlist("anime", "episode"))[0]
+    media, content_type = proxy.get_resource("anime", "episode", variant)
+    assert content_type == PLAYLIST_CONTENT_TYPE
+    return _ids(media.decode("utf-8"))
+
+
+def test_playlists_are_rewritten_to_the_proxy(tmp_path):
+    stub, recording, playlist_url = _start_stub()
+    proxy = _proxy(tmp_path, playlist_url)
+    try:
+        master = proxy.get_playlist("anime", "episode")
+        assert "http" not in master and len(_ids(master)) == 1
+        segments = _segment_ids(proxy)
+        assert len(segments) == HLS_SEGMENTS
+        data, content_type = proxy.get_resource("anime", "episode", segments[0])
+        assert content_type == "video/mp2t"
+        assert data == recording.get(playlist_url[len(stub.base_url):].replace("uwu.m3u8", "720/seg-0.ts"))[2]
+
+        # Ein zweiter Worker kennt die IDs nicht und baut die Zuordnung aus den Playlists nach
+        other = _proxy(tmp_path, playlist_url, name="other")
+        assert other.get_resource("anime", "episode", segments[-1])[0] == data
+        other.shutdown()
+    finally:
+        proxy.shutdown()
+        stub.stop()
+
+
+def test_segments_are_served_from_cache(tmp_path):
+    stub, _, playlist_url = _start_stub()
+    proxy = _proxy(tmp_path, playlist_url)
+    try:
+        segment = _segment_ids(proxy)[0]
+        first, _ = proxy.get_resource("anime", "episode", segment)
+        requests_before = stub.counts["requests"]
+        second, _ = proxy.get_resource("anime", "episode", segment)
+        assert second == first
+        assert stub.counts["requests"] == requests_before
+        assert proxy.cache.stats()["hits"] == 1
+    finally:
+        proxy.shutdown()
+        stub.stop()
+
+
+def test_cache_evicts_oldest_segments_below_max_bytes(tmp_path):
+    stub, _, playlist_url = _start_stub()
+    max_bytes = int(2.5 * HLS_SEGMENT_BYTES)
+    proxy = _proxy(tmp_path, playlist_url, max_cache_bytes=max_bytes)
+    try:
+        segments = _segment_ids(proxy)
+        for segment in segments:
+            proxy.get_resource("anime", "episode", segment)
+            assert proxy.cache.total_bytes <= max_bytes
+        on_disk = sum(entry.stat().st_size for entry in os.scandir(proxy.cache.cache_dir))
+        assert on_disk == proxy.cache.total_bytes <= max_bytes
+
+        # Das zuletzt geladene Segment liegt noch im Cache, das erste wurde verdraengt
+        requests_before = stub.counts["requests"]
+        proxy.get_resource("anime", "episode", segments[-1])
+        assert stub.counts["requests"] == requests_before
+        proxy.get_resource("anime", "episode", segments[0])
+        assert stub.counts["requests"] == requests_before + 1
+    finally:
+        proxy.shutdown()
+        stub.stop()
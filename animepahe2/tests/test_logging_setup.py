@@ -0,0 +1,36 @@
+# tests/test_logging_setup.py
+"""Tests fuer backend.logging_setup (Formatierung im Listener-Thread)."""
+import logging
+import os
+import queue
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logging_setup import _DeferredQueueHandler  # noqa: E402
+
+
+def _queued(msg, *args) -> logging.LogRecord:
+    log_queue = queue.Queue()
+    _DeferredQueueHandler(log_queue).handle(logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None))
+    return log_queue.get_nowait()
+
+
+def test_mutable_args_are_formatted_at_call_time():
+    counts = {"anime": 1}
+    sessions = ["a"]
+    record = _queued("Stand: %s, Sessions: %s", counts, sessions)
+    counts["anime"] = 2
+    sessions.append("b")
+    assert record.getMessage() == "Stand: {'anime': 1}, Sessions: ['a']"
+
+    mapping = {"anime": 1}
+    record = _queued("%(anime)d Anime", mapping)
+    mapping["anime"] = 2
+    assert record.getMessage() == "1 Anime"
+
+
+def test_immutable_args_stay_lazy():
+    record = _queued("%s von %d", "Titel", 3)
+    assert record.args == ("Titel", 3)
+    assert record.getMessage() == "Titel von 3"
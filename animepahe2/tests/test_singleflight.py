@@ -0,0 +1,78 @@
+# tests/test_singleflight.py
+"""Regressionstests fuer backend.singleflight (Abbruch gemeinsamer Aufrufe)."""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.cancellation import CancelToken, CancelledByClient, check_cancelled, run_with  # noqa: E402
+from backend.singleflight import SingleFlight  # noqa: E402
+
+
+def _slow(started: threading.Event, release: threading.Event, result: str) -> str:
+    """Laeuft, bis release gesetzt wird, und reagiert wie Crawler-Aufrufe auf den Abbruch."""
+    started.set()
+    release.wait(5)
+    check_cancelled()
+    return result
+
+
+def test_join_after_last_waiter_left_starts_new_flight():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    client = CancelToken()
+    outcome = {}
+
+    def first_client():
+        try:
+            run_with(client, flights.do, "key", _slow, started, release, "alt")
+        except CancelledByClient as e:
+            outcome["first"] = e
+
+    thread = threading.Thread(target=first_client)
+    thread.start()
+    assert started.wait(5)
+
+    # Der einzige Wartende trennt sich: der gemeinsame Aufruf wird abgebrochen,
+    # laeuft aber noch, bis fn zurueckkehrt
+    client.cancel()
+    assert flights.stats()["cancelled"] == 1
+    assert flights.stats()["in_flight"] == 0
+
+    # Ein Aufrufer ohne Token darf den abgebrochenen Aufruf nicht erben
+    assert flights.do("key", lambda: "neu") == "neu"
+
+    release.set()
+    thread.join(5)
+    assert isinstance(outcome.get("first"), CancelledByClient)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_flight_survives_while_a_waiter_remains():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    leaving, staying = CancelToken(), CancelToken()
+    results = {}
+
+    def caller(name, token):
+        try:
+            results[name] = run_with(token, flights.do, "key", _slow, started, release, "ergebnis")
+        except CancelledByClient as e:
+            results[name] = e
+
+    first = threading.Thread(target=caller, args=("staying", staying))
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=caller, args=("leaving", leaving))
+    second.start()
+    while flights.stats()["coalesced"] < 1:
+        threading.Event().wait(0.01)
+
+    leaving.cancel()
+    second.join(5)
+    release.set()
+    first.join(5)
+    assert isinstance(results["leaving"], CancelledByClient)
+    assert results["staying"] == "ergebnis"
+    assert flights.stats()["cancelled"] == 0
@@ -0,0 +1,64 @@
+# tests/test_snapshot.py
+"""Tests fuer backend.snapshot: unvollstaendige oder ungueltige Snapshots aendern nichts."""
+import base64
+import gzip
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import CONFIG  # noqa: E402
+from backend.database import AnimeCacheDB  # noqa: E402
+from backend.http_cache import http_cache  # noqa: E402
+from backend.snapshot import SNAPSHOT_FORMAT, SNAPSHOT_VERSION, SnapshotError, import_snapshot  # noqa: E402
+
+_KEY = "a" * 40
+
+
+def _snapshot(*records) -> io.BytesIO:
+    header = {"kind": "header", "format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION}
+    lines = [json.dumps(record) for record in (header,) + records]
+    return io.BytesIO(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+
+
+def _side_records(name: str):
+    return (
+        {"kind": "anime", "row": {"session": "s1", "title": "Erster Titel"}},
+        {"kind": "http_cache", "key": _KEY, "meta": {"url": "https://animepahe.ru/api?m=release"},
+         "body": base64.b64encode(b"{}").decode("ascii")},
+        {"kind": "thumbnail", "name": name, "data": base64.b64encode(b"jpeg").decode("ascii")},
+    )
+
+
+def _side_files(name: str):
+    return [os.path.exists(os.path.join(CONFIG.get("IMAGE_CACHE_DIR", "cached_images"), name)),
+            os.path.exists(os.path.join(http_cache.cache_dir, f"{_KEY}.json"))]
+
+
+def test_side_files_are_written_only_after_the_footer(tmp_path):
+    db = AnimeCacheDB(str(tmp_path / "anime_cache.db"))
+    with pytest.raises(SnapshotError):
+        import_snapshot(_snapshot(*_side_records("ohne-footer.jpg")), db=db)
+    assert _side_files("ohne-footer.jpg") == [False, False]
+    assert db.get_details_by_sessions(["s1"]) == {}
+
+    footer = {"kind": "footer", "counts": {"anime": 1, "http_cache": 1, "thumbnail": 1}}
+    counts = import_snapshot(_snapshot(*_side_records("mit-footer.jpg"), footer), db=db)
+    assert counts == {"anime": 1, "http_cache": 1, "thumbnail": 1}
+    assert _side_files("mit-footer.jpg") == [True, True]
+    assert list(db.get_details_by_sessions(["s1"])) == ["s1"]
+
+
+@pytest.mark.parametrize("record", [
+    {"kind": "anime"},
+    {"kind": "http_cache", "key": "kein-sha1", "meta": {}, "body": ""},
+    {"kind": "thumbnail", "name": "bild.jpg", "data": "kein base64!"},
+])
+def test_invalid_records_raise_snapshot_error(tmp_path, record):
+    db = AnimeCacheDB(str(tmp_path / "anime_cache.db"))
+    with pytest.raises(SnapshotError):
+        import_snapshot(_snapshot(record, {"kind": "footer", "counts": {"anime": 0}}), db=db)